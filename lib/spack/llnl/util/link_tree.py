@@ -10,11 +10,12 @@
 import os
 import shutil
 import filecmp
+import multiprocessing.pool
 
 from llnl.util.filesystem import traverse_tree, mkdirp, touch
 import llnl.util.tty as tty
 
-__all__ = ['LinkTree']
+__all__ = ['LinkTree', 'LinkQueue']
 
 empty_file_name = '.spack-empty'
 
@@ -29,6 +30,91 @@ def remove_link(src, dest):
         os.remove(dest)
 
 
+class LinkQueue(object):
+    """Creates links in a bounded pool of threads.
+
+    On parallel filesystems, creating a link is a round trip to a metadata
+    server, and linking many files one after the other is bound by its
+    latency.  Links are queued here, and created by ``threads`` threads
+    until ``wait()`` is called, or the queue is left as a context manager.
+
+    Links to a destination already queued are skipped, as links to an
+    existing destination are.  The first error raised while creating a link
+    is raised again by ``wait()``.
+    """
+
+    #: Number of links each thread creates at a time
+    chunk_size = 64
+
+    def __init__(self, link=os.symlink, threads=1):
+        self._link = link
+        self._threads = threads
+        self._pool = None
+        self._results = []
+        self._chunk = []
+        self._queued = set()
+
+    def queued(self, dst):
+        """Whether a link to dst was queued."""
+        return dst in self._queued
+
+    def link(self, src, dst, **kwargs):
+        """Queue a link to src at dst."""
+        if dst in self._queued:
+            return
+        self._queued.add(dst)
+
+        if self._threads <= 1:
+            self._link(src, dst, **kwargs)
+            return
+
+        self._chunk.append((src, dst, kwargs))
+        if len(self._chunk) >= self.chunk_size:
+            self._submit()
+
+    def _submit(self):
+        if not self._chunk:
+            return
+        if self._pool is None:
+            self._pool = multiprocessing.pool.ThreadPool(self._threads)
+        self._results.append(
+            self._pool.apply_async(self._link_chunk, (self._chunk,)))
+        self._chunk = []
+
+    def _link_chunk(self, chunk):
+        for src, dst, kwargs in chunk:
+            self._link(src, dst, **kwargs)
+
+    def wait(self):
+        """Wait for all queued links to be created."""
+        self._submit()
+        pool, results = self._pool, self._results
+        self._pool, self._results = None, []
+        self._queued = set()
+        if pool is None:
+            return
+
+        pool.close()
+        pool.join()
+        for result in results:
+            result.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.wait()
+            return
+
+        self._chunk = []
+        if self._pool is not None:
+            # keep the original error
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
 class LinkTree(object):
     """Class to create trees of symbolic links from a source directory.
 
@@ -80,8 +166,14 @@ def get_file_map(self, dest_root, ignore):
         return merge_map
 
     def merge_directories(self, dest_root, ignore):
+        """Create the directories of the source tree in dest_root.
+
+        Returns the directories in dest_root, parents before children.
+        """
+        merged = []
         for src, dest in traverse_tree(self._root, dest_root, ignore=ignore):
             if os.path.isdir(src):
+                merged.append(dest)
                 if not os.path.exists(dest):
                     mkdirp(dest)
                     continue
@@ -94,6 +186,8 @@ def merge_directories(self, dest_root, ignore):
                     marker = os.path.join(dest, empty_file_name)
                     touch(marker)
 
+        return merged
+
     def unmerge_directories(self, dest_root, ignore):
         for src, dest in traverse_tree(
                 self._root, dest_root, ignore=ignore, order='post'):
@@ -113,7 +207,7 @@ def unmerge_directories(self, dest_root, ignore):
                     os.remove(marker)
 
     def merge(self, dest_root, ignore_conflicts=False, ignore=None,
-              link=os.symlink, relative=False):
+              link=os.symlink, relative=False, threads=1):
         """Link all files in src into dest, creating directories
            if necessary.
 
@@ -130,6 +224,8 @@ def merge(self, dest_root, ignore_conflicts=False, ignore=None,
         relative (bool): create all symlinks relative to the target
             (default False)
 
+        threads (int): number of threads creating links (default 1)
+
         """
         if ignore is None:
             ignore = lambda x: False
@@ -141,16 +237,17 @@ def merge(self, dest_root, ignore_conflicts=False, ignore=None,
 
         self.merge_directories(dest_root, ignore)
         existing = []
-        for src, dst in self.get_file_map(dest_root, ignore).items():
-            if os.path.exists(dst):
-                existing.append(dst)
-            elif relative:
-                abs_src = os.path.abspath(src)
-                dst_dir = os.path.dirname(os.path.abspath(dst))
-                rel = os.path.relpath(abs_src, dst_dir)
-                link(rel, dst)
-            else:
-                link(src, dst)
+        with LinkQueue(link, threads) as queue:
+            for src, dst in self.get_file_map(dest_root, ignore).items():
+                if os.path.exists(dst):
+                    existing.append(dst)
+                elif relative:
+                    abs_src = os.path.abspath(src)
+                    dst_dir = os.path.dirname(os.path.abspath(dst))
+                    rel = os.path.relpath(abs_src, dst_dir)
+                    queue.link(rel, dst)
+                else:
+                    queue.link(src, dst)
 
         for c in existing:
             tty.warn("Could not merge: %s" % c)
@@ -4,13 +4,14 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import codecs
+import collections
+import multiprocessing.pool
 import os
 import re
 import tarfile
 import shutil
 import tempfile
 import hashlib
-import glob
 import platform
 
 from contextlib import closing
@@ -22,10 +23,13 @@
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import mkdirp
+from llnl.util.lock import LockError
 
+import spack.caches
 import spack.cmd
 import spack.config as config
 import spack.database as spack_db
+import spack.error
 import spack.fetch_strategy as fs
 import spack.util.gpg
 import spack.relocate as relocate
@@ -279,53 +283,200 @@ def sign_tarball(key, force, specfile_path):
     Gpg.sign(key, specfile_path, '%s.asc' % specfile_path)
 
 
-def generate_package_index(cache_prefix):
+#: Matches the DAG hash in the names of spec.yaml files in build caches
+_spec_file_hash = re.compile(r'-([a-z0-9]{32})\.spec\.yaml$')
+
+#: Database version of build cache indices. They have no journal, so they
+#: keep the version older Spacks can read.
+_index_db_version = '5'
+
+
+def _read_package_index(cache_prefix):
+    """Records of the "index.json" page at cache_prefix, by DAG hash, or
+    an empty dictionary if there is no index of the current version.
+    """
+    index_url = url_util.join(cache_prefix, 'index.json')
+    try:
+        _, _, index_file = web_util.read_from_url(
+            index_url, 'application/json')
+        index = json.load(codecs.getreader('utf-8')(index_file))
+        database = index['database']
+        if str(database['version']) == _index_db_version:
+            return database['installs']
+    except (URLError, web_util.SpackWebError, ValueError, KeyError) as e:
+        tty.debug('No index to update at {0}: {1}'.format(index_url, e))
+    return {}
+
+
+def _read_spec_file(cache_prefix, file_path):
+    """Contents of a spec.yaml file, or the error reading it."""
+    try:
+        yaml_url = url_util.join(cache_prefix, file_path)
+        tty.debug('fetching {0}'.format(yaml_url))
+        _, _, yaml_file = web_util.read_from_url(yaml_url)
+        return file_path, codecs.getreader('utf-8')(yaml_file).read()
+    except (URLError, web_util.SpackWebError) as url_err:
+        return file_path, url_err
+
+
+def _is_current(record, mtime, index_mtime):
+    """Whether a record of the previous index is current for the spec.yaml
+    file modified at ``mtime``, for an index modified at ``index_mtime``.
+    Either time is None if it is unknown."""
+    if record is None:
+        return False
+    # Records of indices written before full hashes were recorded, even
+    # as null
+    node = record['spec']
+    if 'full_hash' not in node[next(iter(node))]:
+        return False
+    # The spec.yaml file was rewritten, e.g. by buildcache create -f, after
+    # the index, so the record may be out of date
+    if mtime is not None and index_mtime is not None and \
+            mtime >= index_mtime:
+        return False
+    return True
+
+
+def generate_package_index(cache_prefix, concurrency=32, force=False):
     """Create the build cache index page.
 
     Creates (or replaces) the "index.json" page at the location given in
     cache_prefix.  This page contains a link for each binary package (*.yaml)
     and public key (*.key) under cache_prefix.
+
+    The index is updated from the previous one: only the spec.yaml files
+    whose DAG hash it lacks, or that changed since it was written, are
+    fetched, by a bounded pool of threads, and the records of specs whose
+    spec.yaml file is gone are dropped.
+
+    Args:
+        cache_prefix (str): URL of the build cache
+        concurrency (int): maximum number of spec.yaml files fetched at the
+            same time
+        force (bool): if True, fetch all the spec.yaml files, ignoring the
+            previous index
     """
-    tmpdir = tempfile.mkdtemp()
-    db_root_dir = os.path.join(tmpdir, 'db_root')
-    db = spack_db.Database(None, db_dir=db_root_dir,
-                           enable_transaction_locking=False,
-                           record_fields=['spec', 'ref_count'])
-
-    file_list = (
-        entry
-        for entry in web_util.list_url(cache_prefix)
-        if entry.endswith('.yaml'))
-
-    tty.debug('Retrieving spec.yaml files from {0} to build index'.format(
-        cache_prefix))
-    for file_path in file_list:
-        try:
-            yaml_url = url_util.join(cache_prefix, file_path)
-            tty.debug('fetching {0}'.format(yaml_url))
-            _, _, yaml_file = web_util.read_from_url(yaml_url)
-            yaml_contents = codecs.getreader('utf-8')(yaml_file).read()
-            # yaml_obj = syaml.load(yaml_contents)
-            # s = Spec.from_yaml(yaml_obj)
-            s = Spec.from_yaml(yaml_contents)
-            db.add(s, None)
-        except (URLError, web_util.SpackWebError) as url_err:
-            tty.error('Error reading spec.yaml: {0}'.format(file_path))
-            tty.error(url_err)
+    previous = {} if force else _read_package_index(cache_prefix)
+    mtimes = web_util.list_url_mtimes(cache_prefix) if previous else None
+    index_mtime = mtimes.get('index.json') if mtimes else None
+
+    records, current, file_list = {}, set(), []
+    for entry in web_util.list_url(cache_prefix):
+        if not entry.endswith('.yaml'):
+            continue
+        match = _spec_file_hash.search(entry)
+        if match and _is_current(previous.get(match.group(1)),
+                                 mtimes.get(entry) if mtimes else None,
+                                 index_mtime):
+            current.add(match.group(1))
+        else:
+            file_list.append(entry)
+    listed = set(current)
+
+    tty.debug('Retrieving {0} spec.yaml files from {1} to build index'.format(
+        len(file_list), cache_prefix))
+    pool = multiprocessing.pool.ThreadPool(
+        max(min(concurrency, len(file_list)), 1))
+    try:
+        results = pool.imap_unordered(
+            lambda file_path: _read_spec_file(cache_prefix, file_path),
+            file_list)
+        for file_path, yaml_contents in results:
+            if isinstance(yaml_contents, Exception):
+                tty.error('Error reading spec.yaml: {0}'.format(file_path))
+                tty.error(yaml_contents)
+                continue
+            spec_dict = syaml.load(yaml_contents)
+            s = Spec.from_dict(spec_dict)
+            listed.add(s.dag_hash())
+            for node in s.traverse(deptype=spack_db._tracked_deps):
+                if node.dag_hash() not in records:
+                    records[node.dag_hash()] = {'spec': node.to_node_dict()}
+
+            # Record the full hash of the binary package, for clients to
+            # check whether it needs rebuilding without fetching its spec.
+            # It is recorded as null for spec.yaml files without one, so
+            # that they are not fetched again for it.
+            node_dict = records[s.dag_hash()]['spec'][s.name]
+            node_dict['full_hash'] = spec_dict.get('full_hash')
+    finally:
+        pool.terminate()
+        pool.join()
+
+    # Keep the specs of the spec.yaml files listed, and their dependencies.
+    # The records of the previous index are kept for the spec.yaml files
+    # not fetched again, with their full hash.
+    for dag_hash in current:
+        records[dag_hash] = {'spec': previous[dag_hash]['spec']}
+    stack = list(listed)
+    while stack:
+        dag_hash = stack.pop()
+        if dag_hash not in records:
+            if dag_hash not in previous:
+                continue
+            records[dag_hash] = {'spec': previous[dag_hash]['spec']}
+        node = records[dag_hash]['spec']
+        for _, dep_hash, _ in _dependencies_of(node):
+            if dep_hash not in records:
+                stack.append(dep_hash)
+
+    ref_counts = collections.Counter(
+        dep_hash
+        for record in records.values()
+        for _, dep_hash, _ in _dependencies_of(record['spec']))
 
+    tmpdir = tempfile.mkdtemp()
     try:
-        index_json_path = os.path.join(db_root_dir, 'index.json')
+        # Write the index record by record, in the format of the database
+        index_json_path = os.path.join(tmpdir, 'index.json')
         with open(index_json_path, 'w') as f:
-            db._write_to_file(f)
+            f.write('{"database": {"installs": {')
+            for i, dag_hash in enumerate(sorted(records)):
+                record = records[dag_hash]
+                record['ref_count'] = ref_counts[dag_hash]
+                f.write('%s%s: %s' % (', ' if i else '', json.dumps(dag_hash),
+                                      json.dumps(record, sort_keys=True)))
+            f.write('}, "version": %s}}' % json.dumps(_index_db_version))
+
+        # Publish the hash of the index, for clients to check whether
+        # their copy of the index is up to date
+        index_hash_path = os.path.join(tmpdir, 'index.json.hash')
+        with open(index_hash_path, 'w') as f:
+            f.write(_index_hash(index_json_path))
 
         web_util.push_to_url(
             index_json_path,
             url_util.join(cache_prefix, 'index.json'),
             keep_original=False,
             extra_args={'ContentType': 'application/json'})
+        web_util.push_to_url(
+            index_hash_path,
+            url_util.join(cache_prefix, 'index.json.hash'),
+            keep_original=False,
+            extra_args={'ContentType': 'text/plain'})
     finally:
         shutil.rmtree(tmpdir)
 
+    # The index is checked again if it is needed later in this Spack run
+    binary_index.invalidate(cache_prefix)
+
+
+def _index_hash(index_json_path):
+    """Hash of the content of an index.json file."""
+    with open(index_json_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _dependencies_of(node_dict):
+    """Dependencies tracked in the build cache index of a node dictionary,
+    as (name, DAG hash, types) tuples.
+    """
+    node = next(iter(node_dict.values()))
+    return [
+        dep for dep in Spec.read_yaml_dep_specs(node.get('dependencies', {}))
+        if any(t in spack_db._tracked_deps for t in dep[2])]
+
 
 def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
                   allow_root=False, key=None, regenerate_index=False):
@@ -685,32 +836,36 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
     spackfile_name = tarball_name(spec, '.spack')
     spackfile_path = os.path.join(stagepath, spackfile_name)
     tarfile_name = tarball_name(spec, '.tar.gz')
-    tarfile_path = os.path.join(tmpdir, tarfile_name)
     specfile_name = tarball_name(spec, '.spec.yaml')
     specfile_path = os.path.join(tmpdir, specfile_name)
 
-    with closing(tarfile.open(spackfile_path, 'r')) as tar:
-        tar.extractall(tmpdir)
+    # Only the spec file and its signature are extracted: the tarball of
+    # the prefix is read once, straight from the .spack file, as it is
+    # extracted into the prefix and checksummed.
+    spackfile = tarfile.open(spackfile_path, 'r')
+    names = spackfile.getnames()
+    for name in (specfile_name, '%s.asc' % specfile_name):
+        if name in names:
+            spackfile.extract(name, tmpdir)
     # some buildcache tarfiles use bzip2 compression
-    if not os.path.exists(tarfile_path):
+    if tarfile_name not in names:
         tarfile_name = tarball_name(spec, '.tar.bz2')
-        tarfile_path = os.path.join(tmpdir, tarfile_name)
     if not unsigned:
         if os.path.exists('%s.asc' % specfile_path):
             try:
                 suppress = config.get('config:suppress_gpg_warnings', False)
                 Gpg.verify('%s.asc' % specfile_path, specfile_path, suppress)
             except Exception as e:
+                spackfile.close()
                 shutil.rmtree(tmpdir)
                 raise e
         else:
+            spackfile.close()
             shutil.rmtree(tmpdir)
             raise NoVerifyException(
                 "Package spec file failed signature verification.\n"
                 "Use spack buildcache keys to download "
                 "and install a key for verification from the mirror.")
-    # get the sha256 checksum of the tarball
-    checksum = checksum_tarball(tarfile_path)
 
     # get the sha256 checksum recorded at creation
     spec_dict = {}
@@ -719,13 +874,6 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
         spec_dict = syaml.load(content)
     bchecksum = spec_dict['binary_cache_checksum']
 
-    # if the checksums don't match don't install
-    if bchecksum['hash'] != checksum:
-        shutil.rmtree(tmpdir)
-        raise NoChecksumException(
-            "Package tarball failed checksum verification.\n"
-            "It cannot be installed.")
-
     new_relative_prefix = str(os.path.relpath(spec.prefix,
                                               spack.store.layout.root))
     # if the original relative prefix is in the spec file use it
@@ -746,29 +894,32 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
 #        msg += "uses relative rpaths."
 #        raise NewLayoutException(msg)
 
-    # extract the tarball in a temp directory
-    with closing(tarfile.open(tarfile_path, 'r')) as tar:
-        tar.extractall(path=tmpdir)
-    # get the parent directory of the file .spack/binary_distribution
-    # this should the directory unpacked from the tarball whose
-    # name is unknown because the prefix naming is unknown
-    bindist_file = glob.glob('%s/*/.spack/binary_distribution' % tmpdir)[0]
-    workdir = re.sub('/.spack/binary_distribution$', '', bindist_file)
-    tty.debug('workdir %s' % workdir)
-    # install_tree copies hardlinks
-    # create a temporary tarfile from prefix and exract it to workdir
-    # tarfile preserves hardlinks
-    temp_tarfile_name = tarball_name(spec, '.tar')
-    temp_tarfile_path = os.path.join(tmpdir, temp_tarfile_name)
-    with closing(tarfile.open(temp_tarfile_path, 'w')) as tar:
-        tar.add(name='%s' % workdir,
-                arcname='.')
-    with closing(tarfile.open(temp_tarfile_path, 'r')) as tar:
-        tar.extractall(spec.prefix)
-    os.remove(temp_tarfile_path)
+    # extract the tarball into the prefix, without its top directory whose
+    # name is unknown because the prefix naming is unknown, and compute its
+    # sha256 checksum on the way
+    hasher = hashlib.sha256()
+    try:
+        with closing(spackfile):
+            tarball = spackfile.extractfile(tarfile_name)
+            reader = _HashingReader(tarball, hasher)
+            with closing(tarfile.open(fileobj=reader, mode='r|*')) as tar:
+                mkdirp(spec.prefix)
+                tar.extractall(spec.prefix, _prefix_members(tar, spec.prefix))
+            reader.drain()
+    except BaseException:
+        shutil.rmtree(spec.prefix, ignore_errors=True)
+        shutil.rmtree(tmpdir)
+        raise
+
+    # if the checksums don't match don't install
+    if bchecksum['hash'] != hasher.hexdigest():
+        shutil.rmtree(spec.prefix)
+        shutil.rmtree(tmpdir)
+        raise NoChecksumException(
+            "Package tarball failed checksum verification.\n"
+            "It cannot be installed.")
 
     # cleanup
-    os.remove(tarfile_path)
     os.remove(specfile_path)
 
     try:
@@ -789,10 +940,211 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
             os.remove(filename)
 
 
+class _HashingReader(object):
+    """Reads from a file object, and hashes all that is read."""
+
+    def __init__(self, fileobj, hasher, block_size=65536):
+        self.fileobj = fileobj
+        self.hasher = hasher
+        self.block_size = block_size
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+    def drain(self):
+        """Hash what is left to read, e.g. after the end of an archive."""
+        while self.read(self.block_size):
+            pass
+
+
+def _strip_top_directory(name):
+    parts = name.split('/', 1)
+    return parts[1] if len(parts) > 1 and parts[1] else '.'
+
+
+def _prefix_members(tar, prefix):
+    """Members of the tarball of a prefix, renamed relative to the prefix.
+
+    Members that would be extracted outside of the prefix, e.g. through a
+    symbolic link extracted before them, raise an exception: the tarball is
+    extracted before its checksum is verified.
+    """
+    root = os.path.realpath(prefix)
+    for member in tar:
+        member.name = _strip_top_directory(member.name)
+        names = [member.name]
+        if member.islnk():
+            member.linkname = _strip_top_directory(member.linkname)
+            names.append(member.linkname)
+
+        for name in names:
+            parent = os.path.realpath(
+                os.path.join(root, os.path.dirname(name)))
+            if os.path.isabs(name) or '..' in name.split('/') or \
+                    not (parent + os.sep).startswith(root + os.sep):
+                raise NoChecksumException(
+                    "Package tarball has a file outside of its prefix: "
+                    "{0}\nIt cannot be installed.".format(name))
+        yield member
+
+
 # Internal cache for downloaded specs
 _cached_specs = set()
 
 
+class BinaryCacheIndex(object):
+    """Local copies of the indices of build caches.
+
+    The index of each build cache is kept in the ``misc_cache``, and only
+    downloaded again when the hash published next to it changed or, for
+    build caches that do not publish it, when the server does not answer
+    "Not Modified" to a conditional request.  Indices are checked and read
+    once per Spack run, and their specs looked up by DAG hash.
+    """
+
+    def __init__(self):
+        #: cache prefix -> (hash of the index, {DAG hash: spec}), both None
+        #: if the index could not be read
+        self._indices = {}
+
+    def clear(self):
+        """Forget the indices read during this Spack run."""
+        self._indices.clear()
+
+    def invalidate(self, cache_prefix):
+        """Check the index of a build cache again the next time it is
+        needed, e.g. after it was updated.
+
+        Args:
+            cache_prefix (str): URL of the build cache
+        """
+        self._indices.pop(cache_prefix, None)
+
+    def specs(self, cache_prefix):
+        """Specs in the index of a build cache, by DAG hash.
+
+        Args:
+            cache_prefix (str): URL of the build cache
+
+        Return:
+            (dict) the specs, or None if the index could not be read and no
+            local copy of it exists
+        """
+        # The remote index is only checked the first time it is needed
+        if cache_prefix not in self._indices:
+            key = self._cache_key(cache_prefix)
+            index_hash = self._update(cache_prefix, key, self._read_meta(key))
+            specs = None
+            if index_hash is not None:
+                specs = self._read_specs(key)
+            if specs is None:
+                index_hash = None
+            self._indices[cache_prefix] = (index_hash, specs)
+        return self._indices[cache_prefix][1]
+
+    def find(self, spec, cache_prefix):
+        """Spec of the index of a build cache with the DAG hash of spec, or
+        None if there is none.
+        """
+        return (self.specs(cache_prefix) or {}).get(spec.dag_hash())
+
+    def _cache_key(self, cache_prefix):
+        digest = hashlib.sha1(cache_prefix.encode('utf-8')).hexdigest()
+        return os.path.join('build_cache', digest, 'index.json')
+
+    def _read_meta(self, key):
+        cache = spack.caches.misc_cache
+        try:
+            if not cache.init_entry(key + '.meta'):
+                return {}
+            with cache.read_transaction(key + '.meta') as f:
+                return json.load(f)
+        except (spack.error.SpackError, LockError, EnvironmentError,
+                ValueError) as e:
+            tty.debug('Cannot read build cache index metadata: %s' % str(e))
+            return {}
+
+    def _fetch_index_hash(self, cache_prefix):
+        hash_url = url_util.join(cache_prefix, 'index.json.hash')
+        try:
+            _, _, hash_file = web_util.read_from_url(hash_url)
+            return codecs.getreader('utf-8')(hash_file).read().strip()
+        except (URLError, web_util.SpackWebError) as url_err:
+            tty.debug('No index hash at {0}: {1}'.format(hash_url, url_err))
+            return None
+
+    def _update(self, cache_prefix, key, meta):
+        """Updates the local copy of an index, and returns its hash."""
+        cache = spack.caches.misc_cache
+        local_hash = None
+        if os.path.exists(cache.cache_path(key)):
+            local_hash = meta.get('index_hash')
+
+        remote_hash = self._fetch_index_hash(cache_prefix)
+        if local_hash and remote_hash == local_hash:
+            return local_hash
+
+        index_url = url_util.join(cache_prefix, 'index.json')
+        headers = {}
+        if local_hash and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        try:
+            _, response_headers, index_file = web_util.read_from_url(
+                index_url, 'application/json', headers=headers)
+            if index_file is None:
+                # Either not modified, or not JSON
+                if response_headers is None:
+                    tty.debug('Index is not JSON at {0}'.format(index_url))
+                return local_hash
+            index_contents = codecs.getreader('utf-8')(index_file).read()
+        except (URLError, web_util.SpackWebError) as url_err:
+            tty.debug('Failed to read index {0}: {1}'.format(
+                index_url, url_err))
+            return local_hash
+
+        try:
+            etag = web_util.get_header(response_headers, 'ETag')
+        except KeyError:
+            etag = None
+
+        index_hash = hashlib.sha256(
+            index_contents.encode('utf-8')).hexdigest()
+        try:
+            cache.init_entry(key)
+            with cache.write_transaction(key) as (old, new):
+                new.write(index_contents)
+            cache.init_entry(key + '.meta')
+            with cache.write_transaction(key + '.meta') as (old, new):
+                json.dump({'index_hash': index_hash, 'etag': etag,
+                           'url': cache_prefix}, new)
+        except (spack.error.SpackError, LockError, EnvironmentError) as e:
+            tty.debug('Cannot cache build cache index: %s' % str(e))
+            return None
+        return index_hash
+
+    def _read_specs(self, key):
+        cache = spack.caches.misc_cache
+        tmpdir = tempfile.mkdtemp()
+        try:
+            db = spack_db.Database(None, db_dir=os.path.join(tmpdir, 'db'),
+                                   enable_transaction_locking=False)
+            with cache.read_transaction(key):
+                db._read_from_file(cache.cache_path(key))
+            return dict((s.dag_hash(), s)
+                        for s in db.query_local(installed=False))
+        except (spack.error.SpackError, LockError, EnvironmentError) as e:
+            tty.debug('Cannot read build cache index: %s' % str(e))
+            return None
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+#: Indices of build caches read during this Spack run
+binary_index = BinaryCacheIndex()
+
+
 def try_download_specs(urls=None, force=False):
     '''
     Try to download the urls and cache them
@@ -875,31 +1227,14 @@ def get_specs(allarch=False):
         tty.msg("Finding buildcaches at %s" %
                 url_util.format(fetch_url_build_cache))
 
-        index_url = url_util.join(fetch_url_build_cache, 'index.json')
-
-        try:
-            _, _, file_stream = web_util.read_from_url(
-                index_url, 'application/json')
-            index_object = codecs.getreader('utf-8')(file_stream).read()
-        except (URLError, web_util.SpackWebError) as url_err:
+        indexed_specs = binary_index.specs(fetch_url_build_cache)
+        if indexed_specs is None:
+            index_url = url_util.join(fetch_url_build_cache, 'index.json')
             tty.error('Failed to read index {0}'.format(index_url))
-            tty.debug(url_err)
             # Just return whatever specs we may already have cached
             return _cached_specs
 
-        tmpdir = tempfile.mkdtemp()
-        index_file_path = os.path.join(tmpdir, 'index.json')
-        with open(index_file_path, 'w') as fd:
-            fd.write(index_object)
-
-        db_root_dir = os.path.join(tmpdir, 'db_root')
-        db = spack_db.Database(None, db_dir=db_root_dir,
-                               enable_transaction_locking=False)
-
-        db._read_from_file(index_file_path)
-        spec_list = db.query_local(installed=False)
-
-        for indexed_spec in spec_list:
+        for indexed_spec in indexed_specs.values():
             spec_arch = architecture.arch_for_spec(indexed_spec.architecture)
             if (allarch is True or spec_arch == arch):
                 _cached_specs.add(indexed_spec)
@@ -978,6 +1313,15 @@ def needs_rebuild(spec, mirror_url, rebuild_on_errors=False):
     # format of the name, in order to determine if the package
     # needs to be rebuilt.
     cache_prefix = build_cache_prefix(mirror_url)
+
+    # The index of the build cache records the full hashes of the packages,
+    # and spares fetching their spec.yaml when they match
+    indexed_spec = binary_index.find(spec, cache_prefix)
+    if indexed_spec is not None and indexed_spec._full_hash == pkg_full_hash:
+        tty.debug('{0} is up to date in the index of {1}'.format(
+            spec.short_spec, cache_prefix))
+        return False
+
     spec_yaml_file_name = tarball_name(spec, '.spec.yaml')
     file_path = os.path.join(cache_prefix, spec_yaml_file_name)
 
@@ -45,7 +45,7 @@
 import llnl.util.tty as tty
 from llnl.util.tty.color import cescape, colorize
 from llnl.util.filesystem import mkdirp, install, install_tree
-from llnl.util.lang import dedupe
+from llnl.util.lang import dedupe, memoized
 
 import spack.build_systems.cmake
 import spack.build_systems.meson
@@ -54,6 +54,7 @@
 import spack.paths
 import spack.schema.environment
 import spack.store
+import spack.util.jobserver
 import spack.architecture as arch
 from spack.util.string import plural
 from spack.util.environment import (
@@ -61,9 +62,10 @@
     EnvironmentModifications, validate, preserve_environment)
 from spack.util.environment import system_dirs
 from spack.error import NoLibrariesError, NoHeadersError
-from spack.util.executable import Executable
+from spack.util.executable import Executable, ProcessError
 from spack.util.module_cmd import load_module, get_path_from_module, module
 from spack.util.log_parse import parse_log_events, make_log_context
+from spack.version import Version
 
 
 #
@@ -108,11 +110,26 @@ class MakeExecutable(Executable):
 
        Note that if the SPACK_NO_PARALLEL_MAKE env var is set it overrides
        everything.
+
+       If a jobserver is given, executables that support it draw their
+       parallel jobs from it instead of being passed -j.
     """
 
-    def __init__(self, name, jobs):
+    def __init__(self, name, jobs, jobserver=None):
         super(MakeExecutable, self).__init__(name)
         self.jobs = jobs
+        self.jobserver = jobserver
+
+    def jobserver_makeflags(self):
+        """MAKEFLAGS making this executable draw its jobs from the
+        jobserver, or None if there is no jobserver it can use."""
+        if self.jobserver is None:
+            return None
+        if self.name != 'ninja':
+            return self.jobserver.makeflags
+        if _ninja_supports_jobserver(self.path):
+            return self.jobserver.fifo_makeflags
+        return None
 
     def __call__(self, *args, **kwargs):
         """parallel, and jobs_env from kwargs are swallowed and used here;
@@ -120,19 +137,46 @@ def __call__(self, *args, **kwargs):
         """
 
         disable = env_flag(SPACK_NO_PARALLEL_MAKE)
-        parallel = (not disable) and kwargs.pop('parallel', self.jobs > 1)
+        makeflags = self.jobserver_makeflags()
+        parallel = (not disable) and kwargs.pop(
+            'parallel', self.jobs > 1 or makeflags is not None)
 
+        extra_env = dict(kwargs.get('extra_env', {}))
         if parallel:
-            args = ('-j{0}'.format(self.jobs),) + args
+            if makeflags is None:
+                args = ('-j{0}'.format(self.jobs),) + args
+            else:
+                extra_env['MAKEFLAGS'] = makeflags
+                if makeflags == self.jobserver.makeflags:
+                    kwargs['pass_fds'] = (self.jobserver.read_fd,
+                                          self.jobserver.write_fd)
             jobs_env = kwargs.pop('jobs_env', None)
             if jobs_env:
                 # Caller wants us to set an environment variable to
                 # control the parallelism.
-                kwargs['extra_env'] = {jobs_env: str(self.jobs)}
-
+                extra_env[jobs_env] = str(self.jobs)
+        elif self.jobserver is not None:
+            # Keep the jobserver in the build environment from making this
+            # call parallel
+            extra_env['MAKEFLAGS'] = ''
+
+        if extra_env:
+            kwargs['extra_env'] = extra_env
         return super(MakeExecutable, self).__call__(*args, **kwargs)
 
 
+@memoized
+def _ninja_supports_jobserver(ninja):
+    """Ninja draws its jobs from a jobserver as of version 1.13, provided
+    it can open the jobserver by path."""
+    try:
+        output = Executable(ninja)(
+            '--version', output=str, error=os.devnull, fail_on_error=False)
+        return Version(output.strip()) >= Version('1.13')
+    except (ProcessError, ValueError):
+        return False
+
+
 def clean_environment():
     # Stuff in here sanitizes the build environment to eliminate
     # anything the user has set that may interfere. We apply it immediately
@@ -431,6 +475,13 @@ def set_build_environment_variables(pkg, env, dirty):
             raise RuntimeError("No ccache binary found in PATH")
         env.set(SPACK_CCACHE_BINARY, ccache)
 
+    # make draws its parallel jobs from the jobserver shared with the other
+    # builds, if any, through the MAKEFLAGS that MakeExecutable passes it.
+    # Other commands do not get the jobserver, and would only see stale
+    # descriptors in the MAKEFLAGS of a make running Spack.
+    if spack.util.jobserver.active() is not None:
+        env.unset('MAKEFLAGS')
+
     # Add any pkgconfig directories to PKG_CONFIG_PATH
     for prefix in build_link_prefixes:
         for directory in ('lib', 'lib64', 'share'):
@@ -453,14 +504,16 @@ def _set_variables_for_single_module(pkg, module):
     jobs = min(jobs, multiprocessing.cpu_count())
     assert jobs is not None, "no default set for config:build_jobs"
 
+    jobserver = spack.util.jobserver.active() if pkg.parallel else None
+
     m = module
     m.make_jobs = jobs
 
     # TODO: make these build deps that can be installed if not found.
-    m.make = MakeExecutable('make', jobs)
-    m.gmake = MakeExecutable('gmake', jobs)
+    m.make = MakeExecutable('make', jobs, jobserver)
+    m.gmake = MakeExecutable('gmake', jobs, jobserver)
     m.scons = MakeExecutable('scons', jobs)
-    m.ninja = MakeExecutable('ninja', jobs)
+    m.ninja = MakeExecutable('ninja', jobs, jobserver)
 
     # easy shortcut to os.environ
     m.env = os.environ
@@ -830,6 +883,35 @@ def child_fun():
     passes it to the parent wrapped in a ChildError.  The parent is
     expected to handle (or re-raise) the ChildError.
     """
+    return start_build_process(pkg, function, dirty, fake).complete()
+
+
+def start_build_process(pkg, function, dirty, fake, jobs=None,
+                        forward_input=True):
+    """Start a child process to do part of a spack build, without waiting
+    for it to finish.
+
+    This is the non-blocking counterpart of ``fork()``, which lets the
+    caller run several builds at once.
+
+    Args:
+
+        pkg (PackageBase): package whose environment we should set up the
+            forked process for.
+        function (callable): argless function to run in the child
+            process.
+        dirty (bool): If True, do NOT clean the environment before
+            building.
+        fake (bool): If True, skip package setup b/c it's not a real build
+        jobs (int): number of parallel jobs the child may use for the build,
+            instead of ``config:build_jobs`` (or None)
+        forward_input (bool): If True, the child reads from the parent's
+            terminal, which allows toggling verbosity.  Only one child at a
+            time can do so.
+
+    Return:
+        (BuildProcess) the running child process
+    """
 
     def child_process(child_pipe, input_stream):
         # We are in the child process. Python sets sys.stdin to
@@ -841,6 +923,11 @@ def child_process(child_pipe, input_stream):
             sys.stdin = input_stream
 
         try:
+            if jobs is not None:
+                # The build gets its share of the jobs over all other scopes
+                spack.config.config.push_scope(
+                    spack.config.InternalConfigScope(
+                        'build_process', {'config': {'build_jobs': jobs}}))
             if not fake:
                 setup_package(pkg, dirty=dirty)
             return_value = function()
@@ -882,7 +969,8 @@ def child_process(child_pipe, input_stream):
     input_stream = None
     try:
         # Forward sys.stdin when appropriate, to allow toggling verbosity
-        if sys.stdin.isatty() and hasattr(sys.stdin, 'fileno'):
+        if forward_input and sys.stdin.isatty() and \
+                hasattr(sys.stdin, 'fileno'):
             input_stream = os.fdopen(os.dup(sys.stdin.fileno()))
 
         p = multiprocessing.Process(
@@ -898,27 +986,71 @@ def child_process(child_pipe, input_stream):
         if input_stream is not None:
             input_stream.close()
 
-    child_result = parent_pipe.recv()
-    p.join()
+    # Only the child writes to its end of the pipe
+    child_pipe.close()
 
-    # If returns a StopPhase, raise it
-    if isinstance(child_result, StopPhase):
-        # do not print
-        raise child_result
+    return BuildProcess(pkg, p, parent_pipe)
 
-    # let the caller know which package went wrong.
-    if isinstance(child_result, InstallError):
-        child_result.pkg = pkg
 
-    if isinstance(child_result, ChildError):
-        # If the child process raised an error, print its output here rather
-        # than waiting until the call to SpackError.die() in main(). This
-        # allows exception handling output to be logged from within Spack.
-        # see spack.main.SpackCommand.
-        child_result.print_context()
-        raise child_result
+class BuildProcess(object):
+    """A child process started by ``start_build_process()``.
 
-    return child_result
+    Build processes have a ``fileno()``, so the parent can wait for any of
+    several builds to finish with ``select()``.
+    """
+
+    def __init__(self, pkg, process, pipe):
+        #: Package being built
+        self.pkg = pkg
+        self.process = process
+        self.pipe = pipe
+
+    def fileno(self):
+        """File descriptor that becomes readable when the build is over."""
+        return self.pipe.fileno()
+
+    def complete(self):
+        """Wait for the build to finish and return the value returned by
+        the function run in the child.
+
+        Raises the ``StopPhase`` or ``ChildError`` sent by the child.
+        """
+        try:
+            child_result = self.pipe.recv()
+        except EOFError:
+            # The child died without reporting back (e.g., it was killed)
+            self.process.join()
+            raise InstallError('{0}: build process exited with code {1}'
+                               .format(self.pkg.name, self.process.exitcode))
+        finally:
+            self.pipe.close()
+        self.process.join()
+
+        # If returns a StopPhase, raise it
+        if isinstance(child_result, StopPhase):
+            # do not print
+            raise child_result
+
+        # let the caller know which package went wrong.
+        if isinstance(child_result, InstallError):
+            child_result.pkg = self.pkg
+
+        if isinstance(child_result, ChildError):
+            # If the child process raised an error, print its output here
+            # rather than waiting until the call to SpackError.die() in
+            # main(). This allows exception handling output to be logged
+            # from within Spack. see spack.main.SpackCommand.
+            child_result.print_context()
+            raise child_result
+
+        return child_result
+
+    def terminate(self):
+        """Stop the build without waiting for its result."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.pipe.close()
 
 
 def get_package_context(traceback, context=3):
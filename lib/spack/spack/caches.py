@@ -21,7 +21,8 @@ def _misc_cache():
     """The ``misc_cache`` is Spack's cache for small data.
 
     Currently the ``misc_cache`` stores indexes for virtual dependency
-    providers and for which packages provide which tags.
+    providers and for which packages provide which tags, and the output of
+    compilers run to query their versions and implicit link paths.
     """
     path = spack.config.get('config:misc_cache')
     if not path:
@@ -61,7 +62,19 @@ def store(self, fetcher, relative_dest):
         # normally be cached (e.g. the current tip of an hg/git branch)
         dst = os.path.join(self.root, relative_dest)
         mkdirp(os.path.dirname(dst))
-        fetcher.archive(dst)
+
+        # Archive to a temporary file first, so that a mirror creation that
+        # is interrupted does not leave partial archives behind, which the
+        # next attempt would take for complete ones.  The temporary file
+        # keeps the extension of the archive, which fetchers may check
+        tmp = os.path.join(
+            os.path.dirname(dst), '.tmp-' + os.path.basename(dst))
+        try:
+            fetcher.archive(tmp)
+            os.rename(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
     def symlink(self, mirror_ref):
         """Symlink a human readible path in our mirror to the actual
@@ -229,6 +229,10 @@ def setup_parser(subparser):
         'update-index', help=buildcache_update_index.__doc__)
     update_index.add_argument(
         '-d', '--mirror-url', default=None, help='Destination mirror url')
+    update_index.add_argument(
+        '-f', '--force', action='store_true',
+        help='rebuild the index from all the spec files, ignoring the '
+             'existing index')
     update_index.set_defaults(func=buildcache_update_index)
 
 
@@ -748,7 +752,8 @@ def buildcache_update_index(args):
     outdir = url_util.format(mirror.push_url)
 
     bindist.generate_package_index(
-        url_util.join(outdir, bindist.build_cache_relative_path()))
+        url_util.join(outdir, bindist.build_cache_relative_path()),
+        force=args.force)
 
 
 def buildcache(parser, args):
@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import spack.cmd.common.arguments as arguments
 import spack.environment as ev
 
 description = 'concretize an environment and write a lockfile'
@@ -14,11 +15,12 @@ def setup_parser(subparser):
     subparser.add_argument(
         '-f', '--force', action='store_true',
         help="Re-concretize even if already concretized.")
+    arguments.add_common_arguments(subparser, ['jobs'])
 
 
 def concretize(parser, args):
     env = ev.get_env(args, 'concretize', required=True)
     with env.write_transaction():
-        concretized_specs = env.concretize(force=args.force)
+        concretized_specs = env.concretize(force=args.force, jobs=args.jobs)
         ev.display_specs(concretized_specs)
         env.write()
@@ -73,6 +73,7 @@ def create_db_tarball(args):
     wd = os.path.dirname(str(spack.store.root))
     with working_dir(wd):
         files = [spack.store.db._index_path]
+        files += glob(spack.store.db._journal_path)
         files += glob('%s/*/*/*/.spack/spec.yaml' % base)
         files = [os.path.relpath(f) for f in files]
 
@@ -45,6 +45,7 @@ def update_kwargs_from_args(args, kwargs):
         'explicit': True,  # Always true for install command
         'stop_at': args.until,
         'unsigned': args.unsigned,
+        'concurrent_packages': args.concurrent_packages,
     })
 
     kwargs.update({
@@ -76,6 +77,9 @@ def setup_parser(subparser):
         '-u', '--until', type=str, dest='until', default=None,
         help="phase to stop after when installing (default None)")
     arguments.add_common_arguments(subparser, ['jobs'])
+    subparser.add_argument(
+        '--concurrent-packages', type=int, metavar='N', default=None,
+        help="build up to N packages at the same time, sharing the jobs")
     subparser.add_argument(
         '--overwrite', action='store_true',
         help="reinstall an existing spec, even if it has dependents")
@@ -309,6 +313,13 @@ def install(parser, args, **kwargs):
     # that will be passed to Package.do_install API
     update_kwargs_from_args(args, kwargs)
 
+    if args.concurrent_packages is not None and args.concurrent_packages < 1:
+        tty.die('--concurrent-packages must be a positive integer')
+
+    # Reports are gathered one package build at a time
+    if args.log_format is not None:
+        kwargs['concurrent_packages'] = 1
+
     if args.run_tests:
         tty.warn("Deprecated option: --run-tests: use --test=all instead")
 
@@ -50,8 +50,8 @@ def packages_to_maintainers(package_names=None):
 
     pkg_to_users = defaultdict(lambda: set())
     for name in package_names:
-        cls = spack.repo.path.get_pkg_class(name)
-        for user in cls.maintainers:
+        pkg = spack.repo.path.get_metadata(name)
+        for user in pkg.maintainers:
             pkg_to_users[name].add(user)
 
     return pkg_to_users
@@ -60,11 +60,11 @@ def packages_to_maintainers(package_names=None):
 def maintainers_to_packages(users=None):
     user_to_pkgs = defaultdict(lambda: [])
     for name in spack.repo.path.all_package_names():
-        cls = spack.repo.path.get_pkg_class(name)
-        for user in cls.maintainers:
+        pkg = spack.repo.path.get_metadata(name)
+        for user in pkg.maintainers:
             lower_users = [u.lower() for u in users]
             if not users or user.lower() in lower_users:
-                user_to_pkgs[user].append(cls.name)
+                user_to_pkgs[user].append(pkg.name)
 
     return user_to_pkgs
 
@@ -73,8 +73,8 @@ def maintained_packages():
     maintained = []
     unmaintained = []
     for name in spack.repo.path.all_package_names():
-        cls = spack.repo.path.get_pkg_class(name)
-        if cls.maintainers:
+        pkg = spack.repo.path.get_metadata(name)
+        if pkg.maintainers:
             maintained.append(name)
         else:
             unmaintained.append(name)
@@ -65,6 +65,13 @@ def setup_parser(subparser):
         '-n', '--versions-per-spec',
         help="the number of versions to fetch for each spec, choose 'all' to"
              " retrieve all versions of each package")
+    create_parser.add_argument(
+        '-j', '--jobs', type=int, default=8,
+        help="number of archives to fetch at the same time (default: 8)")
+    create_parser.add_argument(
+        '--jobs-per-host', type=int, default=4,
+        help="number of archives to fetch from the same host at the same"
+             " time (default: 4)")
     arguments.add_common_arguments(create_parser, ['specs'])
 
     # used to construct scope arguments below
@@ -344,7 +351,8 @@ def mirror_create(args):
 
     # Actually do the work to create the mirror
     present, mirrored, error = spack.mirror.create(
-        directory, mirror_specs, args.skip_unstable_versions)
+        directory, mirror_specs, args.skip_unstable_versions,
+        jobs=args.jobs, jobs_per_host=args.jobs_per_host)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -28,11 +28,18 @@ def setup_parser(subparser):
     sp = subparser.add_subparsers(metavar='SUBCOMMAND', dest='subparser_name')
 
     refresh_parser = sp.add_parser('refresh', help='regenerate module files')
-    refresh_parser.add_argument(
+    refresh_mode = refresh_parser.add_mutually_exclusive_group()
+    refresh_mode.add_argument(
         '--delete-tree',
         help='delete the module file tree before refresh',
         action='store_true'
     )
+    refresh_mode.add_argument(
+        '--incremental',
+        help='only refresh module files of specs installed or uninstalled, '
+             'or whose configuration changed, since the last refresh',
+        action='store_true'
+    )
     refresh_parser.add_argument(
         '--upstream-modules',
         help='generate modules for packages installed upstream',
@@ -292,23 +299,38 @@ def refresh(module_type, specs, args):
     # If we arrived here we have at least one writer
     module_type_root = writers[0].layout.dirname()
 
+    obsolete = {}
+    if args.incremental:
+        writers, obsolete = spack.modules.common.outdated_module_files(
+            module_type_root, writers)
+        if not writers and not obsolete:
+            msg = '{0} module files are up to date.'
+            tty.msg(msg.format(module_type))
+            return
+
     # Proceed regenerating module files
     tty.msg('Regenerating {name} module files'.format(name=module_type))
     if os.path.isdir(module_type_root) and args.delete_tree:
         shutil.rmtree(module_type_root, ignore_errors=False)
     filesystem.mkdirp(module_type_root)
 
+    # Remove the module files of specs that are not installed anymore,
+    # unless the module file of another spec took their place
+    for entry in obsolete.values():
+        if (entry['path'] not in file2writer and
+                os.path.exists(entry['path'])):
+            tty.debug('\tREMOVE: {0}'.format(entry['path']))
+            os.remove(entry['path'])
+
+    # Module files that did not change since they were last written are
+    # skipped, according to the content hashes in the module index
+    content_hashes = spack.modules.common.write_module_files(
+        module_type_root, writers, overwrite=args.delete_tree)
+
     # Dump module index after potentially removing module tree
     spack.modules.common.generate_module_index(
-        module_type_root, writers, overwrite=args.delete_tree)
-    for x in writers:
-        try:
-            x.write(overwrite=True)
-        except Exception as e:
-            tty.debug(e)
-            msg = 'Could not write module file [{0}]'
-            tty.warn(msg.format(x.layout.filename))
-            tty.warn('\t--> {0} <--'.format(str(e)))
+        module_type_root, writers, overwrite=args.delete_tree,
+        content_hashes=content_hashes, removed=list(obsolete))
 
 
 #: Dictionary populated with the list of sub-commands.
@@ -57,6 +57,15 @@ def setup_parser(subparser):
         default=spack.config.default_modify_scope(),
         help="configuration scope to modify")
 
+    # Reindex
+    reindex_parser = sp.add_parser('reindex', help=repo_reindex.__doc__)
+    reindex_parser.add_argument(
+        '-f', '--force', action='store_true',
+        help="regenerate the indexes from scratch")
+    reindex_parser.add_argument(
+        'namespaces', nargs='*',
+        help="namespaces of the repositories to reindex (default: all)")
+
 
 def repo_create(args):
     """Create a new package repository."""
@@ -154,10 +163,24 @@ def repo_list(args):
         print(fmt % (repo.namespace, repo.root))
 
 
+def repo_reindex(args):
+    """Update the package indexes of repositories."""
+    if args.namespaces:
+        repos = [spack.repo.path.get_repo(ns) for ns in args.namespaces]
+    else:
+        repos = spack.repo.path.repos
+
+    for repo in repos:
+        count = repo.index.reindex(force=args.force)
+        tty.msg("Indexed %d package%s in '%s'." % (
+            count, '' if count == 1 else 's', repo.namespace))
+
+
 def repo(parser, args):
     action = {'create': repo_create,
               'list': repo_list,
               'add': repo_add,
               'remove': repo_remove,
-              'rm': repo_remove}
+              'rm': repo_remove,
+              'reindex': repo_reindex}
     action[args.repo_command](args)
@@ -25,6 +25,12 @@ def setup_parser(subparser):
                            help="Ouptut json-formatted errors")
     subparser.add_argument('-a', '--all', action='store_true',
                            help="Verify all packages")
+    subparser.add_argument('--fast', action='store_true',
+                           help="Do not hash files whose size and "
+                           "modification time are unchanged")
+    subparser.add_argument('--jobs', type=int, default=None,
+                           help="Number of packages, or files of a single "
+                           "package, verified at the same time")
     subparser.add_argument('specs_or_files', nargs=argparse.REMAINDER,
                            help="Specs or files to verify")
 
@@ -48,7 +54,7 @@ def verify(parser, args):
             return 1
 
         for file in args.specs_or_files:
-            results = spack.verify.check_file_manifest(file)
+            results = spack.verify.check_file_manifest(file, args.fast)
             if results.has_errors():
                 if args.json:
                     print(results.json_string())
@@ -81,9 +87,9 @@ def verify(parser, args):
         setup_parser.parser.print_help()
         return 1
 
-    for spec in specs:
-        tty.debug("Verifying package %s")
-        results = spack.verify.check_spec_manifest(spec)
+    tty.debug("Verifying %d packages" % len(specs))
+    for spec, results in spack.verify.check_spec_manifests(
+            specs, args.fast, args.jobs):
         if results.has_errors():
             if args.json:
                 print(results.json_string())
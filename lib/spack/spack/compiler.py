@@ -4,6 +4,8 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import contextlib
+import hashlib
+import json
 import os
 import platform
 import re
@@ -15,13 +17,16 @@
 from llnl.util.filesystem import (
     path_contains_subdirectory, paths_containing_libs)
 import llnl.util.tty as tty
+from llnl.util.lock import LockError
 
+import spack.caches
 import spack.error
 import spack.spec
 import spack.architecture
 import spack.util.executable
 import spack.util.module_cmd
 import spack.compilers
+import spack.util.spack_json as sjson
 from spack.util.environment import filter_system_paths
 
 __all__ = ['Compiler']
@@ -170,6 +175,54 @@ def in_system_subdirectory(path):
     return any(path_contains_subdirectory(path, x) for x in system_dirs)
 
 
+def _executable_id(path):
+    """Identify the file of an executable by its real path, inode, size and
+    modification time, or return None if it is not an existing file given
+    by an absolute path."""
+    if not path or not os.path.isabs(path):
+        return None
+    try:
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_ino, stat.st_size, stat.st_mtime]
+
+
+def _cached_compiler_output(key, run):
+    """Run a compiler, or return what it output when it was run the same way
+    before, from the ``misc_cache``.
+
+    The output of compilers is cached raw, so that it is still parsed by the
+    current code.  Errors raised when running the compiler are not cached,
+    and the cache is skipped if it cannot be used.
+
+    Args:
+        key (dict): what determines the output of the compiler: the
+            ``_executable_id()`` of its executable, its arguments, etc.
+        run (callable): runs the compiler and returns its output
+    """
+    sha = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8'))
+    cache_key = os.path.join('compilers', sha.hexdigest() + '.json')
+    cache = spack.caches.misc_cache
+
+    try:
+        if cache.init_entry(cache_key):
+            with cache.read_transaction(cache_key) as f:
+                return sjson.load(f)['output']
+    except (spack.error.SpackError, LockError, EnvironmentError,
+            KeyError, TypeError, ValueError) as e:
+        tty.debug('Cannot read cached compiler output: %s' % str(e))
+
+    output = run()
+    try:
+        with cache.write_transaction(cache_key) as (old, new):
+            sjson.dump({'output': output}, new)
+    except (spack.error.SpackError, LockError, EnvironmentError) as e:
+        tty.debug('Cannot cache compiler output: %s' % str(e))
+    return output
+
+
 class Compiler(object):
     """This class encapsulates a Spack "compiler", which includes C,
        C++, and Fortran compilers.  Subclasses should implement
@@ -375,11 +428,9 @@ def _get_compiler_link_paths(self, paths):
                 for flag in self.flags.get(flag_type, []):
                     compiler_exe.add_default_arg(flag)
 
-            output = ''
-            with self._compiler_environment():
-                output = str(compiler_exe(
-                    self.verbose_flag, fin, '-o', fout,
-                    output=str, error=str))  # str for py2
+            output = self._compiler_output(
+                compiler_exe, [self.verbose_flag],
+                temporary_args=[fin, '-o', fout])
             return _parse_non_system_link_dirs(output)
         except spack.util.executable.ProcessError as pe:
             tty.debug('ProcessError: Command exited with non-zero status: ' +
@@ -492,11 +543,48 @@ def get_real_version(self):
         modifications) to enable the compiler to run properly on any platform.
         """
         cc = spack.util.executable.Executable(self.cc)
-        with self._compiler_environment():
-            output = cc(self.version_argument,
-                        output=str, error=str,
-                        ignore_errors=tuple(self.ignore_version_errors))
-            return self.extract_version_from_output(output)
+        output = self._compiler_output(
+            cc, [self.version_argument],
+            ignore_errors=tuple(self.ignore_version_errors))
+        return self.extract_version_from_output(output)
+
+    def _compiler_output(self, compiler_exe, args, temporary_args=(),
+                         ignore_errors=()):
+        """Run a compiler executable in the environment of the compiler,
+        and return its output and error streams.
+
+        Spack runs compilers the same way over and over, so their outputs are
+        cached for as long as the executable, its arguments, the modules and
+        the environment modifications of the compiler remain the same.
+
+        Args:
+            compiler_exe (Executable): compiler to run
+            args (list): arguments to pass to the compiler
+            temporary_args (list): arguments passed after ``args`` that are
+                not part of the key of the cache, like paths to temporary
+                files
+            ignore_errors (tuple): return codes to ignore, as for
+                ``Executable``
+        """
+        def run():
+            with self._compiler_environment():
+                return str(compiler_exe(
+                    *(list(args) + list(temporary_args)),
+                    output=str, error=str,
+                    ignore_errors=ignore_errors))  # str for py2
+
+        executable_id = _executable_id(compiler_exe.exe[0])
+        if executable_id is None:
+            return run()
+
+        key = {
+            'executable': executable_id,
+            'arguments': compiler_exe.exe[1:] + list(args),
+            'ignore_errors': list(ignore_errors),
+            'modules': list(self.modules),
+            'environment': self.environment or {},
+        }
+        return _cached_compiler_output(key, run)
 
     #
     # Compiler classes have methods for querying the version of
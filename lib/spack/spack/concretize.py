@@ -16,6 +16,8 @@
 """
 from __future__ import print_function
 
+import hashlib
+import json
 import platform
 import os.path
 import tempfile
@@ -28,14 +30,19 @@
 
 import llnl.util.lang
 import llnl.util.cpu as cpu
+from llnl.util.lock import LockError
 
 import spack.repo
 import spack.abi
+import spack.caches
+import spack.config
+import spack.hash_types as ht
 import spack.spec
 import spack.compilers
 import spack.architecture
 import spack.error
 import spack.tengine
+import spack.util.spack_json as sjson
 from spack.config import config
 from spack.version import ver, Version, VersionList, VersionRange
 from spack.package_prefs import PackagePrefs, spec_externals, is_spec_buildable
@@ -598,6 +605,150 @@ def enable_compiler_existence_check():
     Concretizer.check_for_compiler_existence = saved
 
 
+class ConcretizationCache(object):
+    """Memoizes the concrete specs that abstract specs concretize to.
+
+    Concretizing specs depends only on the abstract specs, on the
+    configuration of packages and compilers, on the platform and on the
+    package files of the repositories, so concrete specs are reused for as
+    long as none of these change: the key of each concretization is a digest
+    of all of them.
+
+    Concrete specs are kept in memory for the rest of the Spack run, and in
+    the ``misc_cache`` for later runs if ``config:concretization_cache`` is
+    true.
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._enabled = True
+
+    @contextmanager
+    def disabled(self):
+        """Neither reuse nor memoize concretizations in this context."""
+        saved, self._enabled = self._enabled, False
+        try:
+            yield
+        finally:
+            self._enabled = saved
+
+    def clear(self):
+        """Forget the concretizations memoized in memory."""
+        self._specs = {}
+
+    def key(self, abstract_specs, tests=False):
+        """Digest of everything the concretization of abstract specs depends
+        on.
+
+        Args:
+            abstract_specs (list): specs to be concretized
+            tests (list or bool): packages that need test dependencies, as
+                for ``Spec.concretize()``
+
+        Return:
+            (str) the key of the concretization, or ``None`` if it cannot
+            be memoized
+        """
+        repos = getattr(spack.repo.path, 'repos', None)
+        if not self._enabled or not repos or \
+                not all(hasattr(r, 'packages_digest') for r in repos):
+            return None
+
+        # Specs depending on concrete specs, e.g. installed ones selected by
+        # hash, may differ from other concrete specs with the same content
+        if any(s.concrete for spec in abstract_specs
+               for s in spec.traverse()):
+            return None
+
+        check_for_compiler_existence = \
+            Concretizer.check_for_compiler_existence
+        if check_for_compiler_existence is None:
+            check_for_compiler_existence = not spack.config.get(
+                'config:install_missing_compilers', False)
+
+        platform = spack.architecture.platform()
+        key = {
+            'spack': spack.spack_version,
+            'specs': [[str(spec)] + [s.namespace for s in spec.traverse()]
+                      for spec in abstract_specs],
+            'tests': sorted(tests) if isinstance(tests, list) else tests,
+            'packages': spack.config.get('packages'),
+            'compilers': spack.config.get('compilers'),
+            'check_for_compiler_existence': check_for_compiler_existence,
+            'platform': [str(platform),
+                         str(platform.operating_system('default_os')),
+                         str(platform.target('default_target'))],
+            'repos': [[r.namespace, r.root, r.packages_digest()]
+                      for r in repos],
+        }
+        text = json.dumps(key, sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Concrete specs memoized under a key, or ``None``.
+
+        The specs returned are copies, which callers can modify.
+        """
+        if key is None:
+            return None
+
+        specs = self._specs.get(key)
+        if specs is None and self._on_disk():
+            specs = self._read(key)
+            if specs is not None:
+                self._specs[key] = specs
+
+        if specs is None:
+            return None
+        return [s.copy() for s in specs]
+
+    def put(self, key, concrete_specs):
+        """Memoize concrete specs under a key."""
+        if key is None:
+            return
+
+        self._specs[key] = [s.copy() for s in concrete_specs]
+        if self._on_disk():
+            self._write(key, concrete_specs)
+
+    def _on_disk(self):
+        return spack.config.get('config:concretization_cache', False)
+
+    def _cache_key(self, key):
+        return os.path.join('concretization', key + '.json')
+
+    def _read(self, key):
+        cache = spack.caches.misc_cache
+        try:
+            if not cache.init_entry(self._cache_key(key)):
+                return None
+            with cache.read_transaction(self._cache_key(key)) as f:
+                specs = [spack.spec.Spec.from_dict(d)
+                         for d in sjson.load(f)['specs']]
+        except (spack.error.SpackError, LockError, EnvironmentError,
+                KeyError, TypeError, ValueError) as e:
+            tty.debug('Cannot read memoized concretization: %s' % str(e))
+            return None
+
+        for spec in specs:
+            spec._mark_concrete()
+        return specs
+
+    def _write(self, key, concrete_specs):
+        cache = spack.caches.misc_cache
+        try:
+            cache.init_entry(self._cache_key(key))
+            with cache.write_transaction(self._cache_key(key)) as (old, new):
+                sjson.dump({'specs': [s.to_dict(hash=ht.build_hash)
+                                      for s in concrete_specs]}, new)
+        except (spack.error.SpackError, LockError, EnvironmentError) as e:
+            tty.debug('Cannot memoize concretization: %s' % str(e))
+
+
+#: Concretizations memoized during this Spack run
+concretization_cache = ConcretizationCache()
+
+
 def find_spec(spec, condition, default=None):
     """Searches the dag from spec in an intelligent order and looks
        for a spec that matches a condition"""
@@ -679,17 +830,27 @@ def make_concretization_repository(abstract_specs):
         return spack.repo.Repo(repo_path)
 
     abstract_specs = [spack.spec.Spec(s) for s in abstract_specs]
+
+    # The helper repository differs every time: memoize its result instead
+    key = concretization_cache.key(abstract_specs)
+    concrete_specs = concretization_cache.get(key)
+    if concrete_specs:
+        return concrete_specs
+
     concretization_repository = make_concretization_repository(abstract_specs)
 
     with spack.repo.additional_repository(concretization_repository):
-        # Spec from a helper package that depends on all the abstract_specs
-        concretization_root = spack.spec.Spec('concretizationroot')
-        concretization_root.concretize()
+        with concretization_cache.disabled():
+            # Spec from a helper package that depends on all the
+            # abstract_specs
+            concretization_root = spack.spec.Spec('concretizationroot')
+            concretization_root.concretize()
         # Retrieve the direct dependencies
         concrete_specs = [
             concretization_root[spec.name].copy() for spec in abstract_specs
         ]
 
+    concretization_cache.put(key, concrete_specs)
     return concrete_specs
 
 
@@ -22,6 +22,8 @@
 
 import contextlib
 import datetime
+import functools
+import json
 import os
 import six
 import socket
@@ -37,11 +39,13 @@
 import llnl.util.filesystem as fs
 import llnl.util.tty as tty
 
+import spack.dependency as dp
 import spack.repo
 import spack.spec
 import spack.store
 import spack.util.lock as lk
 import spack.util.spack_json as sjson
+import spack.version as vn
 from spack.directory_layout import DirectoryLayoutError
 from spack.error import SpackError
 from spack.filesystem_view import YamlFilesystemView
@@ -63,7 +67,7 @@ def nullcontext(*args, **kwargs):
 # DB version.  This is stuck in the DB file to track changes in format.
 # Increment by one when the database format changes.
 # Versions before 5 were not integers.
-_db_version = Version('5')
+_db_version = Version('6')
 
 # For any version combinations here, skip reindex when upgrading.
 # Reindexing can take considerable time and is not always necessary.
@@ -74,6 +78,11 @@ def nullcontext(*args, **kwargs):
     # fields.  So, skip the reindex for this transition. The new
     # version is saved to disk the first time the DB is written.
     (Version('0.9.3'), Version('5')),
+    # v6 adds the index journal. Records are unchanged, and an index.json
+    # without a journal id is read the same way. The version is bumped so
+    # that older Spacks, which would miss the journaled records and then
+    # drop the journal id when writing, refuse the store instead.
+    (Version('5'), Version('6')),
 ]
 
 # Default timeout for spack database locks in seconds or None (no timeout).
@@ -93,6 +102,15 @@ def nullcontext(*args, **kwargs):
 # Types of dependencies tracked by the database
 _tracked_deps = ('link', 'run')
 
+# Write transactions append their changes to a journal next to index.json
+# instead of rewriting the whole index.  Once the journal grows past this
+# fraction of the size of index.json, the next write transaction compacts
+# it back into index.json.
+_journal_compaction_ratio = 0.5
+
+# Journals smaller than this many bytes are never compacted.
+_journal_min_compaction_size = 1024 * 1024
+
 # Default list of fields written for each install record
 default_install_record_fields = [
     'spec',
@@ -110,6 +128,13 @@ def _now():
     return time.time()
 
 
+def _new_journal_id():
+    """Returns a unique identifier tying a journal to its index.json"""
+    if _use_uuid:
+        return str(uuid.uuid4())
+    return '%s.%s.%s' % (socket.getfqdn(), os.getpid(), _now())
+
+
 def _autospec(function):
     """Decorator that automatically converts the argument of a single-arg
        function to a Spec."""
@@ -167,6 +192,10 @@ class InstallRecord(object):
     actually remove from the database until a spec has no installed
     dependents left.
 
+    Records read from the database index only keep the node dict of
+    their spec (see ``defer_spec()``), and construct the spec the first
+    time it is accessed.
+
     Args:
         spec (Spec): spec tracked by the install record
         path (str): path where the spec has been installed
@@ -195,6 +224,29 @@ def __init__(
         self.installation_time = installation_time or _now()
         self.deprecated_for = deprecated_for
 
+    @property
+    def spec(self):
+        if self._spec is None and self._read_spec is not None:
+            self._spec = self._read_spec(self._spec_dict)
+            self._spec_dict = self._read_spec = None
+        return self._spec
+
+    @spec.setter
+    def spec(self, spec):
+        self._spec = spec
+        self._spec_dict = self._read_spec = None
+        self.name = spec.name if spec else None
+
+    def defer_spec(self, spec_dict, read_spec):
+        """Keep only the node dict of the spec tracked by this record, and
+        construct the spec with ``read_spec(spec_dict)`` when it is first
+        needed.
+        """
+        self._spec = None
+        self._spec_dict = spec_dict
+        self._read_spec = read_spec
+        self.name = next(iter(spec_dict))
+
     def install_type_matches(self, installed):
         installed = InstallStatuses.canonicalize(installed)
         if self.installed:
@@ -209,7 +261,11 @@ def to_dict(self, include_fields=default_install_record_fields):
 
         for field_name in include_fields:
             if field_name == 'spec':
-                rec_dict.update({'spec': self.spec.to_node_dict()})
+                if self._spec is None and self._spec_dict is not None:
+                    # No need to construct the spec just to write it out
+                    rec_dict.update({'spec': self._spec_dict})
+                else:
+                    rec_dict.update({'spec': self.spec.to_node_dict()})
             elif field_name == 'deprecated_for' and self.deprecated_for:
                 rec_dict.update({'deprecated_for': self.deprecated_for})
             else:
@@ -232,6 +288,207 @@ def from_dict(cls, spec, dictionary):
         return InstallRecord(spec, **d)
 
 
+def _record_facets(rec):
+    """Return the version, compiler and architecture of the spec tracked by
+    a record, as hashable keys, and a dict mapping the hashes of its tracked
+    dependencies to their dependency types.
+
+    Records whose spec was not read yet are indexed from its node dict.
+    Facets that cannot be determined are None.
+    """
+    spec = rec._spec
+    if spec is not None:
+        version = spec.versions.concrete
+        version = str(version) if version is not None else None
+        compiler = str(spec.compiler) if spec.compiler else None
+        arch = None
+        if spec.architecture:
+            arch = (spec.architecture.platform,
+                    spec.architecture.os,
+                    spec.architecture.target and str(spec.architecture.target))
+        dependencies = dict(
+            (dspec.spec.dag_hash(), dspec.deptypes)
+            for dspec in spec.dependencies_dict(_tracked_deps).values())
+        return version, compiler, arch, dependencies
+
+    node = rec._spec_dict[rec.name]
+    version = node.get('version')
+    compiler = node.get('compiler')
+    if compiler and 'version' in compiler:
+        compiler = '%s@%s' % (compiler['name'], compiler['version'])
+    else:
+        compiler = None
+    arch = node.get('arch')
+    if arch:
+        target = arch.get('target')
+        if isinstance(target, dict):
+            target = target.get('name')
+        arch = (arch.get('platform'), arch.get('platform_os'), target)
+    dependencies = dict(
+        (dhash, tuple(sorted(dtypes)))
+        for _, dhash, dtypes in spack.spec.Spec.read_yaml_dep_specs(
+            node.get('dependencies', {}))
+        if any(t in _tracked_deps for t in dtypes))
+    return version, compiler, arch, dependencies
+
+
+class InstallRecordMap(dict):
+    """Maps DAG hashes to the install records of a database.
+
+    The map also indexes records by package name, version, compiler and
+    architecture, and keeps track of the dependencies and dependents of
+    each record.  Queries use these indexes to only look at (and construct
+    the specs of) records that can match, and to walk the DAG without
+    reading any spec.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InstallRecordMap, self).__init__()
+        # name -> {version -> hashes}
+        self._by_version = {}
+        # compiler -> hashes, and architecture -> hashes
+        self._by_compiler = {}
+        self._by_arch = {}
+        # hash -> {dependency hash -> deptypes}, and the reverse
+        self._dependencies = {}
+        self._dependents = {}
+        # hash -> (name, version, compiler, architecture)
+        self._keys = {}
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, hash_key, rec):
+        if hash_key in self:
+            self._unindex(hash_key)
+        super(InstallRecordMap, self).__setitem__(hash_key, rec)
+        self._index(hash_key, rec)
+
+    def __delitem__(self, hash_key):
+        self._unindex(hash_key)
+        super(InstallRecordMap, self).__delitem__(hash_key)
+
+    def pop(self, hash_key, *default):
+        if hash_key not in self:
+            return super(InstallRecordMap, self).pop(hash_key, *default)
+        rec = self[hash_key]
+        del self[hash_key]
+        return rec
+
+    def update(self, *args, **kwargs):
+        for hash_key, rec in dict(*args, **kwargs).items():
+            self[hash_key] = rec
+
+    def setdefault(self, hash_key, default=None):
+        if hash_key not in self:
+            self[hash_key] = default
+        return self[hash_key]
+
+    def popitem(self):
+        hash_key = next(iter(self))
+        return hash_key, self.pop(hash_key)
+
+    def clear(self):
+        super(InstallRecordMap, self).clear()
+        for index in (self._by_version, self._by_compiler, self._by_arch,
+                      self._dependencies, self._dependents, self._keys):
+            index.clear()
+
+    def copy(self):
+        return InstallRecordMap(self)
+
+    def hashes_for_name(self, name):
+        """Hashes of the records for package ``name``."""
+        versions = self._by_version.get(name)
+        if not versions:
+            return ()
+        return set().union(*versions.values())
+
+    def dependencies_of(self, hash_key):
+        """Map from the hashes of the (link and run) dependencies of a
+        record to their dependency types.  Dependencies may be in another
+        (upstream) database.
+        """
+        return self._dependencies.get(hash_key, {})
+
+    def dependents_of(self, hash_key):
+        """Map from the hashes of the records in this map depending on
+        ``hash_key`` to their dependency types.
+        """
+        return self._dependents.get(hash_key, {})
+
+    def candidates(self, query_spec):
+        """Hashes of the records that may satisfy ``query_spec`` strictly.
+
+        This is a superset of the records that do, computed with the
+        indexes alone: callers still need to check the specs.
+        """
+        if (query_spec is any or
+                (query_spec.name and query_spec.virtual)):
+            # Providers of a virtual are not constrained like the virtual
+            return self.keys()
+
+        def select(buckets, matches):
+            # Facets that could not be indexed always remain candidates
+            selected = set(buckets.get(None, ()))
+            for key, hashes in buckets.items():
+                if key is not None and matches(key):
+                    selected.update(hashes)
+            return selected
+
+        candidates = None
+        if query_spec.name:
+            versions = self._by_version.get(query_spec.name, {})
+            candidates = select(versions, lambda v: vn.VersionList(
+                [Version(v)]).satisfies(query_spec.versions, strict=True))
+
+        if query_spec.compiler:
+            hashes = select(self._by_compiler, lambda c: (
+                spack.spec.CompilerSpec(c).satisfies(
+                    query_spec.compiler, strict=True)))
+            candidates = hashes if candidates is None else candidates & hashes
+
+        if query_spec.architecture:
+            hashes = select(self._by_arch, lambda a: (
+                spack.spec.ArchSpec(a).satisfies(
+                    query_spec.architecture, strict=True)))
+            candidates = hashes if candidates is None else candidates & hashes
+
+        return self.keys() if candidates is None else candidates
+
+    def _index(self, hash_key, rec):
+        version, compiler, arch, dependencies = _record_facets(rec)
+        self._keys[hash_key] = (rec.name, version, compiler, arch)
+
+        versions = self._by_version.setdefault(rec.name, {})
+        versions.setdefault(version, set()).add(hash_key)
+        self._by_compiler.setdefault(compiler, set()).add(hash_key)
+        self._by_arch.setdefault(arch, set()).add(hash_key)
+
+        self._dependencies[hash_key] = dependencies
+        for dhash, deptypes in dependencies.items():
+            self._dependents.setdefault(dhash, {})[hash_key] = deptypes
+
+    def _unindex(self, hash_key):
+        name, version, compiler, arch = self._keys.pop(hash_key)
+
+        def discard(index, key):
+            hashes = index[key]
+            hashes.discard(hash_key)
+            if not hashes:
+                del index[key]
+
+        discard(self._by_version[name], version)
+        if not self._by_version[name]:
+            del self._by_version[name]
+        discard(self._by_compiler, compiler)
+        discard(self._by_arch, arch)
+
+        for dhash in self._dependencies.pop(hash_key):
+            dependents = self._dependents[dhash]
+            del dependents[hash_key]
+            if not dependents:
+                del self._dependents[dhash]
+
+
 class ForbiddenLockError(SpackError):
     """Raised when an upstream DB attempts to acquire a lock"""
 
@@ -311,6 +568,12 @@ def __init__(self, root, db_dir=None, upstream_dbs=None,
         when needed by scanning the entire Database root for ``spec.yaml``
         files according to Spack's ``DirectoryLayout``.
 
+        Write transactions do not rewrite ``index.json``: the records they
+        add, remove or update are appended to an ``index_journal`` file,
+        which is folded back into ``index.json`` once it grows large
+        enough.  Readers that already hold a previous state of the
+        database only replay the entries appended since their last read.
+
         Caller may optionally provide a custom ``db_dir`` parameter
         where data will be stored. This is intended to be used for
         testing the Database class.
@@ -328,6 +591,7 @@ def __init__(self, root, db_dir=None, upstream_dbs=None,
 
         # Set up layout of database files within the db dir
         self._index_path = os.path.join(self._db_dir, 'index.json')
+        self._journal_path = os.path.join(self._db_dir, 'index_journal')
         self._verifier_path = os.path.join(self._db_dir, 'index_verifier')
         self._lock_path = os.path.join(self._db_dir, 'lock')
 
@@ -371,7 +635,19 @@ def __init__(self, root, db_dir=None, upstream_dbs=None,
             self.lock = lk.Lock(self._lock_path,
                                 default_timeout=self.db_lock_timeout,
                                 desc='database')
-        self._data = {}
+        self._data = InstallRecordMap()
+
+        # State of the journal matching the index.json we last read:
+        # identifier shared by the index and the journal header, stat of
+        # the index file, and number of journal bytes replayed so far.
+        # A journal offset of zero means there is no usable journal.
+        self._journal_id = None
+        self._index_stat = None
+        self._journal_offset = 0
+
+        # Records changed in the current write transaction, mapped to
+        # their state at the start of it (None for new records).
+        self._journal_changes = {}
 
         self.upstream_dbs = list(upstream_dbs) if upstream_dbs else []
 
@@ -624,6 +900,8 @@ def _write_to_file(self, stream):
                 'version': str(_db_version)
             }
         }
+        if self._journal_id:
+            database['database']['journal'] = self._journal_id
 
         try:
             sjson.dump(database, stream)
@@ -638,9 +916,10 @@ def _read_spec_from_dict(self, hash_key, installs):
         spec_dict = installs[hash_key]['spec']
 
         # Install records don't include hash with spec, so we add it in here
-        # to ensure it is read properly.
-        for name in spec_dict:
-            spec_dict[name]['hash'] = hash_key
+        # to ensure it is read properly. The record's dict is left alone,
+        # as it may still be written back as-is.
+        spec_dict = dict((name, dict(node, hash=hash_key))
+                         for name, node in spec_dict.items())
 
         # Build spec from dict first.
         spec = spack.spec.Spec.from_node_dict(spec_dict)
@@ -667,11 +946,9 @@ def query_by_spec_hash(self, hash_key, data=None):
                 return True, db._data[hash_key]
         return False, None
 
-    def _assign_dependencies(self, hash_key, installs, data):
+    def _assign_dependencies(self, spec, spec_dict, data):
         # Add dependencies from other records in the install DB to
         # form a full spec.
-        spec = data[hash_key].spec
-        spec_dict = installs[hash_key]['spec']
         if 'dependencies' in spec_dict[spec.name]:
             yaml_deps = spec_dict[spec.name]['dependencies']
             for dname, dhash, dtypes in spack.spec.Spec.read_yaml_dep_specs(
@@ -699,15 +976,61 @@ def _assign_dependencies(self, hash_key, installs, data):
 
                 spec._add_dependency(child, dtypes)
 
+    def _read_record_from_dict(self, hash_key, rec_dict, data):
+        """Create an install record from its entry in the database index.
+
+        The spec of the record is only constructed the first time it is
+        accessed, connected to the specs of the other records in ``data``.
+
+        Does not do any locking.
+        """
+        rec = InstallRecord.from_dict(None, rec_dict)
+        read_spec = functools.partial(self._read_deferred_spec, hash_key, data)
+        rec.defer_spec(rec_dict['spec'], read_spec)
+        return rec
+
+    def _read_deferred_spec(self, hash_key, data, spec_dict):
+        """Construct the spec of a record read from the database index.
+
+        The database is built up so that ALL specs in it share nodes
+        (i.e., its specs are a true Merkle DAG, unlike most specs), so
+        this reads the specs of the dependencies first, if needed.
+
+        Does not do any locking.
+        """
+        try:
+            spec = self._read_spec_from_dict(
+                hash_key, {hash_key: {'spec': spec_dict}})
+            self._assign_dependencies(spec, spec_dict, data)
+        except MissingDependenciesError:
+            raise
+        except Exception as e:
+            self._invalid_record(hash_key, e)
+
+        # Mark the spec concrete only *after* its dependencies are
+        # connected, to avoid caching hashes prematurely. Dependencies
+        # have already been marked when they were read.
+        spec._normal = True
+        spec._concrete = True
+        return spec
+
+    def _invalid_record(self, hash_key, error):
+        msg = ("Invalid record in Spack database: "
+               "hash: %s, cause: %s: %s")
+        msg %= (hash_key, type(error).__name__, str(error))
+        raise CorruptDatabaseError(msg, self._index_path)
+
     def _read_from_file(self, filename):
         """Fill database from file, do not maintain old data.
-        Translate the spec portions from node-dict form to spec form.
+        The spec portions are translated from node-dict form to spec
+        form the first time each spec is needed.
 
         Does not do any locking.
         """
         try:
             with open(filename, 'r') as f:
                 fdata = sjson.load(f)
+                index_stat = os.fstat(f.fileno())
         except Exception as e:
             raise CorruptDatabaseError("error parsing database:", str(e))
 
@@ -748,54 +1071,172 @@ def check(cond, msg):
                     for k, v in self._data.items()
                 )
 
-        def invalid_record(hash_key, error):
-            msg = ("Invalid record in Spack database: "
-                   "hash: %s, cause: %s: %s")
-            msg %= (hash_key, type(error).__name__, str(error))
-            raise CorruptDatabaseError(msg, self._index_path)
-
-        # Build up the database in three passes:
-        #
-        #   1. Read in all specs without dependencies.
-        #   2. Hook dependencies up among specs.
-        #   3. Mark all specs concrete.
-        #
-        # The database is built up so that ALL specs in it share nodes
-        # (i.e., its specs are a true Merkle DAG, unlike most specs.)
-
-        # Pass 1: Iterate through database and build specs w/o dependencies
-        data = {}
+        # Only keep the node dicts of the specs for now. Specs are read
+        # when they are first needed, see _read_deferred_spec().
+        data = InstallRecordMap()
         for hash_key, rec in installs.items():
             try:
-                # This constructs a spec DAG from the list of all installs
-                spec = self._read_spec_from_dict(hash_key, installs)
-
-                # Insert the brand new spec in the database.  Each
-                # spec has its own copies of its dependency specs.
-                # TODO: would a more immmutable spec implementation simplify
-                #       this?
-                data[hash_key] = InstallRecord.from_dict(spec, rec)
+                data[hash_key] = self._read_record_from_dict(
+                    hash_key, rec, data)
             except Exception as e:
-                invalid_record(hash_key, e)
+                self._invalid_record(hash_key, e)
 
-        # Pass 2: Assign dependencies once all specs are created.
-        for hash_key in data:
-            try:
-                self._assign_dependencies(hash_key, installs, data)
-            except MissingDependenciesError:
-                raise
-            except Exception as e:
-                invalid_record(hash_key, e)
+        self._data = data
 
-        # Pass 3: Mark all specs concrete.  Specs representing real
-        # installations must be explicitly marked.
-        # We do this *after* all dependencies are connected because if we
-        # do it *while* we're constructing specs,it causes hashes to be
-        # cached prematurely.
-        for hash_key, rec in data.items():
-            rec.spec._mark_concrete()
+        # Changes made since index.json was last compacted are in the journal
+        if filename == self._index_path:
+            self._index_stat = self._index_file_key(index_stat)
+            self._journal_id = db.get('journal')
+            self._journal_offset = 0
+            self._journal_changes = {}
+            if self._journal_id:
+                self._replay_journal()
 
-        self._data = data
+    def _index_file_key(self, stat):
+        """Key telling whether index.json was replaced since it was read."""
+        return (stat.st_ino, stat.st_size, stat.st_mtime)
+
+    def _replay_journal(self):
+        """Apply the journal entries appended since the last read to the
+        in-memory database.
+
+        Returns False, without replaying anything, if the journal does not
+        belong to the index.json that was read last.
+
+        Does not do any locking.
+        """
+        try:
+            with open(self._journal_path, 'rb') as f:
+                header = f.readline()
+                try:
+                    header = sjson.load(header.decode('utf-8'))
+                except ValueError:
+                    return False
+                if header.get('journal') != self._journal_id:
+                    return False
+
+                offset = max(self._journal_offset, f.tell())
+                f.seek(offset)
+                for line in f:
+                    # An incomplete last entry comes from an interrupted
+                    # writer; the next writer truncates it.
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry = sjson.load(line.decode('utf-8'))
+                    except ValueError:
+                        break
+                    self._apply_journal_entry(entry)
+                    offset += len(line)
+        except (IOError, OSError):
+            return False
+
+        self._journal_offset = offset
+        return True
+
+    def _apply_journal_entry(self, entry):
+        """Apply the changes of one write transaction read from the journal.
+
+        Does not do any locking.
+        """
+        try:
+            for change in entry['changes']:
+                hash_key, op = change['hash'], change['op']
+                if op == 'add':
+                    self._data[hash_key] = self._read_record_from_dict(
+                        hash_key, change['record'], self._data)
+
+                elif op == 'update':
+                    rec = self._data[hash_key]
+                    for field_name, value in change['fields'].items():
+                        setattr(rec, field_name, value)
+
+                elif op == 'remove':
+                    # Only specs that were read can have been connected
+                    # to their dependencies.
+                    spec = self._data.pop(hash_key)._spec
+                    if spec is None:
+                        continue
+                    for dep in spec.dependencies(_tracked_deps):
+                        dependent = dep._dependents.get(spec.name)
+                        if dependent and dependent.parent is spec:
+                            del dep._dependents[spec.name]
+
+                else:
+                    raise ValueError("unknown operation '%s'" % op)
+
+        except Exception as e:
+            raise CorruptDatabaseError(
+                "Invalid entry in Spack database journal: %s: %s" % (
+                    type(e).__name__, str(e)), self._journal_path)
+
+    def _read_journal_tail(self):
+        """Bring the in-memory database up to date by replaying only the
+        journal entries appended since the last read.
+
+        Returns False if that is not possible (e.g. index.json was
+        compacted or replaced in the meantime), in which case the whole
+        index has to be read again.
+
+        Does not do any locking.
+        """
+        if not self._journal_offset:
+            return False
+
+        try:
+            index_stat = os.stat(self._index_path)
+        except OSError:
+            return False
+
+        if self._index_file_key(index_stat) != self._index_stat:
+            return False
+
+        return self._replay_journal()
+
+    def _journal_fields(self, rec):
+        """Fields of an install record that can change after it is added."""
+        return rec.to_dict(
+            include_fields=[f for f in self._record_fields if f != 'spec'])
+
+    def _journal_change(self, hash_key):
+        """Remember the state of a record before it is first changed in
+        the current write transaction.
+
+        Does not do any locking.
+        """
+        if self._journal_offset and hash_key not in self._journal_changes:
+            rec = self._data.get(hash_key)
+            self._journal_changes[hash_key] = (
+                self._journal_fields(rec) if rec else None)
+
+    def _pop_journal_changes(self):
+        """Return the journal representation of the records changed in
+        the current write transaction, and start tracking anew.
+
+        Does not do any locking.
+        """
+        changes = []
+        for hash_key, old in self._journal_changes.items():
+            rec = self._data.get(hash_key)
+            if rec is None:
+                if old is not None:
+                    changes.append({'op': 'remove', 'hash': hash_key})
+            elif old is None:
+                changes.append({
+                    'op': 'add',
+                    'hash': hash_key,
+                    'record': rec.to_dict(include_fields=self._record_fields)
+                })
+            else:
+                new = self._journal_fields(rec)
+                fields = dict((k, new.get(k)) for k in set(old) | set(new)
+                              if old.get(k) != new.get(k))
+                if fields:
+                    changes.append(
+                        {'op': 'update', 'hash': hash_key, 'fields': fields})
+
+        self._journal_changes = {}
+        return changes
 
     def reindex(self, directory_layout):
         """Build database index from scratch based on a directory layout.
@@ -814,7 +1255,7 @@ def _read_suppress_error():
                     self._read_from_file(self._index_path)
             except CorruptDatabaseError as e:
                 self._error = e
-                self._data = {}
+                self._data = InstallRecordMap()
 
         transaction = lk.WriteTransaction(
             self.lock, acquire=_read_suppress_error, release=self._write
@@ -869,8 +1310,11 @@ def _construct_from_directory_layout(self, directory_layout, old_data):
         # them readable. If we considered DB entries authoritative
         # instead, we would perpetuate errors over a reindex.
         with directory_layout.disable_upstream_check():
-            # Initialize data in the reconstructed DB
-            self._data = {}
+            # Initialize data in the reconstructed DB, which is written
+            # back in full rather than through the journal.
+            self._data = InstallRecordMap()
+            self._journal_offset = 0
+            self._journal_changes = {}
 
             # Start inspecting the installed prefixes
             processed_specs = set()
@@ -955,40 +1399,117 @@ def _check_ref_counts(self):
                     (key, found, expected, self._index_path))
 
     def _write(self, type, value, traceback):
-        """Write the in-memory database index to its file path.
+        """Write the changes made to the in-memory database to disk.
 
         This is a helper function called by the WriteTransaction context
         manager. If there is an exception while the write lock is active,
-        nothing will be written to the database file, but the in-memory
-        database *may* be left in an inconsistent state.  It will be consistent
-        after the start of the next transaction, when it read from disk again.
+        nothing will be written to the database files, and the in-memory
+        database, which *may* be left in an inconsistent state, is read
+        again from disk at the start of the next transaction.
+
+        Changes are normally appended to the journal. The whole index is
+        rewritten instead when there is no usable journal (e.g. the first
+        time the database is written or after a reindex), and when the
+        journal has grown large enough to be compacted.
 
         This routine does no locking.
         """
         # Do not write if exceptions were raised
         if type is not None:
+            self._journal_changes = {}
+            self.last_seen_verifier = ''
             return
 
-        temp_file = self._index_path + (
-            '.%s.%s.temp' % (socket.getfqdn(), os.getpid()))
+        if self._journal_offset:
+            changes = self._pop_journal_changes()
+            if not changes:
+                return
 
-        # Write a temporary database file them move it into place
+            entry = json.dumps({'changes': changes}, separators=(',', ':'))
+            entry = (entry + '\n').encode('utf-8')
+            if not self._journal_needs_compaction(len(entry)):
+                self._append_to_journal(entry)
+                self._write_verifier()
+                return
+
+        self._write_index()
+        self._write_verifier()
+
+    def _journal_needs_compaction(self, entry_size):
+        """Whether appending ``entry_size`` bytes to the journal makes it
+        large enough to be folded back into index.json.
+        """
+        journal_size = self._journal_offset + entry_size
+        index_size = self._index_stat[1]
+        return journal_size > max(_journal_min_compaction_size,
+                                  _journal_compaction_ratio * index_size)
+
+    def _append_to_journal(self, entry):
+        """Append one entry to the journal.
+
+        This routine does no locking.
+        """
+        try:
+            with open(self._journal_path, 'r+b') as f:
+                # Drop anything an interrupted writer left after the last
+                # complete entry before appending ours.
+                f.seek(self._journal_offset)
+                f.truncate()
+                f.write(entry)
+        except BaseException:
+            # The journal is now behind the in-memory database
+            self.last_seen_verifier = ''
+            raise
+
+        self._journal_offset += len(entry)
+
+    def _write_index(self):
+        """Write the whole in-memory database to index.json and start a new,
+        empty journal for it.
+
+        This routine does no locking.
+        """
+        suffix = '.%s.%s.temp' % (socket.getfqdn(), os.getpid())
+        temp_file = self._index_path + suffix
+        temp_journal = self._journal_path + suffix
+
+        self._journal_id = _new_journal_id()
+        self._journal_offset = 0
+        self._journal_changes = {}
+        header = json.dumps(
+            {'journal': self._journal_id, 'version': str(_db_version)})
+        header = (header + '\n').encode('utf-8')
+
+        # Write temporary database and journal files, then move them into
+        # place. If we are interrupted in between, the old journal does not
+        # match the new index and is ignored.
         try:
             with open(temp_file, 'w') as f:
                 self._write_to_file(f)
+            with open(temp_journal, 'wb') as f:
+                f.write(header)
             os.rename(temp_file, self._index_path)
-            if _use_uuid:
-                with open(self._verifier_path, 'w') as f:
-                    new_verifier = str(uuid.uuid4())
-                    f.write(new_verifier)
-                    self.last_seen_verifier = new_verifier
+            os.rename(temp_journal, self._journal_path)
         except BaseException as e:
             tty.debug(e)
-            # Clean up temp file if something goes wrong.
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            self._journal_id = None
+            # Clean up temp files if something goes wrong.
+            for path in (temp_file, temp_journal):
+                if os.path.exists(path):
+                    os.remove(path)
             raise
 
+        self._index_stat = self._index_file_key(os.stat(self._index_path))
+        self._journal_offset = len(header)
+
+    def _write_verifier(self):
+        """Let other processes know the database changed on disk."""
+        if _use_uuid:
+            with open(self._verifier_path, 'w') as f:
+                new_verifier = str(uuid.uuid4())
+                f.write(new_verifier)
+                self.last_seen_verifier = new_verifier
+
     def _read(self):
         """Re-read Database from the data in the set location.
 
@@ -1006,9 +1527,14 @@ def _read(self):
                     pass
             if ((current_verifier != self.last_seen_verifier) or
                     (current_verifier == '')):
+                # If we hold a previous state of the database, only the
+                # new journal entries need to be read.
+                up_to_date = (self.last_seen_verifier != '' and
+                              self._read_journal_tail())
                 self.last_seen_verifier = current_verifier
-                # Read from file if a database exists
-                self._read_from_file(self._index_path)
+                if not up_to_date:
+                    # Read from file if a database exists
+                    self._read_from_file(self._index_path)
             return
         elif self.is_upstream:
             raise UpstreamDatabaseLockingError(
@@ -1073,6 +1599,7 @@ def _add(
                 }
                 self._add(dep, directory_layout, **extra_args)
 
+        self._journal_change(key)
         if key not in self._data:
             installed = bool(spec.external)
             path = None
@@ -1088,15 +1615,8 @@ def _add(
             elif spec.external_path:
                 path = spec.external_path
 
-            # Create a new install record with no deps initially.
+            # Create a new spec with no deps initially.
             new_spec = spec.copy(deps=False)
-            extra_args = {
-                'explicit': explicit,
-                'installation_time': installation_time
-            }
-            self._data[key] = InstallRecord(
-                new_spec, path, installed, ref_count=0, **extra_args
-            )
 
             # Connect dependencies from the DB to the new copy.
             for name, dep in six.iteritems(
@@ -1106,6 +1626,7 @@ def _add(
                 upstream, record = self.query_by_spec_hash(dkey)
                 new_spec._add_dependency(record.spec, dep.deptypes)
                 if not upstream:
+                    self._journal_change(dkey)
                     record.ref_count += 1
 
             # Mark concrete once everything is built, and preserve
@@ -1113,6 +1634,16 @@ def _add(
             new_spec._mark_concrete()
             new_spec._hash = key
 
+            # Add the record once its spec is complete, so that it is
+            # indexed with its dependencies.
+            extra_args = {
+                'explicit': explicit,
+                'installation_time': installation_time
+            }
+            self._data[key] = InstallRecord(
+                new_spec, path, installed, ref_count=0, **extra_args
+            )
+
         else:
             # If it is already there, mark it as installed.
             self._data[key].installed = True
@@ -1156,6 +1687,7 @@ def _decrement_ref_count(self, spec):
             # not much we can do.
             return
 
+        self._journal_change(key)
         rec = self._data[key]
         rec.ref_count -= 1
 
@@ -1170,12 +1702,14 @@ def _increment_ref_count(self, spec):
         if key not in self._data:
             return
 
+        self._journal_change(key)
         rec = self._data[key]
         rec.ref_count += 1
 
     def _remove(self, spec):
         """Non-locking version of remove(); does real work."""
         key = self._get_matching_spec_key(spec)
+        self._journal_change(key)
         rec = self._data[key]
 
         if rec.ref_count > 0:
@@ -1216,6 +1750,21 @@ def remove(self, spec):
         with self.write_transaction():
             return self._remove(spec)
 
+    @_autospec
+    def update_explicit(self, spec, explicit):
+        """Update whether a spec was installed explicitly.
+
+        Args:
+            spec (Spec): the spec whose install record is being updated
+            explicit (bool): ``True`` if the package was requested explicitly
+                by the user, ``False`` if it was pulled in as a dependency of
+                an explicit package.
+        """
+        with self.write_transaction():
+            key = self._get_matching_spec_key(spec)
+            self._journal_change(key)
+            self._data[key].explicit = explicit
+
     def deprecator(self, spec):
         """Return the spec that the given spec is deprecated for, or None"""
         with self.read_transaction():
@@ -1235,6 +1784,7 @@ def specs_deprecated_by(self, spec):
 
     def _deprecate(self, spec, deprecator):
         spec_key = self._get_matching_spec_key(spec)
+        self._journal_change(spec_key)
         spec_rec = self._data[spec_key]
 
         deprecator_key = self._get_matching_spec_key(deprecator)
@@ -1265,11 +1815,11 @@ def installed_relatives(self, spec, direction='children', transitive=True,
 
         relatives = set()
         for spec in self.query(spec):
-            if transitive:
+            if direction == 'parents':
+                to_add = self._dependents(spec, transitive, deptype)
+            elif transitive:
                 to_add = spec.traverse(
                     direction=direction, root=False, deptype=deptype)
-            elif direction == 'parents':
-                to_add = spec.dependents(deptype=deptype)
             else:  # direction == 'children'
                 to_add = spec.dependencies(deptype=deptype)
 
@@ -1292,6 +1842,32 @@ def installed_relatives(self, spec, direction='children', transitive=True,
                 relatives.add(relative)
         return relatives
 
+    def _dependents(self, spec, transitive=True, deptype='all'):
+        """Return the specs in this and upstream DBs that depend on ``spec``.
+
+        Dependents are looked up in the index of each DB, so that only the
+        specs of the dependents are read.
+        """
+        deptype = dp.canonical_deptype(deptype)
+        record_maps = [self._data] + [db._data for db in self.upstream_dbs]
+
+        dependents = []
+        with self.read_transaction():
+            stack, visited = [spec.dag_hash()], set()
+            while stack:
+                hash_key = stack.pop()
+                for data in record_maps:
+                    for dhash, deptypes in data.dependents_of(
+                            hash_key).items():
+                        if dhash in visited or not any(
+                                t in deptype for t in deptypes):
+                            continue
+                        visited.add(dhash)
+                        dependents.append(data[dhash].spec)
+                        if transitive:
+                            stack.append(dhash)
+        return dependents
+
     @_autospec
     def installed_extensions_for(self, extendee_spec):
         """
@@ -1419,8 +1995,12 @@ def _query(
         # TODO: like installed and known that can be queried?  Or are
         # TODO: these really special cases that only belong here?
 
+        if query_spec is not any and not isinstance(
+                query_spec, spack.spec.Spec):
+            query_spec = spack.spec.Spec(query_spec)
+
         # Just look up concrete specs with hashes; no fancy search.
-        if isinstance(query_spec, spack.spec.Spec) and query_spec.concrete:
+        if query_spec is not any and query_spec.concrete:
             # TODO: handling of hashes restriction is not particularly elegant.
             hash_key = query_spec.dag_hash()
             if (hash_key in self._data and
@@ -1435,8 +2015,10 @@ def _query(
         start_date = start_date or datetime.datetime.min
         end_date = end_date or datetime.datetime.max
 
-        for key, rec in self._data.items():
-            if hashes is not None and rec.spec.dag_hash() not in hashes:
+        # Use the indexes to skip records that cannot match
+        for key in self._data.candidates(query_spec):
+            rec = self._data[key]
+            if hashes is not None and key not in hashes:
                 continue
 
             if not rec.install_type_matches(installed):
@@ -1446,7 +2028,7 @@ def _query(
                 continue
 
             if known is not any and spack.repo.path.exists(
-                    rec.spec.name) != known:
+                    rec.name) != known:
                 continue
 
             inst_date = datetime.datetime.fromtimestamp(
@@ -1515,14 +2097,16 @@ def unused_specs(self):
             2. Installed as a "run" or "link" dependency (even transitive) of
                a spec at point 1.
         """
-        needed, visited = set(), set()
         with self.read_transaction():
-            for key, rec in self._data.items():
-                if rec.explicit:
-                    # recycle `visited` across calls to avoid
-                    # redundantly traversing
-                    for spec in rec.spec.traverse(visited=visited):
-                        needed.add(spec.dag_hash())
+            # Walk the dependencies index, so that only the specs of
+            # unused records are read
+            needed = set()
+            stack = [key for key, rec in self._data.items() if rec.explicit]
+            while stack:
+                key = stack.pop()
+                if key not in needed:
+                    needed.add(key)
+                    stack.extend(self._data.dependencies_of(key))
 
             unused = [rec.spec for key, rec in self._data.items()
                       if key not in needed and rec.installed]
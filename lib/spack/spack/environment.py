@@ -26,6 +26,7 @@
 import spack.schema.env
 import spack.spec
 import spack.store
+import spack.util.parallel
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 import spack.config
@@ -487,7 +488,8 @@ def from_dict(d):
     def view(self):
         return YamlFilesystemView(self.root, spack.store.layout,
                                   ignore_conflicts=True,
-                                  projections=self.projections)
+                                  projections=self.projections,
+                                  manifest=True)
 
     def __contains__(self, spec):
         """Is the spec described by the view descriptor
@@ -529,8 +531,18 @@ def regenerate(self, all_specs, roots):
 
             view = self.view()
 
-            view.clean()
-            specs_in_view = set(view.get_all_specs())
+            if view.manifest is not None:
+                # The manifest tells which specs are linked in the view, so
+                # only the specs of the difference are read and touched
+                installed = dict((s.dag_hash(), s)
+                                 for s in installed_specs_for_view)
+                specs_in_view = set(
+                    installed[h] for h in view.manifest if h in installed)
+                specs_in_view.update(view.get_linked_specs(
+                    h for h in view.manifest if h not in installed))
+            else:
+                view.clean()
+                specs_in_view = set(view.get_all_specs())
             tty.msg("Updating view at {0}".format(self.root))
 
             rm_specs = specs_in_view - installed_specs_for_view
@@ -541,6 +553,7 @@ def regenerate(self, all_specs, roots):
             view.remove_specs(*rm_specs, with_dependents=False,
                               all_specs=specs_in_view)
             view.add_specs(*add_specs, with_dependencies=False)
+            view.write_manifest()
 
 
 class Environment(object):
@@ -938,7 +951,7 @@ def remove(self, query_spec, list_name=user_speclist_name, force=False):
                 del self.concretized_order[i]
                 del self.specs_by_hash[dag_hash]
 
-    def concretize(self, force=False):
+    def concretize(self, force=False, jobs=None):
         """Concretize user_specs in this environment.
 
         Only concretizes specs that haven't been concretized yet unless
@@ -950,6 +963,9 @@ def concretize(self, force=False):
         Arguments:
             force (bool): re-concretize ALL specs, even those that were
                already concretized
+            jobs (int): number of processes concretizing specs separately
+               in parallel, by default ``config:build_jobs`` limited by the
+               number of cores
 
         Returns:
             List of specs that have been concretized. Each entry is a tuple of
@@ -965,7 +981,7 @@ def concretize(self, force=False):
         if self.concretization == 'together':
             return self._concretize_together()
         if self.concretization == 'separately':
-            return self._concretize_separately()
+            return self._concretize_separately(jobs)
 
         msg = 'concretization strategy not implemented [{0}]'
         raise SpackEnvironmentError(msg.format(self.concretization))
@@ -1010,9 +1026,12 @@ def _concretize_together(self):
             self._add_concrete_spec(abstract, concrete)
         return concretized_specs
 
-    def _concretize_separately(self):
-        """Concretization strategy that concretizes separately one
-        user spec after the other.
+    def _concretize_separately(self, jobs=None):
+        """Concretization strategy that concretizes user specs separately
+        from each other.
+
+        New user specs are concretized in parallel, in ``jobs`` processes,
+        and added to the environment in the order of the manifest.
         """
         # keep any concretized specs whose user specs are still in the manifest
         old_concretized_user_specs = self.concretized_user_specs
@@ -1029,13 +1048,28 @@ def _concretize_separately(self):
                 self._add_concrete_spec(s, concrete, new=False)
 
         # Concretize any new user specs that we haven't concretized yet
-        concretized_specs = []
+        new_user_specs, arguments = [], []
         for uspec, uspec_constraints in zip(
                 self.user_specs, self.user_specs.specs_as_constraints):
             if uspec not in old_concretized_user_specs:
-                concrete = _concretize_from_constraints(uspec_constraints)
-                self._add_concrete_spec(uspec, concrete)
-                concretized_specs.append((uspec, concrete))
+                new_user_specs.append(uspec)
+                arguments.append((uspec_constraints,))
+
+        processes = spack.util.parallel.num_processes(jobs)
+        if min(processes, len(arguments)) > 1:
+            # Build the provider index once, before it is inherited by
+            # all the workers
+            spack.repo.path.provider_index
+            concrete_specs = [
+                Spec.from_dict(d) for d in spack.util.parallel.parallel_map(
+                    _concretize_to_dict, arguments, processes)]
+        else:
+            concrete_specs = [
+                _concretize_from_constraints(*args) for args in arguments]
+
+        concretized_specs = list(zip(new_user_specs, concrete_specs))
+        for uspec, concrete in concretized_specs:
+            self._add_concrete_spec(uspec, concrete)
         return concretized_specs
 
     def concretize_and_add(self, user_spec, concrete_spec=None):
@@ -1600,6 +1634,13 @@ def _tree_to_display(spec):
         print('')
 
 
+def _concretize_to_dict(spec_constraints):
+    """Concretize a user spec in a worker process, and return the concrete
+    spec as a dictionary, with build hashes as in lockfiles."""
+    concrete = _concretize_from_constraints(spec_constraints)
+    return concrete.to_dict(hash=ht.build_hash)
+
+
 def _concretize_from_constraints(spec_constraints):
     # Accept only valid constraints from list and concretize spec
     # Get the named spec even if out of order
@@ -24,15 +24,22 @@
 """
 import copy
 import functools
+import hashlib
+import json
 import os
 import os.path
 import re
 import shutil
+import socket
+import ssl
 import sys
 
 import llnl.util.tty as tty
+from llnl.util.lock import LockError
 import six
 import six.moves.urllib.parse as urllib_parse
+from six.moves import http_client
+import spack.caches
 import spack.config
 import spack.error
 import spack.util.crypto as crypto
@@ -56,6 +63,16 @@
     " <package>', then try again using the correct URL.")
 
 
+#: Explanation of the errors raised when the certificate of a host is
+#: invalid
+_invalid_certificate_msg = (
+    "This is either an attack, or your cluster's SSL "
+    "configuration is bad.  If you believe your SSL "
+    "configuration is bad, you can try running spack -k, "
+    "which will not check SSL certificates."
+    "Use this at your own risk.")
+
+
 def warn_content_type_mismatch(subject, content_type='HTML'):
     tty.warn(CONTENT_TYPE_MISMATCH_WARNING_TEMPLATE.format(
         subject=subject, content_type=content_type))
@@ -307,6 +324,70 @@ def fetch(self):
             raise FailedDownloadError(url)
 
     def _fetch_from_url(self, url):
+        fetch_method = spack.config.get('config:url_fetch_method', 'native')
+        if fetch_method == 'native' and self.stage.save_filename and \
+                web_util.supports_download(url):
+            return self._fetch_native(url)
+        return self._fetch_curl(url)
+
+    def _fetch_native(self, url):
+        """Downloads the archive in this process, over a connection kept
+        open for the next downloads from the same host, and computes its
+        digest on the way."""
+        save_file = self.stage.save_filename
+        partial_file = save_file + '.part'
+        tty.msg("Fetching %s" % url)
+
+        hash_fun = None
+        if self.digest:
+            try:
+                hash_fun = crypto.hash_fun_for_digest(self.digest)
+            except ValueError:
+                pass
+
+        headers = {}
+        timeout = spack.config.get('config:connect_timeout', 10)
+        if self.extra_options:
+            cookie = self.extra_options.get('cookie')
+            if cookie:
+                headers['Cookie'] = cookie
+
+            option_timeout = self.extra_options.get('timeout')
+            if option_timeout:
+                timeout = max(timeout, int(option_timeout))
+
+        try:
+            response_headers, digest = web_util.download_url(
+                url, partial_file, hash_fun, timeout=timeout or None,
+                headers=headers)
+        except (web_util.SpackWebError, socket.error,
+                http_client.HTTPException, ValueError) as e:
+            # clean up archive on failure.
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+
+            if getattr(e, 'code', None) == 404:
+                raise FailedDownloadError(
+                    url, "URL %s was not found!" % url)
+            elif isinstance(e, (ssl.SSLError, ValueError)) and \
+                    'CERTIFICATE' in str(e).upper():
+                raise FailedDownloadError(
+                    url, "Unable to fetch due to invalid certificate. " +
+                    _invalid_certificate_msg)
+            raise FailedDownloadError(url, "Download failed: %s" % str(e))
+
+        if digest:
+            self._record_digest(
+                partial_file, save_file, hash_fun().name.lower(), digest)
+
+        # Check if we somehow got an HTML file rather than the archive we
+        # asked for.
+        content_type = response_headers.get('Content-Type') or ''
+        if 'text/html' in content_type:
+            warn_content_type_mismatch(self.archive_file or "the archive")
+        return partial_file, save_file
+
+    def _fetch_curl(self, url):
         save_file = None
         partial_file = None
         if self.stage.save_filename:
@@ -375,13 +456,8 @@ def _fetch_from_url(self, url):
             elif curl.returncode == 60:
                 # This is a certificate error.  Suggest spack -k
                 raise FailedDownloadError(
-                    url,
-                    "Curl was unable to fetch due to invalid certificate. "
-                    "This is either an attack, or your cluster's SSL "
-                    "configuration is bad.  If you believe your SSL "
-                    "configuration is bad, you can try running spack -k, "
-                    "which will not check SSL certificates."
-                    "Use this at your own risk.")
+                    url, "Curl was unable to fetch due to invalid "
+                    "certificate. " + _invalid_certificate_msg)
 
             else:
                 # This is some other curl error.  Curl will print the
@@ -498,12 +574,73 @@ def check(self):
                 "Attempt to check URLFetchStrategy with no digest.")
 
         checker = crypto.Checker(self.digest)
-        if not checker.check(self.archive_file):
+        checker.sum = self._recorded_digest(
+            self.archive_file, checker.hash_name)
+        if checker.sum is None:
+            checker.check(self.archive_file)
+            if checker.sum == self.digest:
+                self._record_digest(
+                    self.archive_file, self.archive_file,
+                    checker.hash_name, checker.sum)
+        if checker.sum != self.digest:
             raise ChecksumError(
                 "%s checksum failed for %s" %
                 (checker.hash_name, self.archive_file),
                 "Expected %s but got %s" % (self.digest, checker.sum))
 
+    @staticmethod
+    def _digest_record_key(archive_file):
+        """Key of the digest record of an archive in the ``misc_cache``.
+
+        Records are kept out of the stage, since the files in it are listed
+        e.g. to find the patch of a ``UrlPatch``."""
+        path = os.path.abspath(archive_file)
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join('source_digests', name + '.json')
+
+    def _record_digest(self, path, archive_file, hash_name, digest):
+        """Records the digest of the file at path, which is or will be
+        renamed to archive_file.
+
+        The record outlives this fetcher, so that checking the archive
+        again, e.g. in the process building the package after the one that
+        fetched it, does not read it again.
+        """
+        stat = os.stat(path)
+        record = {'path': os.path.abspath(archive_file), 'hash': hash_name,
+                  'digest': digest, 'size': stat.st_size,
+                  'mtime': stat.st_mtime}
+        cache = spack.caches.misc_cache
+        key = self._digest_record_key(archive_file)
+        try:
+            cache.init_entry(key)
+            with cache.write_transaction(key) as (old, new):
+                json.dump(record, new)
+        except (spack.error.SpackError, LockError, EnvironmentError) as e:
+            tty.debug('Could not record the digest of %s: %s'
+                      % (archive_file, str(e)))
+
+    def _recorded_digest(self, archive_file, hash_name):
+        """Digest recorded for the archive, or None if there is no record
+        for its current size and modification time."""
+        cache = spack.caches.misc_cache
+        key = self._digest_record_key(archive_file)
+        try:
+            if not cache.init_entry(key):
+                return None
+            with cache.read_transaction(key) as f:
+                record = json.load(f)
+            stat = os.stat(archive_file)
+        except (spack.error.SpackError, LockError, EnvironmentError,
+                ValueError):
+            return None
+        if (record.get('path'), record.get('hash'), record.get('size'),
+                record.get('mtime')) != (os.path.abspath(archive_file),
+                                         hash_name, stat.st_size,
+                                         stat.st_mtime):
+            return None
+        return record.get('digest')
+
     @_needs_stage
     def reset(self):
         """
@@ -1403,7 +1540,18 @@ def store(self, fetcher, relative_dest):
 
         dst = os.path.join(self.root, relative_dest)
         mkdirp(os.path.dirname(dst))
-        fetcher.archive(dst)
+
+        # Archive to a temporary file first, so that an interrupted fetch,
+        # e.g. one made ahead of time by the installer, does not leave a
+        # partial archive in the cache
+        tmp = os.path.join(
+            os.path.dirname(dst), '.tmp-' + os.path.basename(dst))
+        try:
+            fetcher.archive(tmp)
+            os.rename(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
     def fetcher(self, target_path, digest, **kwargs):
         path = os.path.join(self.root, target_path)
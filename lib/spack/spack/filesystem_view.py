@@ -3,18 +3,21 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import collections
+import contextlib
 import functools as ft
 import os
 import re
 import shutil
 import sys
 
-from llnl.util.link_tree import LinkTree, MergeConflictError
+from llnl.util.link_tree import (
+    LinkTree, LinkQueue, MergeConflictError, empty_file_name)
 from llnl.util import tty
 from llnl.util.lang import match_predicate, index_by
 from llnl.util.tty.color import colorize
 from llnl.util.filesystem import (
-    mkdirp, remove_dead_links, remove_empty_directories)
+    mkdirp, remove_dead_links, remove_empty_directories, write_tmp_and_move)
 
 import spack.util.spack_yaml as s_yaml
 import spack.util.spack_json as s_json
@@ -40,6 +43,10 @@
 
 
 _projections_path = '.spack/projections.yaml'
+_manifest_path = '.spack/view_manifest.json'
+
+#: Version of the view manifest format
+manifest_format_version = 1
 
 
 def view_symlink(src, dst, **kwargs):
@@ -122,6 +129,10 @@ def __init__(self, root, layout, **kwargs):
         self.ignore_conflicts = kwargs.get("ignore_conflicts", False)
         self.verbose = kwargs.get("verbose", False)
 
+        # Number of threads linking the files of packages added together
+        self.link_threads = kwargs.get(
+            "link_threads", spack.config.get('config:view_link_threads', 1))
+
         # Setup link function to include view
         link_func = kwargs.get("link", view_symlink)
         self.link = ft.partial(link_func, view=self)
@@ -243,6 +254,17 @@ class YamlFilesystemView(FilesystemView):
     def __init__(self, root, layout, **kwargs):
         super(YamlFilesystemView, self).__init__(root, layout, **kwargs)
 
+        # Views keep a manifest of the files linked for each spec if they
+        # were created with one: the files linked in other views are unknown
+        self.manifest_path = os.path.join(self._root, _manifest_path)
+        self.use_manifest = os.path.exists(self.manifest_path) or (
+            kwargs.get('manifest', False) and self._is_empty())
+        self._manifest = None
+        self._manifest_changed = False
+
+        # Files to link for specs being added, computed ahead of linking
+        self._file_maps = {}
+
         # Super class gets projections from the kwargs
         # YAML specific to get projections from YAML file
         self.projections_path = os.path.join(self._root, _projections_path)
@@ -280,6 +302,114 @@ def read_projections(self):
         else:
             return {}
 
+    def _is_empty(self):
+        """Whether nothing but projections was ever added to this view."""
+        if not os.path.isdir(self._root):
+            return True
+        metadata_dir = spack.store.layout.metadata_dir
+        if set(os.listdir(self._root)) - set([metadata_dir]):
+            return False
+        projections_file = os.path.basename(_projections_path)
+        metadata_path = os.path.join(self._root, metadata_dir)
+        return not (os.path.isdir(metadata_path) and
+                    set(os.listdir(metadata_path)) - set([projections_file]))
+
+    @property
+    def manifest(self):
+        """Files and directories linked in this view for each spec, keyed by
+        DAG hash, or ``None`` if the view keeps no manifest."""
+        if self.use_manifest and self._manifest is None:
+            self._read_manifest()
+        return self._manifest
+
+    def _read_manifest(self):
+        self._manifest = {}
+        self._manifest_nodes = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                data = s_json.load(f)
+            self._manifest = data['specs']
+            self._manifest_nodes = data['nodes']
+        else:
+            self._manifest_changed = True
+
+        # Number of specs linking each file, to remove only the files of
+        # removed specs that no other spec links
+        self._file_links = collections.Counter()
+        for linked in self._manifest.values():
+            self._file_links.update(linked['files'])
+
+    def write_manifest(self):
+        """Write the manifest of this view, if it changed."""
+        if self.manifest is None or not self._manifest_changed:
+            return
+
+        # Keep the nodes of the specs in the view and of their dependencies
+        nodes = {}
+        stack = list(self._manifest)
+        while stack:
+            dag_hash = stack.pop()
+            if dag_hash in nodes:
+                continue
+            node = nodes[dag_hash] = self._manifest_nodes[dag_hash]
+            stack.extend(dep_hash for _, dep_hash, _ in
+                         spack.spec.Spec.dependencies_from_node_dict(node))
+        self._manifest_nodes = nodes
+
+        data = {
+            '_meta': {
+                'file-type': 'spack-view-manifest',
+                'manifest-version': manifest_format_version,
+            },
+            'specs': self._manifest,
+            'nodes': nodes,
+        }
+        mkdirp(os.path.dirname(self.manifest_path))
+        with write_tmp_and_move(self.manifest_path) as f:
+            s_json.dump(data, f)
+        self._manifest_changed = False
+
+    def get_linked_specs(self, hashes):
+        """Specs linked in this view with the DAG hashes given, read from
+        the manifest of the view."""
+        specs = {}
+
+        def node_spec(dag_hash):
+            if dag_hash not in specs:
+                node = self._manifest_nodes[dag_hash]
+                spec = specs[dag_hash] = spack.spec.Spec.from_node_dict(node)
+                for _, dep_hash, deptypes in \
+                        spack.spec.Spec.dependencies_from_node_dict(node):
+                    spec._add_dependency(node_spec(dep_hash), deptypes)
+            return specs[dag_hash]
+
+        linked = [node_spec(dag_hash) for dag_hash in hashes]
+        for spec in linked:
+            spec._mark_concrete()
+        return linked
+
+    def _record_linked(self, spec, merge_map, directories):
+        """Add the files and directories linked for a spec to the manifest.
+        """
+        root = os.path.abspath(self._root)
+        files = [os.path.relpath(dst, root) for dst in merge_map.values()]
+        self.manifest[spec.dag_hash()] = {
+            'files': sorted(files),
+            'dirs': [os.path.relpath(d, root) for d in directories],
+        }
+        self._file_links.update(files)
+        for s in spec.traverse():
+            self._manifest_nodes.setdefault(s.dag_hash(), s.to_node_dict())
+        self._manifest_changed = True
+
+    def _forget_linked(self, spec):
+        """Remove a spec from the manifest."""
+        linked = self.manifest.pop(spec.dag_hash(), None)
+        if linked:
+            self._file_links.subtract(linked['files'])
+            self._manifest_changed = True
+        return linked
+
     def add_specs(self, *specs, **kwargs):
         assert all((s.concrete for s in specs))
         specs = set(specs)
@@ -302,8 +432,45 @@ def add_specs(self, *specs, **kwargs):
 
         set(map(self._check_no_ext_conflicts, extensions))
         # fail on first error, otherwise link extensions as well
-        if all(map(self.add_standalone, standalones)):
-            all(map(self.add_extension, extensions))
+        try:
+            with self._queue_links(standalones):
+                added = all(map(self.add_standalone, standalones))
+            if added:
+                all(map(self.add_extension, extensions))
+        finally:
+            self._file_maps = {}
+            self.write_manifest()
+
+    @contextlib.contextmanager
+    def _queue_links(self, specs):
+        """Link the files of standalone specs in parallel in this context.
+
+        The files to link for all the specs are computed first, so that
+        conflicts between them are found before anything is linked.
+        """
+        owners = {}
+        for spec in specs:
+            if spec.external or self.check_added(spec):
+                continue
+            pkg = spec.package
+            tree = LinkTree(pkg.view_source())
+            ignore_file = match_predicate(self.layout.hidden_file_paths)
+            merge_map = tree.get_file_map(
+                pkg.view_destination(self), ignore_file)
+            self._file_maps[spec.dag_hash()] = merge_map
+            if self.ignore_conflicts:
+                continue
+            for dst in merge_map.values():
+                if owners.setdefault(dst, spec) is not spec:
+                    raise MergeConflictError(dst)
+
+        link = self.link
+        with LinkQueue(link, self.link_threads) as queue:
+            self.link = queue.link
+            try:
+                yield
+            finally:
+                self.link = link
 
     def add_extension(self, spec):
         if not spec.package.is_extension:
@@ -316,13 +483,16 @@ def add_extension(self, spec):
                      % colorize_spec(spec))
             return True
 
+        # the manifest records the extension as soon as it is activated
+        added = self.check_added(spec)
+
         if not spec.package.is_activated(self):
             spec.package.do_activate(
                 self, verbose=self.verbose, with_dependencies=False)
 
         # make sure the meta folder is linked as well (this is not done by the
         # extension-activation mechnism)
-        if not self.check_added(spec):
+        if not added:
             self.link_meta_folder(spec)
 
         return True
@@ -378,7 +548,9 @@ def merge(self, spec, ignore=None):
         # check for dir conflicts
         conflicts = tree.find_dir_conflicts(view_dst, ignore_file)
 
-        merge_map = tree.get_file_map(view_dst, ignore_file)
+        merge_map = self._file_maps.pop(spec.dag_hash(), None)
+        if merge_map is None or ignore is not None:
+            merge_map = tree.get_file_map(view_dst, ignore_file)
         if not self.ignore_conflicts:
             conflicts.extend(pkg.view_file_conflicts(self, merge_map))
 
@@ -386,15 +558,36 @@ def merge(self, spec, ignore=None):
             raise MergeConflictError(conflicts[0])
 
         # merge directories with the tree
-        tree.merge_directories(view_dst, ignore_file)
+        directories = tree.merge_directories(view_dst, ignore_file)
 
         pkg.add_files_to_view(self, merge_map)
 
+        if self.manifest is not None:
+            self._record_linked(spec, merge_map, directories)
+
     def unmerge(self, spec, ignore=None):
         pkg = spec.package
         view_source = pkg.view_source()
         view_dst = pkg.view_destination(self)
 
+        linked = self.manifest and self.manifest.get(spec.dag_hash())
+        if linked:
+            # Remove the files linked for the spec, without walking its
+            # prefix, which need not exist anymore
+            root = os.path.abspath(self._root)
+            merge_map = {}
+            for rel_path in linked['files']:
+                dst = os.path.join(root, rel_path)
+                src = os.path.join(
+                    view_source, os.path.relpath(dst, view_dst))
+                merge_map[src] = dst
+            pkg.remove_files_from_view(self, merge_map)
+            self._forget_linked(spec)
+
+            for rel_path in reversed(linked['dirs']):
+                _unmerge_directory(os.path.join(root, rel_path))
+            return
+
         tree = LinkTree(view_source)
 
         ignore = ignore or (lambda f: False)
@@ -433,6 +626,11 @@ def needs_file(spec, file):
         # remove if dest is not owned by any other package in the view
         # This will only be false if two packages are merged into a prefix
         # and have a conflicting file
+        if self.manifest is not None:
+            rel_path = os.path.relpath(dest, os.path.abspath(self._root))
+            if self._file_links[rel_path] <= 1:
+                os.remove(dest)
+            return
 
         # check all specs for whether they own the file. That include the spec
         # we are currently removing, as we remove files before unlinking the
@@ -443,6 +641,8 @@ def needs_file(spec, file):
 
     def check_added(self, spec):
         assert spec.concrete
+        if self.manifest is not None:
+            return spec.dag_hash() in self.manifest
         return spec == self.get_spec(spec)
 
     def remove_specs(self, *specs, **kwargs):
@@ -498,13 +698,19 @@ def remove_specs(self, *specs, **kwargs):
         assert set(to_deactivate_sorted) == to_deactivate
 
         # Remove the packages from the view
-        for spec in to_deactivate_sorted:
-            if spec.package.is_extension:
-                self.remove_extension(spec, with_dependents=with_dependents)
-            else:
-                self.remove_standalone(spec)
-
-        self._purge_empty_directories()
+        try:
+            for spec in to_deactivate_sorted:
+                if spec.package.is_extension:
+                    self.remove_extension(
+                        spec, with_dependents=with_dependents)
+                else:
+                    self.remove_standalone(spec)
+        finally:
+            self.write_manifest()
+
+        # the directories of specs in the manifest are removed with them
+        if self.manifest is None:
+            self._purge_empty_directories()
 
     def remove_extension(self, spec, with_dependents=True):
         """
@@ -555,6 +761,9 @@ def get_projection_for_spec(self, spec):
         return self._root
 
     def get_all_specs(self):
+        if self.manifest is not None:
+            return self.get_linked_specs(self.manifest)
+
         md_dirs = []
         for root, dirs, files in os.walk(self._root):
             if spack.store.layout.metadata_dir in dirs:
@@ -683,6 +892,14 @@ def unlink_meta_folder(self, spec):
         assert os.path.exists(path)
         shutil.rmtree(path)
 
+        # views with a manifest are not swept for empty directories
+        if self.manifest is not None:
+            root = os.path.abspath(self._root)
+            path = os.path.dirname(os.path.abspath(path))
+            while path.startswith(root + os.sep) and not os.listdir(path):
+                os.rmdir(path)
+                path = os.path.dirname(path)
+
     def _check_no_ext_conflicts(self, spec):
         """
             Check that there is no extension conflict for specs.
@@ -708,6 +925,20 @@ def get_spec_from_file(filename):
         return None
 
 
+def _unmerge_directory(path):
+    """Remove a directory linked in a view if it is empty, like
+    ``LinkTree.unmerge_directories()``."""
+    if not os.path.isdir(path):
+        return
+
+    if not os.listdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    marker = os.path.join(path, empty_file_name)
+    if os.path.exists(marker):
+        os.remove(marker)
+
+
 def colorize_root(root):
     colorize = ft.partial(tty.color.colorize, color=sys.stdout.isatty())
     pre, post = map(colorize, "@M[@. @M]@.".split())
@@ -27,10 +27,13 @@
 installations of packages in a Spack instance.
 """
 
+import functools
 import glob
 import heapq
 import itertools
+import multiprocessing
 import os
+import select
 import shutil
 import six
 import sys
@@ -43,10 +46,12 @@
 import spack.compilers
 import spack.error
 import spack.hooks
+import spack.mirror
 import spack.package
 import spack.package_prefs as prefs
 import spack.repo
 import spack.store
+import spack.util.jobserver
 
 from llnl.util.tty.color import colorize
 from llnl.util.tty.log import log_output
@@ -79,6 +84,15 @@
 #: queue invariants).
 STATUS_REMOVED = 'removed'
 
+#: Error message when terminating the installation on the first failure
+_fail_fast_err = 'Terminating after first install failure'
+
+#: Maximum number of binary cache tarballs downloaded at the same time
+_max_binary_downloads = 8
+
+#: Maximum number of packages whose sources are fetched at the same time
+_max_source_downloads = 4
+
 
 def _handle_external_and_upstream(pkg, explicit):
     """
@@ -190,6 +204,21 @@ def _packages_needed_to_bootstrap_compiler(pkg):
     return packages
 
 
+def _build_jobs_on_command_line():
+    """
+    Whether the number of build jobs was given on the command line, with
+    ``-j``.
+
+    Return:
+        (bool) ``True`` if ``config:build_jobs`` is set in the command line
+        scope, otherwise ``False``
+    """
+    if 'command_line' not in spack.config.config.scopes:
+        return False
+    return spack.config.get(
+        'config:build_jobs', scope='command_line') is not None
+
+
 def _hms(seconds):
     """
     Convert seconds to hours, minutes, seconds
@@ -213,7 +242,8 @@ def _hms(seconds):
     return ' '.join(parts)
 
 
-def _install_from_cache(pkg, cache_only, explicit, unsigned=False):
+def _install_from_cache(pkg, cache_only, explicit, unsigned=False,
+                        tarball=None):
     """
     Install the package from binary cache
 
@@ -224,13 +254,15 @@ def _install_from_cache(pkg, cache_only, explicit, unsigned=False):
             requested by the user, otherwise, ``False``
         unsigned (bool): ``True`` if binary package signatures to be checked,
             otherwise, ``False``
+        tarball (str): path to the binary cache tarball of the package, if
+            it was already downloaded
 
     Return:
         (bool) ``True`` if the package was installed from binary cache,
             ``False`` otherwise
     """
     installed_from_cache = _try_install_from_binary_cache(pkg, explicit,
-                                                          unsigned)
+                                                          unsigned, tarball)
     pkg_id = package_id(pkg)
     if not installed_from_cache:
         pre = 'No binary for {0} found'.format(pkg_id)
@@ -302,7 +334,8 @@ def _process_external_package(pkg, explicit):
         spack.store.db.add(spec, None, explicit=explicit)
 
 
-def _process_binary_cache_tarball(pkg, binary_spec, explicit, unsigned):
+def _process_binary_cache_tarball(pkg, binary_spec, explicit, unsigned,
+                                  tarball=None):
     """
     Process the binary cache tarball.
 
@@ -312,28 +345,57 @@ def _process_binary_cache_tarball(pkg, binary_spec, explicit, unsigned):
         explicit (bool): the package was explicitly requested by the user
         unsigned (bool): ``True`` if binary package signatures to be checked,
             otherwise, ``False``
+        tarball (str): path to the tarball, if it was already downloaded
 
     Return:
         (bool) ``True`` if the package was installed from binary cache,
             else ``False``
     """
-    tarball = binary_distribution.download_tarball(binary_spec)
+    if tarball is None:
+        tarball = binary_distribution.download_tarball(binary_spec)
     # see #10063 : install from source if tarball doesn't exist
     if tarball is None:
         tty.msg('{0} exists in binary cache but with different hash'
                 .format(pkg.name))
         return False
 
+    _extract_binary_cache_tarball(pkg, binary_spec, tarball, unsigned)
+    pkg.installed_from_binary_cache = True
+    spack.store.db.add(pkg.spec, spack.store.layout, explicit=explicit)
+    return True
+
+
+def _extract_binary_cache_tarball(pkg, binary_spec, tarball, unsigned):
+    """
+    Extract and relocate the binary cache tarball into the package prefix.
+
+    Args:
+        pkg (PackageBase): the package being installed
+        binary_spec (Spec): the spec  whose cache has been confirmed
+        tarball (str): path to the downloaded tarball
+        unsigned (bool): ``True`` if binary package signatures to be checked,
+            otherwise, ``False``
+    """
     pkg_id = package_id(pkg)
     tty.msg('Installing {0} from binary cache'.format(pkg_id))
     binary_distribution.extract_tarball(binary_spec, tarball, allow_root=False,
                                         unsigned=unsigned, force=False)
-    pkg.installed_from_binary_cache = True
-    spack.store.db.add(pkg.spec, spack.store.layout, explicit=explicit)
-    return True
 
 
-def _try_install_from_binary_cache(pkg, explicit, unsigned=False):
+def _binary_spec(pkg):
+    """
+    Copy of the spec of the package to look up and install from binary cache.
+
+    Args:
+        pkg (PackageBase): the package to be installed from binary cache
+    """
+    binary_spec = spack.spec.Spec.from_dict(pkg.spec.to_dict())
+    binary_spec._mark_concrete()
+    return binary_spec
+
+
+def _try_install_from_binary_cache(pkg, explicit, unsigned=False,
+                                   tarball=None):
     """
     Try to install the package from binary cache.
 
@@ -342,16 +404,96 @@ def _try_install_from_binary_cache(pkg, explicit, unsigned=False):
         explicit (bool): the package was explicitly requested by the user
         unsigned (bool): ``True`` if binary package signatures to be checked,
             otherwise, ``False``
+        tarball (str): path to the binary cache tarball of the package, if
+            it was already downloaded
     """
-    pkg_id = package_id(pkg)
-    tty.debug('Searching for binary cache of {0}'.format(pkg_id))
-    specs = binary_distribution.get_spec(pkg.spec, force=False)
-    binary_spec = spack.spec.Spec.from_dict(pkg.spec.to_dict())
-    binary_spec._mark_concrete()
-    if binary_spec not in specs:
-        return False
+    binary_spec = _binary_spec(pkg)
+    if tarball is None:
+        pkg_id = package_id(pkg)
+        tty.debug('Searching for binary cache of {0}'.format(pkg_id))
+        specs = binary_distribution.get_spec(pkg.spec, force=False)
+        if binary_spec not in specs:
+            return False
+
+    return _process_binary_cache_tarball(pkg, binary_spec, explicit, unsigned,
+                                         tarball)
+
+
+def _download_binary_cache_tarballs(connection, spec_yamls):
+    """
+    Download the binary cache tarballs of packages in a worker process, so
+    that they are ready by the time the packages are installed.
+
+    Downloading is best effort: if it fails, the package is looked up in the
+    binary caches again when it is installed, which reports the failure.
+
+    Args:
+        connection (multiprocessing.Connection): where the path to each
+            tarball is sent, in order, or ``None`` if it is not in the
+            binary caches or could not be downloaded
+        spec_yamls (list): YAML representations of the concrete specs
+    """
+    # The installing process reports on the packages it installs
+    tty.set_msg_enabled(False)
+    for spec_yaml in spec_yamls:
+        try:
+            spec = spack.spec.Spec.from_yaml(spec_yaml)
+            spec._mark_concrete()
+            tarball = binary_distribution.download_tarball(spec)
+        except Exception as e:
+            tty.debug('Failed to download the binary cache tarball: {0}'
+                      .format(str(e)))
+            tarball = None
+        connection.send(tarball)
+    connection.close()
+
+
+def _fetch_sources(connection, spec_yamls, use_cache):
+    """
+    Fetch the source archives, resources and patches of packages in a worker
+    process, so that they are staged and checksummed by the time the packages
+    are built.
+
+    Fetching is best effort: if it fails, the package is fetched again when
+    it is built, which reports the failure.
+
+    Args:
+        connection (multiprocessing.Connection): where whether the sources of
+            each package were fetched is sent, in order
+        spec_yamls (list): YAML representations of the concrete specs
+        use_cache (bool): ``True`` if packages are installed from binary
+            caches when possible, in which case their sources are not fetched
+    """
+    # The installing process reports on the packages it fetches
+    tty.set_msg_enabled(False)
+    checksum = spack.config.get('config:checksum')
+    for spec_yaml in spec_yamls:
+        fetched, pkg = False, None
+        try:
+            spec = spack.spec.Spec.from_yaml(spec_yaml)
+            spec._mark_concrete()
+            pkg = spec.package
+
+            # Packages without checksums need the user's consent to be
+            # fetched, and binary packages do not need their sources.
+            if checksum and pkg.version not in pkg.versions:
+                tty.debug('Not fetching {0} without a checksum'
+                          .format(package_id(pkg)))
+            elif use_cache and spack.mirror.MirrorCollection() and \
+                    binary_distribution.get_spec(spec, force=False):
+                tty.debug('Not fetching {0} from a binary cache'
+                          .format(package_id(pkg)))
+            else:
+                pkg.do_fetch()
+                fetched = True
+        except Exception as e:
+            tty.debug('Failed to fetch the sources: {0}'.format(str(e)))
 
-    return _process_binary_cache_tarball(pkg, binary_spec, explicit, unsigned)
+            # Leave the stage to the build, as if it was never fetched
+            if pkg is not None:
+                pkg.stage.destroy()
+        connection.send(fetched)
+    connection.close()
 
 
 def _update_explicit_entry_in_db(pkg, rec, explicit):
@@ -366,11 +508,9 @@ def _update_explicit_entry_in_db(pkg, rec, explicit):
             package.
     """
     if explicit and not rec.explicit:
-        with spack.store.db.write_transaction():
-            rec = spack.store.db.get_record(pkg.spec)
-            message = '{s.name}@{s.version} : marking the package explicit'
-            tty.msg(message.format(s=pkg.spec))
-            rec.explicit = True
+        message = '{s.name}@{s.version} : marking the package explicit'
+        tty.msg(message.format(s=pkg.spec))
+        spack.store.db.update_explicit(pkg.spec, True)
 
 
 def clear_failures():
@@ -558,6 +698,9 @@ def package_id(pkg):
 
 install_args_docstring = """
             cache_only (bool): Fail if binary package unavailable.
+            concurrent_packages (int): Maximum number of packages to build at
+                the same time, which share the parallel build jobs (default
+                is ``config:concurrent_packages``, or 1).
             dirty (bool): Don't clean the build environment before installing.
             explicit (bool): True if package was explicitly installed, False
                 if package was implicitly installed (as a dependency).
@@ -644,6 +787,29 @@ def __init__(self, pkg):
         # Locks on specs being built, keyed on the package's unique id
         self.locks = {}
 
+        # Maximum number of packages built at the same time
+        self.concurrent_packages = 1
+
+        # Build tasks running in child processes, keyed on the package's
+        # unique id, with their build processes
+        self.building = {}
+
+        # Jobserver the builds draw their parallel jobs from, if any
+        self.jobserver = None
+
+        # Binary cache tarballs being downloaded in the background, keyed on
+        # the package's unique id, with the processes downloading them
+        self.binaries = {}
+        self.downloaders = []
+
+        # Sources being fetched in the background, keyed on the package's
+        # unique id, with the packages and the processes fetching them
+        self.sources = {}
+
+        # Unique ids of the packages put back in the queue since the last
+        # package was installed, because what they need was being downloaded
+        self.deferred = set()
+
     def __repr__(self):
         """Returns a formal representation of the package installer."""
         rep = '{0}('.format(self.__class__.__name__)
@@ -660,6 +826,31 @@ def __str__(self):
         return '{0} ({1}): {2}; {3}; {4}'.format(
             self.pkg_id, self.pid, tasks, installed, failed)
 
+    def _acquire_job(self):
+        """
+        Ensure there is a job for one more build.
+
+        The first build may run in the job of this process, while the others
+        each need a token from the jobserver, if any.
+
+        Return:
+            ``True`` if another build can be started, otherwise ``False``
+        """
+        if self.jobserver is None:
+            return True
+        jobs = len(self.jobserver.tokens) + self.jobserver.free_jobs
+        if len(self.building) < jobs:
+            return True
+        return self.jobserver.try_acquire()
+
+    def _release_job(self):
+        """Give back the tokens of the jobserver the builds do not need."""
+        if self.jobserver is None:
+            return
+        needed = max(len(self.building) - self.jobserver.free_jobs, 0)
+        while len(self.jobserver.tokens) > needed:
+            self.jobserver.release()
+
     def _add_bootstrap_compilers(self, pkg):
         """
         Add bootstrap compilers and dependencies to the build queue.
@@ -868,6 +1059,227 @@ def _cleanup_task(self, pkg):
         # spec during our installation.
         self._ensure_locked('read', pkg)
 
+    def _complete_builds(self, keep_prefix, fail_fast, jobserver=None,
+                         downloaders=()):
+        """
+        Wait for at least one of the packages being built in child processes
+        to finish and process the outcome of the builds that are over.
+
+        Args:
+            keep_prefix (bool): ``True`` if the prefix is to be kept on
+                failure, otherwise ``False``
+            fail_fast (bool): ``True`` if the installation is to terminate
+                after the first failure, otherwise ``False``
+            jobserver (Jobserver): stop waiting as soon as this jobserver
+                has a job available, even if no build is over
+            downloaders (iterable): stop waiting as soon as one of these
+                background downloaders sends a result, even if no build is
+                over
+
+        Return:
+            (bool) the updated ``keep_prefix``
+        """
+        waiting = [process for _, process in self.building.values()]
+        if jobserver is not None and jobserver.can_acquire:
+            waiting.append(jobserver)
+        waiting.extend(downloaders)
+
+        ready, _, _ = select.select(waiting, [], [])
+        for process in ready:
+            if process is jobserver or process in downloaders:
+                continue
+
+            task, _ = self.building.pop(package_id(process.pkg))
+
+            # Give back the job of the build to the jobserver
+            self._release_job()
+
+            install = functools.partial(
+                self._complete_install_task, task, process.complete)
+            keep_prefix = self._run_install_task(
+                task, install, keep_prefix, fail_fast)
+        return keep_prefix
+
+    def _close_jobserver(self):
+        """Stop drawing jobs from the jobserver and give back its tokens."""
+        if self.jobserver is not None:
+            spack.util.jobserver.activate(None)
+            self.jobserver.close()
+            self.jobserver = None
+
+    def _prefetch_binaries(self):
+        """
+        Start downloading the binary cache tarballs of all the packages to
+        install in the background, so that installing them from the binary
+        cache does not wait for each download in turn.
+
+        The downloads run in child processes, since fetching changes the
+        working directory of the process.
+        """
+        if not spack.mirror.MirrorCollection() or \
+                multiprocessing.current_process().daemon:
+            return
+
+        specs = []
+        for task in self._queued_tasks():
+            pkg = task.pkg
+            if pkg.spec.external or pkg.installed_upstream or pkg.installed:
+                continue
+            specs.append((task.pkg_id, pkg.spec))
+
+        if not specs:
+            return
+
+        tty.debug('Downloading binary cache tarballs of {0} packages'
+                  .format(len(specs)))
+        processes = min(len(specs), _max_binary_downloads)
+        for i in range(processes):
+            downloader = BackgroundDownloader(
+                _download_binary_cache_tarballs, specs[i::processes])
+            self.downloaders.append(downloader)
+            for pkg_id in downloader.pkg_ids:
+                self.binaries[pkg_id] = downloader
+
+    def _prefetch_sources(self, use_cache):
+        """
+        Start fetching the sources of all the packages to build in the
+        background, so that building a package overlaps with fetching the
+        sources of the next ones.
+
+        The sources are fetched into the stages of the packages, and into
+        the fetch cache, as when the packages are built.  Packages whose stage
+        already exists are left alone, as are packages that may be installed
+        from a binary cache.
+
+        Args:
+            use_cache (bool): ``True`` if packages are installed from binary
+                caches when possible, otherwise ``False``
+        """
+        if multiprocessing.current_process().daemon:
+            return
+
+        specs, pkgs = [], {}
+        for task in self._queued_tasks():
+            pkg = task.pkg
+            if pkg.spec.external or pkg.installed_upstream or \
+                    not pkg.has_code or pkg.installed:
+                continue
+
+            stage = pkg.stage
+            if not stage.managed_by_spack or os.path.exists(stage.path):
+                continue
+            specs.append((task.pkg_id, pkg.spec))
+            pkgs[task.pkg_id] = pkg
+
+        if not specs:
+            return
+
+        tty.debug('Fetching the sources of {0} packages'.format(len(specs)))
+        processes = min(len(specs), _max_source_downloads)
+        for i in range(processes):
+            downloader = BackgroundDownloader(
+                _fetch_sources, specs[i::processes], use_cache)
+            self.downloaders.append(downloader)
+            for pkg_id in downloader.pkg_ids:
+                self.sources[pkg_id] = (pkgs[pkg_id], downloader)
+
+    def _pending_downloads(self, pkg_id):
+        """
+        The processes still downloading what a package needs, binary cache
+        tarball or sources, checking what they sent without waiting.
+
+        Args:
+            pkg_id (str): the package's unique id
+
+        Return:
+            (list) the downloaders that did not send the package's result yet
+        """
+        downloaders = [self.binaries.get(pkg_id),
+                       self.sources.get(pkg_id, (None, None))[1]]
+        return [downloader for downloader in downloaders
+                if downloader is not None and not downloader.ready(pkg_id)]
+
+    def _defer_task(self, task, keep_prefix, fail_fast):
+        """
+        Put a build task whose downloads are not done back in the queue, so
+        that the packages whose downloads are done are installed first.
+
+        Once all the tasks that could be started were put back, this waits
+        for their downloads or for a build to finish before going on.
+
+        Args:
+            task (BuildTask): the installation build task for a package
+            keep_prefix (bool): ``True`` if the prefix is to be kept on
+                failure, otherwise ``False``
+            fail_fast (bool): ``True`` if the installation is to terminate
+                after the first failure, otherwise ``False``
+
+        Return:
+            (bool) the updated ``keep_prefix``
+        """
+        self._push_task(task.pkg, task.compiler, task.start, task.attempts,
+                        STATUS_ADDED)
+        self._release_job()
+        if task.pkg_id not in self.deferred:
+            tty.debug('Waiting for the downloads of {0}'.format(task.pkg_id))
+            self.deferred.add(task.pkg_id)
+            return keep_prefix
+
+        downloaders = []
+        for pkg_id in self.deferred:
+            downloaders.extend(d for d in self._pending_downloads(pkg_id)
+                               if d not in downloaders)
+        self.deferred.clear()
+
+        # The downloads may have finished since the task was put back
+        if not downloaders:
+            return keep_prefix
+        return self._complete_builds(keep_prefix, fail_fast,
+                                     downloaders=downloaders)
+
+    def _prefetched_binary(self, pkg_id):
+        """
+        Wait for the binary cache tarball of a package to be downloaded.
+
+        Args:
+            pkg_id (str): the package's unique id
+
+        Return:
+            (str) path to the tarball, or ``None`` if it was not downloaded
+        """
+        downloader = self.binaries.pop(pkg_id, None)
+        if downloader is None:
+            return None
+        return downloader.result(pkg_id)
+
+    def _prefetched_source(self, pkg_id):
+        """
+        Wait for the sources of a package to be fetched into its stage.
+
+        Args:
+            pkg_id (str): the package's unique id
+
+        Return:
+            (bool) ``True`` if the sources were fetched, otherwise ``False``
+        """
+        _, downloader = self.sources.pop(pkg_id, (None, None))
+        if downloader is None:
+            return False
+        return bool(downloader.result(pkg_id))
+
+    def _close_downloaders(self):
+        """
+        Stop downloading binary cache tarballs and fetching sources that are
+        not needed, and remove the stages of the packages that were not
+        built."""
+        for downloader in self.downloaders:
+            downloader.terminate()
+        for pkg, _ in self.sources.values():
+            pkg.stage.destroy()
+        self.downloaders = []
+        self.binaries = {}
+        self.sources = {}
+
     def _ensure_install_ready(self, pkg):
         """
         Ensure the package is ready to install locally, which includes
@@ -929,8 +1341,10 @@ def _ensure_locked(self, lock_type, pkg):
             # Wait until the other process finishes if there are no more
             # build tasks with priority 0 (i.e., with no uninstalled
             # dependencies).
+            # Builds of our own that are still running also need to be
+            # waited on, so don't block on the lock then either.
             no_p0 = len(self.build_tasks) == 0 or not self._next_is_pri0()
-            timeout = None if no_p0 else 3
+            timeout = None if no_p0 and not self.building else 3
         else:
             timeout = 1e-9  # Near 0 to iterate through install specs quickly
 
@@ -1033,9 +1447,73 @@ def _install_task(self, task, **kwargs):
 
         Args:
             task (BuildTask): the installation build task for a package"""
+        build_process = self._prepare_install_task(task, **kwargs)
+        if build_process is None:
+            return
+
+        self._setup_install_dir(task.pkg)
+
+        # Fork a child to do the actual installation.
+        fork = functools.partial(
+            spack.build_environment.fork, task.pkg, build_process,
+            dirty=kwargs.get('dirty', False), fake=kwargs.get('fake', False))
+        self._complete_install_task(task, fork)
+
+    _install_task.__doc__ += install_args_docstring
+
+    def _start_install_task(self, task, **kwargs):
+        """
+        Start the installation of the package of the build task in a child
+        process, without waiting for it to finish.
+
+        Packages installed from a binary cache are extracted in the child
+        process as well, if their tarball was already downloaded.  Otherwise,
+        they are installed before this returns.
+
+        Args:
+            task (BuildTask): the installation build task for a package
+
+        Return:
+            (BuildProcess) the process building the package, or None if
+                there is nothing left to do to install the package"""
+        build_process = self._prepare_install_task(task, **kwargs)
+        if build_process is None:
+            return None
+
+        # Binary packages are extracted into their prefix, and do not need a
+        # build environment.
+        pkg = task.pkg
+        binary = pkg.installed_from_binary_cache
+        if not binary:
+            self._setup_install_dir(pkg)
+
+        # Fork a child to do the actual installation.  Builds running at the
+        # same time share the parallel jobs and cannot all read the terminal.
+        process = spack.build_environment.start_build_process(
+            pkg, build_process, dirty=kwargs.get('dirty', False),
+            fake=kwargs.get('fake', False) or binary,
+            jobs=self._jobs_per_package(), forward_input=False)
+        if not binary:
+            tty.msg('{0}: {1}: Build log: {2}'
+                    .format(self.pid, pkg.name, pkg.log_path))
+        return process
+
+    _start_install_task.__doc__ += install_args_docstring
+
+    def _prepare_install_task(self, task, **kwargs):
+        """
+        Prepare the installation of the package of the build task, which is
+        installed from a binary cache if possible.
+
+        Args:
+            task (BuildTask): the installation build task for a package
+
+        Return:
+            (callable) the function building the package in a child process,
+                or None if there is nothing left to do to install the
+                package"""
 
         cache_only = kwargs.get('cache_only', False)
-        dirty = kwargs.get('dirty', False)
         fake = kwargs.get('fake', False)
         install_source = kwargs.get('install_source', False)
         keep_stage = kwargs.get('keep_stage', False)
@@ -1054,10 +1532,38 @@ def _install_task(self, task, **kwargs):
         task.status = STATUS_INSTALLING
 
         # Use the binary cache if requested
-        if use_cache and \
-                _install_from_cache(pkg, cache_only, explicit, unsigned):
-            self._update_installed(task)
-            return
+        if use_cache:
+            tarball = self._prefetched_binary(pkg_id)
+            if tarball and self.concurrent_packages > 1:
+                # Extract and relocate the binary package in a child process,
+                # at the same time as other packages are installed
+                pkg.installed_from_binary_cache = True
+
+                def install_binary_process():
+                    """
+                    This function installs the package from the binary cache
+                    tarball in the process forked for it.
+
+                    The parent process adds the package to the database.
+                    """
+                    _extract_binary_cache_tarball(
+                        pkg, _binary_spec(pkg), tarball, unsigned)
+                    tty.debug('Successfully installed {0} from binary cache'
+                              .format(pkg_id))
+                    _print_installed_pkg(pkg.spec.prefix)
+                    spack.hooks.post_install(pkg.spec)
+                    return spack.package.PackageBase._verbose
+
+                return install_binary_process
+
+            if _install_from_cache(pkg, cache_only, explicit, unsigned,
+                                   tarball):
+                self._update_installed(task)
+                return None
+
+        # The build fetches whatever could not be fetched ahead of time
+        if self._prefetched_source(pkg_id):
+            tty.debug('Sources of {0} already fetched'.format(pkg_id))
 
         pkg.run_tests = (tests is True or tests and pkg.name in tests)
 
@@ -1167,15 +1673,28 @@ def build_process():
         # hook that allows tests to inspect the Package before installation
         # see unit_test_check() docs.
         if not pkg.unit_test_check():
-            return
+            return None
 
-        try:
-            self._setup_install_dir(pkg)
+        return build_process
+
+    _prepare_install_task.__doc__ += install_args_docstring
 
-            # Fork a child to do the actual installation.
+    def _complete_install_task(self, task, build):
+        """
+        Wait for the package of the build task to be built and register the
+        installed package.
+
+        Args:
+            task (BuildTask): the installation build task for a package
+            build (callable): argless function waiting for the build process
+                to finish, which returns the value it returned
+        """
+        pkg = task.pkg
+        explicit = task.pkg_id == self.pkg_id
+
+        try:
             # Preserve verbosity settings across installs.
-            spack.package.PackageBase._verbose = spack.build_environment.fork(
-                pkg, build_process, dirty=dirty, fake=fake)
+            spack.package.PackageBase._verbose = build()
 
             # Note: PARENT of the build process adds the new package to
             # the database, so that we don't need to re-read from file.
@@ -1193,7 +1712,43 @@ def build_process():
             tty.debug('Package stage directory : {0}'
                       .format(pkg.stage.source_path))
 
-    _install_task.__doc__ += install_args_docstring
+    def _jobs_per_package(self):
+        """
+        Share of the parallel build jobs for each of the packages built at
+        the same time.
+
+        Return:
+            (int) number of jobs, which is at least 1
+        """
+        jobs = min(spack.config.get('config:build_jobs', 16),
+                   multiprocessing.cpu_count())
+        return max(jobs // self.concurrent_packages, 1)
+
+    def _open_jobserver(self):
+        """
+        Set up the jobserver the builds draw their parallel jobs from.
+
+        This is the jobserver of the make running Spack, if any.  Otherwise,
+        it is the one shared by the ``spack install`` processes of the user
+        on this host, so they do not run more than ``config:build_jobs``
+        jobs in total.  The shared one is skipped when ``-j`` was given on
+        the command line, since its jobs were set by the first process to
+        use it, and are not the ones asked for.  Spack creates its own
+        jobserver when building several packages at the same time without
+        the shared one.
+        """
+        if not spack.config.get('config:jobserver', True):
+            return
+
+        self.jobserver = spack.util.jobserver.Jobserver.from_environment()
+        if self.jobserver is None:
+            jobs = min(spack.config.get('config:build_jobs', 16),
+                       multiprocessing.cpu_count())
+            if not _build_jobs_on_command_line():
+                self.jobserver = spack.util.jobserver.Jobserver.shared(jobs)
+            if self.jobserver is None and self.concurrent_packages > 1:
+                self.jobserver = spack.util.jobserver.Jobserver.create(jobs)
+        spack.util.jobserver.activate(self.jobserver)
 
     def _next_is_pri0(self):
         """
@@ -1207,6 +1762,26 @@ def _next_is_pri0(self):
         task = self.build_pq[0][1]
         return task.priority == 0
 
+    def _next_is_ready(self):
+        """
+        Determine if there is a build task that can be started right away,
+        i.e., whose dependencies are all installed.
+
+        Return:
+            True if there is, False otherwise
+        """
+        # Discard removed tasks so the first entry is the next one popped
+        while self.build_pq and self.build_pq[0][1].status == STATUS_REMOVED:
+            heapq.heappop(self.build_pq)
+        return bool(self.build_pq) and self._next_is_pri0()
+
+    def _queued_tasks(self):
+        """
+        The build tasks in the queue, in the order they are to be popped.
+        """
+        return [task for _, task in sorted(self.build_pq)
+                if task.status != STATUS_REMOVED]
+
     def _pop_task(self):
         """
         Remove and return the lowest priority build task.
@@ -1305,6 +1880,91 @@ def _requeue_task(self, task):
         self._push_task(task.pkg, task.compiler, start, task.attempts,
                         STATUS_INSTALLING)
 
+    def _run_install_task(self, task, install, keep_prefix, fail_fast):
+        """
+        Install the package of the build task and update the installation
+        status per the outcome.
+
+        If the package is left building in a child process, the outcome is
+        processed once the build is over (see ``_complete_builds()``).
+
+        Args:
+            task (BuildTask): the build task for the write-locked package
+            install (callable): argless function performing the install,
+                which returns the process still building the package, if
+                any
+            keep_prefix (bool): ``True`` if the prefix is to be kept on
+                failure, otherwise ``False``
+            fail_fast (bool): ``True`` if the installation is to terminate
+                after the first failure, otherwise ``False``
+
+        Return:
+            (bool) the updated ``keep_prefix``
+        """
+        pkg, pkg_id = task.pkg, task.pkg_id
+        process = None
+        try:
+            process = install()
+            if process is None:
+                self._update_installed(task)
+
+                # If we installed then we should keep the prefix
+                stop_before_phase = getattr(pkg, 'stop_before_phase', None)
+                last_phase = getattr(pkg, 'last_phase', None)
+                keep_prefix = keep_prefix or \
+                    (stop_before_phase is None and last_phase is None)
+
+        except spack.directory_layout.InstallDirectoryAlreadyExistsError:
+            tty.debug("Keeping existing install prefix in place.")
+            self._update_installed(task)
+            raise
+
+        except KeyboardInterrupt as exc:
+            # The build has been terminated with a Ctrl-C so terminate.
+            err = 'Failed to install {0} due to {1}: {2}'
+            tty.error(err.format(pkg.name, exc.__class__.__name__,
+                      str(exc)))
+            raise
+
+        except (Exception, SystemExit) as exc:
+            # Best effort installs suppress the exception and mark the
+            # package as a failure UNLESS this is the explicit package.
+            err = 'Failed to install {0} due to {1}: {2}'
+            tty.error(err.format(pkg.name, exc.__class__.__name__,
+                      str(exc)))
+
+            self._update_failed(task, True, exc)
+
+            if fail_fast:
+                # The user requested the installation to terminate on
+                # failure.
+                raise InstallError('{0}: {1}'
+                                   .format(_fail_fast_err, str(exc)))
+
+            if pkg_id == self.pkg_id:
+                raise
+
+        finally:
+            if process is None:
+                # Remove the install prefix if anything went wrong during
+                # install.
+                if not keep_prefix:
+                    pkg.remove_prefix()
+
+                # The subprocess *may* have removed the build stage. Mark it
+                # not created so that the next time pkg.stage is invoked, we
+                # check the filesystem for it.
+                pkg.stage.created = False
+
+        if process is not None:
+            self.building[pkg_id] = (task, process)
+            return keep_prefix
+
+        # Perform basic task cleanup for the installed spec to
+        # include downgrading the write to a read lock
+        self._cleanup_task(pkg)
+        return keep_prefix
+
     def _setup_install_dir(self, pkg):
         """
         Create and ensure proper access controls for the install directory.
@@ -1333,6 +1993,13 @@ def _setup_install_dir(self, pkg):
             # Ensure the metadata path exists as well
             fs.mkdirp(spack.store.layout.metadata_path(pkg.spec), mode=perms)
 
+    def _terminate_builds(self):
+        """Stop the packages still being built in child processes."""
+        for pkg_id, (task, process) in self.building.items():
+            tty.warn('Terminating the build of {0}'.format(pkg_id))
+            process.terminate()
+        self.building.clear()
+
     def _update_failed(self, task, mark=False, exc=None):
         """
         Update the task and transitive dependents as failed; optionally mark
@@ -1405,8 +2072,11 @@ def install(self, **kwargs):
         keep_prefix = kwargs.get('keep_prefix', False)
         keep_stage = kwargs.get('keep_stage', False)
         restage = kwargs.get('restage', False)
-
-        fail_fast_err = 'Terminating after first install failure'
+        use_cache = kwargs.get('use_cache', True)
+        cache_only = kwargs.get('cache_only', False)
+        fake = kwargs.get('fake', False)
+        self.concurrent_packages = kwargs.get('concurrent_packages') or \
+            spack.config.get('config:concurrent_packages', 1)
 
         # install_package defaults True and is popped so that dependencies are
         # always installed regardless of whether the root was installed
@@ -1425,172 +2095,180 @@ def install(self, **kwargs):
         # Initialize the build task queue
         self._init_queue(install_deps, install_package)
 
-        # Proceed with the installation
-        while self.build_pq:
-            task = self._pop_task()
-            if task is None:
-                continue
+        # Share the parallel jobs with the other builds
+        self._open_jobserver()
 
-            pkg, spec = task.pkg, task.pkg.spec
-            pkg_id = package_id(pkg)
-            tty.verbose('Processing {0}: task={1}'.format(pkg_id, task))
-
-            # Ensure that the current spec has NO uninstalled dependencies,
-            # which is assumed to be reflected directly in its priority.
-            #
-            # If the spec has uninstalled dependencies, then there must be
-            # a bug in the code (e.g., priority queue or uninstalled
-            # dependencies handling).  So terminate under the assumption that
-            # all subsequent tasks will have non-zero priorities or may be
-            # dependencies of this task.
-            if task.priority != 0:
-                tty.error('Detected uninstalled dependencies for {0}: {1}'
-                          .format(pkg_id, task.uninstalled_deps))
-                dep_str = 'dependencies' if task.priority > 1 else 'dependency'
-                raise InstallError(
-                    'Cannot proceed with {0}: {1} uninstalled {2}: {3}'
-                    .format(pkg_id, task.priority, dep_str,
-                            ','.join(task.uninstalled_deps)))
-
-            # Skip the installation if the spec is not being installed locally
-            # (i.e., if external or upstream) BUT flag it as installed since
-            # some package likely depends on it.
-            if pkg_id != self.pkg_id:
-                not_local = _handle_external_and_upstream(pkg, False)
-                if not_local:
-                    self._update_installed(task)
-                    _print_installed_pkg(pkg.prefix)
+        # Proceed with the installation
+        try:
+            # Download what is in the binary caches ahead of time
+            if use_cache:
+                self._prefetch_binaries()
+
+            # Fetch the sources of the packages to build while others build.
+            # Restaging fetches them again anyway, and fake installs do not
+            # need them.
+            if not (cache_only or fake or restage):
+                self._prefetch_sources(use_cache)
+
+            while self.build_pq or self.building:
+                # Wait for builds to finish when no more can be started,
+                # because enough are running or the remaining tasks depend
+                # on the packages being built.
+                if self.building and (
+                        len(self.building) >= self.concurrent_packages or
+                        not self._next_is_ready()):
+                    keep_prefix = self._complete_builds(keep_prefix,
+                                                        fail_fast)
                     continue
 
-            # Flag a failed spec.  Do not need an (install) prefix lock since
-            # assume using a separate (failed) prefix lock file.
-            if pkg_id in self.failed or spack.store.db.prefix_failed(spec):
-                tty.warn('{0} failed to install'.format(pkg_id))
-                self._update_failed(task)
-
-                if fail_fast:
-                    raise InstallError(fail_fast_err)
+                # Wait for a job from the jobserver as well as for builds to
+                # finish if another build cannot be started yet.
+                if not self._acquire_job():
+                    keep_prefix = self._complete_builds(
+                        keep_prefix, fail_fast, self.jobserver)
+                    continue
 
-                continue
+                task = self._pop_task()
+                if task is None:
+                    continue
 
-            # Attempt to get a write lock.  If we can't get the lock then
-            # another process is likely (un)installing the spec or has
-            # determined the spec has already been installed (though the
-            # other process may be hung).
-            ltype, lock = self._ensure_locked('write', pkg)
-            if lock is None:
-                # Attempt to get a read lock instead.  If this fails then
-                # another process has a write lock so must be (un)installing
-                # the spec (or that process is hung).
-                ltype, lock = self._ensure_locked('read', pkg)
-
-            # Requeue the spec if we cannot get at least a read lock so we
-            # can check the status presumably established by another process
-            # -- failed, installed, or uninstalled -- on the next pass.
-            if lock is None:
-                self._requeue_task(task)
-                continue
+                pkg, spec = task.pkg, task.pkg.spec
+                pkg_id = package_id(pkg)
+                tty.verbose('Processing {0}: task={1}'.format(pkg_id, task))
+
+                # Ensure that the current spec has NO uninstalled
+                # dependencies, which is assumed to be reflected directly in
+                # its priority.
+                #
+                # If the spec has uninstalled dependencies, then there must
+                # be a bug in the code (e.g., priority queue or uninstalled
+                # dependencies handling).  So terminate under the assumption
+                # that all subsequent tasks will have non-zero priorities or
+                # may be dependencies of this task.
+                if task.priority != 0:
+                    tty.error('Detected uninstalled dependencies for {0}: {1}'
+                              .format(pkg_id, task.uninstalled_deps))
+                    dep_str = 'dependencies' if task.priority > 1 \
+                        else 'dependency'
+                    raise InstallError(
+                        'Cannot proceed with {0}: {1} uninstalled {2}: {3}'
+                        .format(pkg_id, task.priority, dep_str,
+                                ','.join(task.uninstalled_deps)))
+
+                # Skip the installation if the spec is not being installed
+                # locally (i.e., if external or upstream) BUT flag it as
+                # installed since some package likely depends on it.
+                if pkg_id != self.pkg_id:
+                    not_local = _handle_external_and_upstream(pkg, False)
+                    if not_local:
+                        self._update_installed(task)
+                        _print_installed_pkg(pkg.prefix)
+                        continue
+
+                # Flag a failed spec.  Do not need an (install) prefix lock
+                # since assume using a separate (failed) prefix lock file.
+                if pkg_id in self.failed or \
+                        spack.store.db.prefix_failed(spec):
+                    tty.warn('{0} failed to install'.format(pkg_id))
+                    self._update_failed(task)
+
+                    if fail_fast:
+                        raise InstallError(_fail_fast_err)
 
-            # Determine state of installation artifacts and adjust accordingly.
-            self._prepare_for_install(task, keep_prefix, keep_stage,
-                                      restage)
-
-            # Flag an already installed package
-            if pkg_id in self.installed:
-                # Downgrade to a read lock to preclude other processes from
-                # uninstalling the package until we're done installing its
-                # dependents.
-                ltype, lock = self._ensure_locked('read', pkg)
-                if lock is not None:
-                    self._update_installed(task)
-                    _print_installed_pkg(pkg.prefix)
-
-                    # It's an already installed compiler, add it to the config
-                    if task.compiler:
-                        spack.compilers.add_compilers_to_config(
-                            spack.compilers.find_compilers([pkg.spec.prefix]))
+                    continue
 
-                else:
-                    # At this point we've failed to get a write or a read
-                    # lock, which means another process has taken a write
-                    # lock between our releasing the write and acquiring the
-                    # read.
-                    #
-                    # Requeue the task so we can re-check the status
-                    # established by the other process -- failed, installed,
-                    # or uninstalled -- on the next pass.
-                    self.installed.remove(pkg_id)
+                # Install other packages while what this one needs is still
+                # being downloaded in the background.
+                if self._pending_downloads(pkg_id):
+                    keep_prefix = self._defer_task(task, keep_prefix,
+                                                   fail_fast)
+                    continue
+                self.deferred.discard(pkg_id)
+
+                # Attempt to get a write lock.  If we can't get the lock then
+                # another process is likely (un)installing the spec or has
+                # determined the spec has already been installed (though the
+                # other process may be hung).
+                ltype, lock = self._ensure_locked('write', pkg)
+                if lock is None:
+                    # Attempt to get a read lock instead.  If this fails
+                    # then another process has a write lock so must be
+                    # (un)installing the spec (or that process is hung).
+                    ltype, lock = self._ensure_locked('read', pkg)
+
+                # Requeue the spec if we cannot get at least a read lock so
+                # we can check the status presumably established by another
+                # process -- failed, installed, or uninstalled -- on the next
+                # pass.
+                if lock is None:
                     self._requeue_task(task)
-                continue
-
-            # Having a read lock on an uninstalled pkg may mean another
-            # process completed an uninstall of the software between the
-            # time we failed to acquire the write lock and the time we
-            # took the read lock.
-            #
-            # Requeue the task so we can check the status presumably
-            # established by the other process -- failed, installed, or
-            # uninstalled -- on the next pass.
-            if ltype == 'read':
-                self._requeue_task(task)
-                continue
-
-            # Proceed with the installation since we have an exclusive write
-            # lock on the package.
-            try:
-                self._install_task(task, **kwargs)
-                self._update_installed(task)
-
-                # If we installed then we should keep the prefix
-                stop_before_phase = getattr(pkg, 'stop_before_phase', None)
-                last_phase = getattr(pkg, 'last_phase', None)
-                keep_prefix = keep_prefix or \
-                    (stop_before_phase is None and last_phase is None)
-
-            except spack.directory_layout.InstallDirectoryAlreadyExistsError:
-                tty.debug("Keeping existing install prefix in place.")
-                self._update_installed(task)
-                raise
-
-            except KeyboardInterrupt as exc:
-                # The build has been terminated with a Ctrl-C so terminate.
-                err = 'Failed to install {0} due to {1}: {2}'
-                tty.error(err.format(pkg.name, exc.__class__.__name__,
-                          str(exc)))
-                raise
-
-            except (Exception, SystemExit) as exc:
-                # Best effort installs suppress the exception and mark the
-                # package as a failure UNLESS this is the explicit package.
-                err = 'Failed to install {0} due to {1}: {2}'
-                tty.error(err.format(pkg.name, exc.__class__.__name__,
-                          str(exc)))
-
-                self._update_failed(task, True, exc)
-
-                if fail_fast:
-                    # The user requested the installation to terminate on
-                    # failure.
-                    raise InstallError('{0}: {1}'
-                                       .format(fail_fast_err, str(exc)))
+                    continue
 
-                if pkg_id == self.pkg_id:
-                    raise
+                # Determine state of installation artifacts and adjust
+                # accordingly.
+                self._prepare_for_install(task, keep_prefix, keep_stage,
+                                          restage)
+
+                # Flag an already installed package
+                if pkg_id in self.installed:
+                    # Downgrade to a read lock to preclude other processes
+                    # from uninstalling the package until we're done
+                    # installing its dependents.
+                    ltype, lock = self._ensure_locked('read', pkg)
+                    if lock is not None:
+                        self._update_installed(task)
+                        _print_installed_pkg(pkg.prefix)
+
+                        # It's an already installed compiler, add it to the
+                        # config
+                        if task.compiler:
+                            spack.compilers.add_compilers_to_config(
+                                spack.compilers.find_compilers(
+                                    [pkg.spec.prefix]))
 
-            finally:
-                # Remove the install prefix if anything went wrong during
-                # install.
-                if not keep_prefix:
-                    pkg.remove_prefix()
+                    else:
+                        # At this point we've failed to get a write or a read
+                        # lock, which means another process has taken a
+                        # write lock between our releasing the write and
+                        # acquiring the read.
+                        #
+                        # Requeue the task so we can re-check the status
+                        # established by the other process -- failed,
+                        # installed, or uninstalled -- on the next pass.
+                        self.installed.remove(pkg_id)
+                        self._requeue_task(task)
+                    continue
 
-                # The subprocess *may* have removed the build stage. Mark it
-                # not created so that the next time pkg.stage is invoked, we
-                # check the filesystem for it.
-                pkg.stage.created = False
+                # Having a read lock on an uninstalled pkg may mean another
+                # process completed an uninstall of the software between the
+                # time we failed to acquire the write lock and the time we
+                # took the read lock.
+                #
+                # Requeue the task so we can check the status presumably
+                # established by the other process -- failed, installed, or
+                # uninstalled -- on the next pass.
+                if ltype == 'read':
+                    self._requeue_task(task)
+                    continue
 
-            # Perform basic task cleanup for the installed spec to
-            # include downgrading the write to a read lock
-            self._cleanup_task(pkg)
+                # Proceed with the installation since we have an exclusive
+                # write lock on the package.  Concurrent builds are left
+                # running and completed later on.
+                if self.concurrent_packages > 1:
+                    install = functools.partial(
+                        self._start_install_task, task, **kwargs)
+                else:
+                    install = functools.partial(
+                        self._install_task, task, **kwargs)
+                keep_prefix = self._run_install_task(
+                    task, install, keep_prefix, fail_fast)
+                self._release_job()
+        except BaseException:
+            self._terminate_builds()
+            raise
+        finally:
+            self._close_downloaders()
+            self._close_jobserver()
 
         # Cleanup, which includes releasing all of the read locks
         self._cleanup_all_tasks()
@@ -1740,6 +2418,89 @@ def spec(self):
         return self.pkg.spec
 
 
+class BackgroundDownloader(object):
+    """Downloads what packages need, binary cache tarballs or sources, one
+    package after the other in a child process."""
+
+    def __init__(self, download, specs, *args):
+        """
+        Start downloading what packages need.
+
+        Args:
+            download (callable): function downloading in the child process,
+                called with the connection to send the result for each
+                package through, in order, the YAML representations of the
+                specs, and ``args``
+            specs (list): tuples of the unique ids and the concrete specs of
+                the packages, in the order their downloads are needed
+        """
+        self.pkg_ids = [pkg_id for pkg_id, _ in specs]
+        self.results = {}
+        self.received = 0
+
+        # The child process sends the result for each package through its
+        # own pipe, so that terminating it cannot leave a lock shared with
+        # other processes acquired, unlike the queues of multiprocessing.Pool.
+        self.connection, child_connection = multiprocessing.Pipe(False)
+        self.process = multiprocessing.Process(
+            target=download,
+            args=(child_connection, [spec.to_yaml() for _, spec in specs]) +
+            args)
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+
+    def fileno(self):
+        """Readable when the child process sends a result, or dies."""
+        return self.connection.fileno()
+
+    def _receive(self):
+        """Wait for the next result from the child process."""
+        try:
+            result = self.connection.recv()
+        except EOFError:
+            # The child process died, and will not send anything else
+            self.received = len(self.pkg_ids)
+            return
+        self.results[self.pkg_ids[self.received]] = result
+        self.received += 1
+
+    def ready(self, pkg_id):
+        """
+        Whether the result for a package can be had without waiting.
+
+        Args:
+            pkg_id (str): the package's unique id
+        """
+        while pkg_id not in self.results and \
+                self.received < len(self.pkg_ids) and self.connection.poll():
+            self._receive()
+        return pkg_id in self.results or self.received == len(self.pkg_ids)
+
+    def result(self, pkg_id):
+        """
+        Wait for what a package needs to be downloaded.
+
+        Args:
+            pkg_id (str): the package's unique id
+
+        Return:
+            the result the child process sent for the package, or ``None``
+            if it died before
+        """
+        while pkg_id not in self.results and \
+                self.received < len(self.pkg_ids):
+            self._receive()
+        return self.results.pop(pkg_id, None)
+
+    def terminate(self):
+        """Stop downloading, if not done yet."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
 class InstallError(spack.error.SpackError):
     """Raised when something goes wrong during install or uninstall."""
 
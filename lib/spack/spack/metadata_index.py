@@ -0,0 +1,223 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Index of what the packages of a repository declare in their directives.
+
+Read-only commands like ``spack list``, ``spack dependents`` or ``spack
+maintainers`` look packages up in this index instead of importing every
+``package.py`` file, which takes a long time in large repositories.
+
+The metadata of a package is extracted from its class whenever its package
+file changes, and the index is stored next to the other indexes of the
+repository (see ``spack.repo.RepoIndex``).  It looks like this in a file
+(this is YAML, but we write JSON)::
+
+    metadata:
+        version: 1
+        packages:
+            package1:
+                <package metadata>
+            package2:
+                <package metadata>
+            ... etc. ...
+
+"""
+import re
+import textwrap
+
+try:
+    from collections.abc import Mapping  # novm
+except ImportError:
+    from collections import Mapping
+
+from six import StringIO
+
+import spack.repo
+import spack.util.spack_json as sjson
+from spack.version import Version
+
+#: Version of the index format, to be increased whenever the metadata
+#: extracted from packages changes, so that indexes are regenerated.
+format_version = 1
+
+
+def _variant_default(default):
+    # Multi-valued variants have tuples of values as defaults
+    if isinstance(default, (tuple, list)):
+        return list(default)
+    return default
+
+
+class PackageMetadata(object):
+    """Metadata of a package, with the same attributes as its class.
+
+    The specs of directives, like their ``when`` conditions, are stored as
+    strings.
+    """
+
+    def __init__(self, name, namespace, data):
+        #: Name of the package
+        self.name = name
+        #: Namespace of the repository of the package
+        self.namespace = namespace
+
+        #: Docstring of the package class
+        self.description = data.get('description')
+        #: Home page of the package
+        self.homepage = data.get('homepage')
+        #: GitHub users maintaining the package
+        self.maintainers = data.get('maintainers', [])
+        #: Tags of the package
+        self.tags = data.get('tags', [])
+        #: Known versions of the package, from the oldest to the newest
+        self.versions = [Version(v) for v in data.get('versions', [])]
+        #: Maps the names of variants to their default and description
+        self.variants = data.get('variants', {})
+        #: Maps dependency names to conditions and their dependency types
+        self.dependencies = data.get('dependencies', {})
+        #: Maps the virtual specs provided to the conditions to provide them
+        self.provided = data.get('provided', {})
+        #: Maps conflicting specs to the conditions and messages of conflicts
+        self.conflicts = data.get('conflicts', {})
+        #: Maps conditions to the URLs or paths of the patches they apply
+        self.patches = data.get('patches', {})
+        #: Maps the names of the packages extended to their specs
+        self.extendees = data.get('extendees', {})
+
+    @property
+    def fullname(self):
+        """Name of the package, including its namespace."""
+        return '%s.%s' % (self.namespace, self.name)
+
+    @staticmethod
+    def data_from_package_class(pkg_cls):
+        """Extract the metadata of a package class, in the form stored in
+        the index."""
+        variants = dict(
+            (name, {'default': _variant_default(variant.default),
+                    'description': variant.description})
+            for name, variant in pkg_cls.variants.items())
+
+        dependencies = dict(
+            (name, dict((str(when), sorted(dep.type))
+                        for when, dep in conditions.items()))
+            for name, conditions in pkg_cls.dependencies.items())
+
+        provided = dict(
+            (str(vspec), sorted(str(when) for when in whens))
+            for vspec, whens in pkg_cls.provided.items())
+
+        conflicts = dict(
+            (spec, [[str(when), msg] for when, msg in conditions])
+            for spec, conditions in pkg_cls.conflicts.items())
+
+        patches = dict(
+            (str(when), [getattr(p, 'url', None) or p.relative_path
+                         for p in patch_list])
+            for when, patch_list in pkg_cls.patches.items())
+
+        extendees = dict(
+            (name, str(spec))
+            for name, (spec, _) in pkg_cls.extendees.items())
+
+        return {
+            'description': pkg_cls.__doc__,
+            'homepage': getattr(pkg_cls, 'homepage', None),
+            'maintainers': list(pkg_cls.maintainers),
+            'tags': list(getattr(pkg_cls, 'tags', [])),
+            'versions': [str(v) for v in sorted(pkg_cls.versions)],
+            'variants': variants,
+            'dependencies': dependencies,
+            'provided': provided,
+            'conflicts': conflicts,
+            'patches': patches,
+            'extendees': extendees,
+        }
+
+    def dependencies_of_type(self, *deptypes):
+        """Get dependencies that can possibly have these deptypes.
+
+        See ``PackageBase.dependencies_of_type()``.
+        """
+        return dict(
+            (name, conds) for name, conds in self.dependencies.items()
+            if any(dt in types for types in conds.values()
+                   for dt in deptypes))
+
+    def format_doc(self, **kwargs):
+        """Wrap the description at 72 characters and format nicely"""
+        indent = kwargs.get('indent', 0)
+
+        if not self.description:
+            return ""
+
+        doc = re.sub(r'\s+', ' ', self.description)
+        lines = textwrap.wrap(doc, 72)
+        results = StringIO()
+        for line in lines:
+            results.write((" " * indent) + line + "\n")
+        return results.getvalue()
+
+
+class MetadataIndex(Mapping):
+    """Maps the names of the packages in a repository to their metadata."""
+
+    def __init__(self, namespace, packages=None):
+        self.namespace = namespace
+        self._packages = packages if packages is not None else {}
+        self._metadata = {}
+
+    def to_json(self, stream):
+        sjson.dump({'metadata': {'version': format_version,
+                                 'packages': self._packages}}, stream)
+
+    @staticmethod
+    def from_json(stream, namespace):
+        """Read an index from a stream.
+
+        Return:
+            (MetadataIndex) the index, or None if it was written in another
+            format and needs to be regenerated
+        """
+        d = sjson.load(stream).get('metadata', {})
+        if d.get('version') != format_version:
+            return None
+        return MetadataIndex(namespace, d['packages'])
+
+    def __getitem__(self, pkg_name):
+        if pkg_name not in self._metadata:
+            self._metadata[pkg_name] = PackageMetadata(
+                pkg_name, self.namespace, self._packages[pkg_name])
+        return self._metadata[pkg_name]
+
+    def __iter__(self):
+        return iter(self._packages)
+
+    def __len__(self):
+        return len(self._packages)
+
+    def update_package(self, pkg_fullname):
+        """Extract the metadata of a package again from its class.
+
+        Args:
+            pkg_fullname (str): name of the package, with its namespace
+        """
+        pkg_cls = spack.repo.path.get_pkg_class(pkg_fullname)
+        pkg_name = pkg_fullname.rpartition('.')[2]
+        self._packages[pkg_name] = \
+            PackageMetadata.data_from_package_class(pkg_cls)
+        self._metadata.pop(pkg_name, None)
+
+    def remove_package(self, pkg_fullname):
+        """Remove the metadata of a package from the index."""
+        pkg_name = pkg_fullname.rpartition('.')[2]
+        self._packages.pop(pkg_name, None)
+        self._metadata.pop(pkg_name, None)
+
+    def merge(self, other):
+        """Merge another index, of the same repository, into this one."""
+        for pkg_name in other:
+            self._packages[pkg_name] = other._packages[pkg_name]
+            self._metadata.pop(pkg_name, None)
@@ -11,13 +11,17 @@
 where spack is run is not connected to the internet, it allows spack
 to download packages directly from a mirror (e.g., on an intranet).
 """
+import collections
+import multiprocessing
 import sys
 import os
+import threading
 import traceback
 import os.path
 import operator
 
 import six
+from six.moves.urllib.parse import urlparse
 
 import ruamel.yaml.error as yaml_error
 
@@ -35,6 +39,7 @@
 import spack.error
 import spack.url as url
 import spack.fetch_strategy as fs
+import spack.util.parallel
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 import spack.util.url as url_util
@@ -401,7 +406,8 @@ def get_matching_versions(specs, num_versions=1):
     return matching
 
 
-def create(path, specs, skip_unstable_versions=False):
+def create(path, specs, skip_unstable_versions=False, jobs=1,
+           jobs_per_host=4):
     """Create a directory to be used as a spack mirror, and fill it with
     package archives.
 
@@ -412,6 +418,10 @@ def create(path, specs, skip_unstable_versions=False):
         skip_unstable_versions: if true, this skips adding resources when
             they do not have a stable archive checksum (as determined by
             ``fetch_strategy.stable_target``)
+        jobs (int): number of archives, resources and patches fetched at
+            the same time, each in its own process
+        jobs_per_host (int): maximum number of them fetched from the same
+            host at the same time
 
     Return Value:
         Returns a tuple of lists: (present, mirrored, error)
@@ -447,83 +457,233 @@ def create(path, specs, skip_unstable_versions=False):
         mirror_root, skip_unstable_versions=skip_unstable_versions)
     mirror_stats = MirrorStats()
 
-    # Iterate through packages and download all safe tarballs for each
+    # Fetch the archives, resources and patches of all specs together
+    downloads = []
     for spec in specs:
-        mirror_stats.next_spec(spec)
-        _add_single_spec(spec, mirror_cache, mirror_stats)
+        downloads.extend(_downloads_of_spec(spec, mirror_stats))
+    _run_downloads(_merge_downloads(downloads), mirror_cache, mirror_stats,
+                   jobs, jobs_per_host)
 
     return mirror_stats.stats()
 
 
 class MirrorStats(object):
+    """Counts the resources of each spec added to a mirror, or already in it.
+
+    Resources can be counted for the current spec, as set by ``next_spec()``,
+    or for any spec, from any thread.
+    """
     def __init__(self):
         self.present = {}
         self.new = {}
         self.errors = set()
 
         self.current_spec = None
-        self.added_resources = set()
-        self.existing_resources = set()
+        self._added = collections.defaultdict(set)
+        self._existing = collections.defaultdict(set)
+        self._lock = threading.Lock()
 
     def next_spec(self, spec):
-        self._tally_current_spec()
         self.current_spec = spec
 
-    def _tally_current_spec(self):
-        if self.current_spec:
-            if self.added_resources:
-                self.new[self.current_spec] = len(self.added_resources)
-            if self.existing_resources:
-                self.present[self.current_spec] = len(self.existing_resources)
-            self.added_resources = set()
-            self.existing_resources = set()
-        self.current_spec = None
-
     def stats(self):
-        self._tally_current_spec()
+        with self._lock:
+            for spec, resources in self._added.items():
+                self.new[spec] = len(resources)
+            for spec, resources in self._existing.items():
+                if resources:
+                    self.present[spec] = len(resources)
         return list(self.present), list(self.new), list(self.errors)
 
-    def already_existed(self, resource):
-        # If an error occurred after caching a subset of a spec's
-        # resources, a secondary attempt may consider them already added
-        if resource not in self.added_resources:
-            self.existing_resources.add(resource)
+    def already_existed(self, resource, spec=None):
+        spec = spec or self.current_spec
+        with self._lock:
+            # If an error occurred after caching a subset of a spec's
+            # resources, a secondary attempt may consider them already added
+            if resource not in self._added.get(spec, ()):
+                self._existing[spec].add(resource)
 
-    def added(self, resource):
-        self.added_resources.add(resource)
+    def added(self, resource, spec=None):
+        spec = spec or self.current_spec
+        with self._lock:
+            self._added[spec].add(resource)
+            self._existing[spec].discard(resource)
+
+    def error(self, spec=None):
+        with self._lock:
+            self.errors.add(spec or self.current_spec)
+
+
+class _MirrorDownload(object):
+    """An archive, resource or patch to add to a mirror, with the specs that
+    need it."""
 
-    def error(self):
-        self.errors.add(self.current_spec)
+    def __init__(self, stage, spec):
+        self.stage = stage
+        self.specs = [spec]
 
+    @property
+    def key(self):
+        """Where the download is stored in the mirror."""
+        mirror_paths = getattr(self.stage, 'mirror_paths', None)
+        return mirror_paths.storage_path if mirror_paths else id(self)
+
+    @property
+    def host(self):
+        """Host the download is fetched from, if any."""
+        url = getattr(self.stage.default_fetcher, 'url', None)
+        return (urlparse(url).netloc or None) if url else None
 
-def _add_single_spec(spec, mirror, mirror_stats):
+
+def _downloads_of_spec(spec, mirror_stats):
     tty.msg("Adding package {pkg} to mirror".format(
         pkg=spec.format("{name}{@version}")
     ))
-    num_retries = 3
-    while num_retries > 0:
+    try:
+        downloads = [_MirrorDownload(stage, spec)
+                     for stage in spec.package.stage]
+        for patch in spec.package.all_patches():
+            if patch.stage:
+                downloads.append(_MirrorDownload(patch.stage, spec))
+    except Exception as e:
+        _warn_fetch_error(spec, e, sys.exc_info())
+        mirror_stats.error(spec)
+        return []
+    return downloads
+
+
+def _merge_downloads(downloads):
+    """Merges the downloads stored at the same place in the mirror, e.g. the
+    patches used by many packages, so that they are fetched once."""
+    merged = collections.OrderedDict()
+    for download in downloads:
+        if download.key in merged:
+            merged[download.key].specs.extend(download.specs)
+        else:
+            merged[download.key] = download
+    return list(merged.values())
+
+
+def _warn_fetch_error(spec, exception, exc_tuple):
+    if spack.config.get('config:debug'):
+        traceback.print_exception(file=sys.stderr, *exc_tuple)
+    else:
+        tty.warn(
+            "Error while fetching %s" % spec.cformat('{name}{@version}'),
+            getattr(exception, 'message', exception))
+
+
+class _DownloadStats(object):
+    """Records what happened to a single download."""
+
+    def __init__(self):
+        self.outcome = None
+
+    def already_existed(self, resource):
+        if self.outcome is None:
+            self.outcome = 'present'
+
+    def added(self, resource):
+        self.outcome = 'added'
+
+
+#: Downloads being run by ``_run_downloads()``, which worker processes
+#: inherit, since ``spack.util.parallel.pool()`` forks them
+_downloads = []
+
+#: Seconds between checks for finished downloads
+_download_poll_interval = 0.5
+
+
+def _cache_download(index, mirror, num_retries=3):
+    """Adds a download to the mirror.
+
+    Return:
+        (tuple) 'added' if the download was fetched, 'present' if it was
+        already in the mirror, or None if it was skipped, and the message
+        and traceback of the error that prevented adding it, if any
+    """
+    download = _downloads[index]
+    stats = _DownloadStats()
+    for _ in range(num_retries):
         try:
-            with spec.package.stage as pkg_stage:
-                pkg_stage.cache_mirror(mirror, mirror_stats)
-                for patch in spec.package.all_patches():
-                    if patch.stage:
-                        patch.stage.cache_mirror(mirror, mirror_stats)
-                    patch.clean()
-            exception = None
-            break
+            with download.stage as stage:
+                stage.cache_mirror(mirror, stats)
+            return stats.outcome, None
         except Exception as e:
-            exc_tuple = sys.exc_info()
-            exception = e
-        num_retries -= 1
-
-    if exception:
-        if spack.config.get('config:debug'):
-            traceback.print_exception(file=sys.stderr, *exc_tuple)
-        else:
-            tty.warn(
-                "Error while fetching %s" % spec.cformat('{name}{@version}'),
-                getattr(exception, 'message', exception))
-        mirror_stats.error()
+            error = (getattr(e, 'message', str(e)), traceback.format_exc())
+    return None, error
+
+
+def _run_downloads(downloads, mirror, mirror_stats, jobs, jobs_per_host):
+    """Runs downloads, at most ``jobs`` at a time, and at most
+    ``jobs_per_host`` of them from the same host."""
+    global _downloads
+    _downloads = downloads
+    jobs_per_host = max(jobs_per_host, 1)
+
+    def record(index, result):
+        download, (outcome, error) = downloads[index], result
+        resource = os.path.join(mirror.root, str(download.key))
+        for i, spec in enumerate(download.specs):
+            if error:
+                message, error_traceback = error
+                if spack.config.get('config:debug'):
+                    sys.stderr.write(error_traceback)
+                else:
+                    _warn_fetch_error(spec, message, None)
+                mirror_stats.error(spec)
+            elif outcome == 'added' and i == 0:
+                mirror_stats.added(resource, spec)
+            elif outcome:
+                mirror_stats.already_existed(resource, spec)
+
+    try:
+        if (jobs <= 1 or len(downloads) <= 1 or
+                multiprocessing.current_process().daemon):
+            for index in range(len(downloads)):
+                record(index, _cache_download(index, mirror))
+            return
+
+        pool = spack.util.parallel.pool(min(jobs, len(downloads)))
+        try:
+            pending = list(range(len(downloads)))
+            running, hosts = {}, collections.Counter()
+            while pending or running:
+                # Start the downloads from hosts not too busy already
+                waiting = []
+                for index in pending:
+                    host = downloads[index].host
+                    if (len(running) < jobs and
+                            (host is None or hosts[host] < jobs_per_host)):
+                        hosts[host] += 1
+                        running[index] = pool.apply_async(
+                            _cache_download, (index, mirror))
+                    else:
+                        waiting.append(index)
+                pending = waiting
+
+                # Wait with a timeout, so that the wait can be interrupted
+                done = []
+                while not done:
+                    next(iter(running.values())).wait(_download_poll_interval)
+                    done = [i for i, r in running.items() if r.ready()]
+
+                for index in done:
+                    try:
+                        result = running.pop(index).get()
+                    except Exception as e:
+                        result = None, (str(e), traceback.format_exc())
+                    hosts[downloads[index].host] -= 1
+                    record(index, result)
+                tty.debug('{0} of {1} downloads done'.format(
+                    len(downloads) - len(pending) - len(running),
+                    len(downloads)))
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        _downloads = []
 
 
 class MirrorError(spack.error.SpackError):
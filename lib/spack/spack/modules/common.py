@@ -31,16 +31,23 @@
 import collections
 import copy
 import datetime
+import hashlib
 import inspect
+import json
+import multiprocessing.pool
 import os.path
 import re
 
 import llnl.util.filesystem
+import llnl.util.lang
 import llnl.util.tty as tty
 import spack.build_environment as build_environment
+import spack.config
 import spack.error
 import spack.paths
 import spack.schema.environment
+import spack.spec
+import spack.store
 import spack.projections as proj
 import spack.tengine as tengine
 import spack.util.environment
@@ -149,6 +156,24 @@ def dependencies(spec, request='all'):
     return [d for d in deps if not (d in seen or seen_add(d))]
 
 
+@llnl.util.lang.memoized
+def _constraint(string):
+    """Spec parsed from a constraint in the configuration of modules."""
+    return spack.spec.Spec(string)
+
+
+@llnl.util.lang.memoized
+def _template_digest(env, name, source):
+    """Digest of the source of a template and of the templates it uses."""
+    import jinja2.meta
+    sha = hashlib.sha1(source.encode('utf-8'))
+    referenced = jinja2.meta.find_referenced_templates(env.parse(source))
+    for other in sorted(x for x in referenced if x is not None):
+        other_source = env.loader.get_source(env, other)[0]
+        sha.update(_template_digest(env, other, other_source).encode('utf-8'))
+    return sha.hexdigest()
+
+
 def merge_config_rules(configuration, spec):
     """Parses the module specific part of a configuration and returns a
     dictionary containing the actions to be performed on the spec passed as
@@ -163,24 +188,25 @@ def merge_config_rules(configuration, spec):
         dict: actions to be taken on the spec passed as an argument
     """
 
-    # Get the top-level configuration for the module type we are using
-    module_specific_configuration = copy.deepcopy(configuration)
-
     # Construct a dictionary with the actions we need to perform on the spec
-    # passed as a parameter
+    # passed as a parameter. Only the actions applied are copied, as the
+    # configuration is shared by all the specs.
 
     # The keyword 'all' is always evaluated first, all the others are
     # evaluated in order of appearance in the module file
-    spec_configuration = module_specific_configuration.pop('all', {})
-    for constraint, action in module_specific_configuration.items():
+    spec_configuration = copy.deepcopy(configuration.get('all', {}))
+    for constraint, action in configuration.items():
+        if constraint == 'all':
+            continue
         override = False
         if constraint.endswith(':'):
             constraint = constraint.strip(':')
             override = True
-        if spec.satisfies(constraint, strict=True):
+        if spec.satisfies(_constraint(constraint), strict=True):
             if override:
                 spec_configuration = {}
-            update_dictionary_extending_lists(spec_configuration, action)
+            update_dictionary_extending_lists(
+                spec_configuration, copy.deepcopy(action))
 
     # Transform keywords for dependencies or prerequisites into a list of spec
 
@@ -197,10 +223,10 @@ def merge_config_rules(configuration, spec):
     # configuration
 
     # Hash length in module files
-    hash_length = module_specific_configuration.get('hash_length', 7)
+    hash_length = configuration.get('hash_length', 7)
     spec_configuration['hash_length'] = hash_length
 
-    verbose = module_specific_configuration.get('verbose', False)
+    verbose = configuration.get('verbose', False)
     spec_configuration['verbose'] = verbose
 
     return spec_configuration
@@ -221,7 +247,21 @@ def root_path(name):
     return spack.util.path.canonicalize_path(path)
 
 
-def generate_module_index(root, modules, overwrite=False):
+def generate_module_index(root, modules, overwrite=False,
+                          content_hashes=None, removed=None):
+    """Write the index of the module files in root.
+
+    Module files with a content hash are also indexed with the fingerprint
+    of their configuration and template, for incremental refreshes.
+
+    Args:
+        root (str): root of the module files of one type
+        modules (list): writers of the module files to index
+        overwrite (bool): if False, update the existing index
+        content_hashes (dict): content hashes of the module files written,
+            by DAG hash, as returned by ``write_module_files()``
+        removed (list): DAG hashes of the specs to remove from the index
+    """
     index_path = os.path.join(root, 'module-index.yaml')
     if overwrite or not os.path.exists(index_path):
         entries = syaml.syaml_dict()
@@ -230,18 +270,147 @@ def generate_module_index(root, modules, overwrite=False):
             yaml_content = syaml.load(index_file)
             entries = yaml_content['module_index']
 
+    for dag_hash in removed or []:
+        entries.pop(dag_hash, None)
+
+    content_hashes = content_hashes or {}
     for m in modules:
         entry = {
             'path': m.layout.filename,
             'use_name': m.layout.use_name
         }
-        entries[m.spec.dag_hash()] = entry
+        dag_hash = m.spec.dag_hash()
+        if dag_hash in content_hashes:
+            entry['content_hash'] = content_hashes[dag_hash]
+            entry['fingerprint'] = m.fingerprint
+        entries[dag_hash] = entry
     index = {'module_index': entries}
     llnl.util.filesystem.mkdirp(root)
     with open(index_path, 'w') as index_file:
         syaml.dump(index, default_flow_style=False, stream=index_file)
 
 
+def _local_module_index(root):
+    """Entries of the index of the module files in root, by DAG hash."""
+    index_path = os.path.join(root, 'module-index.yaml')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as index_file:
+        return syaml.load(index_file)['module_index']
+
+
+def outdated_module_files(root, writers):
+    """Selects the module files that an incremental refresh must update.
+
+    Module files are outdated if they are not in the index in root, if they
+    were moved, or if the fingerprint of their configuration and template
+    changed. Outdated module files are rendered again, but a changed
+    fingerprint does not force them to be rewritten: ``write_module_files()``
+    still skips those whose content did not change. Module files in the
+    index are obsolete if their spec is not installed anymore.
+
+    Args:
+        root (str): root of the module files, as ``layout.dirname()``
+        writers (list): writers of the module files, of the same type
+
+    Return:
+        (tuple) the writers of the outdated module files, and the entries
+        of the index of the obsolete module files, by DAG hash
+    """
+    index = _local_module_index(root)
+
+    outdated = []
+    for writer in writers:
+        entry = index.get(writer.spec.dag_hash(), {})
+        if (entry.get('path') != writer.layout.filename or
+                entry.get('fingerprint') != writer.fingerprint or
+                not os.path.exists(writer.layout.filename)):
+            outdated.append(writer)
+
+    installed = set(s.dag_hash() for s in spack.store.db.query())
+    obsolete = dict(
+        (dag_hash, entry) for dag_hash, entry in index.items()
+        if dag_hash not in installed)
+    return outdated, obsolete
+
+
+def _write_module_file(filename, text, spec):
+    try:
+        module_dir = os.path.dirname(filename)
+        if not os.path.exists(module_dir):
+            llnl.util.filesystem.mkdirp(module_dir)
+        with open(filename, 'w') as f:
+            f.write(text)
+        fp.set_permissions_by_spec(filename, spec)
+    except Exception as e:
+        return e
+
+
+def write_module_files(root, writers, overwrite=False, threads=16):
+    """Write the module files of many specs, skipping those unchanged.
+
+    Module files are rendered one after the other, and written by a bounded
+    pool of threads. Module files whose content is the same as when they
+    were last written, according to the index in root, are not written
+    again, unless ``overwrite`` is true. Errors are reported as warnings.
+
+    Args:
+        root (str): root of the module files, as ``layout.dirname()``
+        writers (list): writers of the module files, of the same type
+        overwrite (bool): write module files even if they are unchanged
+        threads (int): maximum number of files written at the same time
+
+    Return:
+        (dict) content hashes of the module files written or unchanged,
+        by DAG hash, to be passed to ``generate_module_index()``
+    """
+    index = {} if overwrite else _local_module_index(root)
+
+    content_hashes, jobs = {}, []
+    for writer in writers:
+        try:
+            text, content_hash = writer.render()
+        except Exception as e:
+            tty.debug(e)
+            msg = 'Could not write module file [{0}]'
+            tty.warn(msg.format(writer.layout.filename))
+            tty.warn('\t--> {0} <--'.format(str(e)))
+            continue
+
+        dag_hash = writer.spec.dag_hash()
+        content_hashes[dag_hash] = content_hash
+        entry = index.get(dag_hash, {})
+        if (entry.get('content_hash') == content_hash and
+                entry.get('path') == writer.layout.filename and
+                os.path.exists(writer.layout.filename)):
+            tty.debug('\tUNCHANGED: {0} [{1}]'.format(
+                writer.spec.cshort_spec, writer.layout.filename))
+            continue
+
+        tty.debug('\tWRITE: {0} [{1}]'.format(
+            writer.spec.cshort_spec, writer.layout.filename))
+        jobs.append((writer, text))
+
+    pool = multiprocessing.pool.ThreadPool(max(min(threads, len(jobs)), 1))
+    try:
+        errors = pool.map(
+            lambda job: _write_module_file(
+                job[0].layout.filename, job[1], job[0].spec), jobs)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for (writer, _), error in zip(jobs, errors):
+        if error is not None:
+            del content_hashes[writer.spec.dag_hash()]
+            tty.debug(error)
+            msg = 'Could not write module file [{0}]'
+            tty.warn(msg.format(writer.layout.filename))
+            tty.warn('\t--> {0} <--'.format(str(error)))
+
+    return content_hashes
+
+
 def _generate_upstream_module_index():
     module_indices = read_module_indices()
 
@@ -466,11 +635,13 @@ def blacklisted(self):
 
         # Compute the list of whitelist rules that match
         wlrules = conf.get('whitelist', [])
-        whitelist_matches = [x for x in wlrules if spec.satisfies(x)]
+        whitelist_matches = [x for x in wlrules
+                             if spec.satisfies(_constraint(x))]
 
         # Compute the list of blacklist rules that match
         blrules = conf.get('blacklist', [])
-        blacklist_matches = [x for x in blrules if spec.satisfies(x)]
+        blacklist_matches = [x for x in blrules
+                             if spec.satisfies(_constraint(x))]
 
         # Should I blacklist the module because it's implicit?
         blacklist_implicits = conf.get('blacklist_implicits')
@@ -767,39 +938,36 @@ def _get_template(self):
         # ... and return the first match
         return choices.pop(0)
 
-    def write(self, overwrite=False):
-        """Writes the module file.
-
-        Args:
-            overwrite (bool): if True it is fine to overwrite an already
-                existing file. If False the operation is skipped an we print
-                a warning to the user.
+    @property
+    def fingerprint(self):
+        """Fingerprint of what the module file depends on besides its spec,
+        i.e. the configuration of module files and the template rendered.
         """
-        # Return immediately if the module is blacklisted
-        if self.conf.blacklisted:
-            msg = '\tNOT WRITING: {0} [BLACKLISTED]'
-            tty.debug(msg.format(self.spec.cshort_spec))
-            return
-
-        # Print a warning in case I am accidentally overwriting
-        # a module file that is already there (name clash)
-        if not overwrite and os.path.exists(self.layout.filename):
-            message = 'Module file already exists : skipping creation\n'
-            message += 'file : {0.filename}\n'
-            message += 'spec : {0.spec}'
-            tty.warn(message.format(self.layout))
-            return
+        import jinja2
+        template_name = self._get_template()
+        env = tengine.make_environment()
+        try:
+            source = env.loader.get_source(env, template_name)[0]
+            template_digest = _template_digest(env, template_name, source)
+        except jinja2.TemplateNotFound:
+            template_digest = None
 
-        # If we are here it means it's ok to write the module file
-        msg = '\tWRITE: {0} [{1}]'
-        tty.debug(msg.format(self.spec.cshort_spec, self.layout.filename))
+        configuration = {
+            'modules': self.module.configuration(),
+            'prefix_inspections': spack.config.get(
+                'modules:prefix_inspections', {}),
+            'template': [template_name, template_digest]
+        }
+        text = json.dumps(configuration, sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
 
-        # If the directory where the module should reside does not exist
-        # create it
-        module_dir = os.path.dirname(self.layout.filename)
-        if not os.path.exists(module_dir):
-            llnl.util.filesystem.mkdirp(module_dir)
+    def render(self):
+        """Renders the module file.
 
+        Return:
+            (tuple) the text of the module file, and a hash of its content
+            that does not depend on the time it is rendered
+        """
         # Get the template for the module
         template_name = self._get_template()
         import jinja2
@@ -833,6 +1001,50 @@ def write(self, overwrite=False):
 
         # Render the template
         text = template.render(context)
+
+        # The timestamp is left out of the hash, for unchanged module files
+        # to have the same hash
+        timestamp = context.get('timestamp')
+        content = text.replace(str(timestamp), '') if timestamp else text
+        sha = hashlib.sha1()
+        sha.update(self.layout.filename.encode('utf-8'))
+        sha.update(content.encode('utf-8'))
+        return text, sha.hexdigest()
+
+    def write(self, overwrite=False):
+        """Writes the module file.
+
+        Args:
+            overwrite (bool): if True it is fine to overwrite an already
+                existing file. If False the operation is skipped an we print
+                a warning to the user.
+        """
+        # Return immediately if the module is blacklisted
+        if self.conf.blacklisted:
+            msg = '\tNOT WRITING: {0} [BLACKLISTED]'
+            tty.debug(msg.format(self.spec.cshort_spec))
+            return
+
+        # Print a warning in case I am accidentally overwriting
+        # a module file that is already there (name clash)
+        if not overwrite and os.path.exists(self.layout.filename):
+            message = 'Module file already exists : skipping creation\n'
+            message += 'file : {0.filename}\n'
+            message += 'spec : {0.spec}'
+            tty.warn(message.format(self.layout))
+            return
+
+        # If we are here it means it's ok to write the module file
+        msg = '\tWRITE: {0} [{1}]'
+        tty.debug(msg.format(self.spec.cshort_spec, self.layout.filename))
+
+        # If the directory where the module should reside does not exist
+        # create it
+        module_dir = os.path.dirname(self.layout.filename)
+        if not os.path.exists(module_dir):
+            llnl.util.filesystem.mkdirp(module_dir)
+
+        text, _ = self.render()
         # Write it to file
         with open(self.layout.filename, 'w') as f:
             f.write(text)
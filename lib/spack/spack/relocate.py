@@ -2,6 +2,8 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import collections
+import mmap
 import os
 import platform
 import re
@@ -16,6 +18,7 @@
 import spack.repo
 import spack.spec
 import spack.util.executable as executable
+import spack.util.parallel
 
 
 class InstallRootStringError(spack.error.SpackError):
@@ -449,72 +452,199 @@ def needs_text_relocation(m_type, m_subtype):
     return m_type == 'text'
 
 
-def _replace_prefix_text(filename, old_dir, new_dir):
-    """Replace all the occurrences of the old install prefix with a
-    new install prefix in text files that are utf-8 encoded.
+#: Relocate files in worker processes only if each gets this many of them
+_min_files_per_process = 32
+
+#: Memory-map binaries of at least this size to relocate them, instead of
+#: reading them into memory
+_mmap_min_size = 16 * 1024 * 1024
+
+
+def _trie_pattern(words):
+    """Regular expression matching any of the words, as a trie.
+
+    Unlike a plain alternation, which tries every word in turn wherever a
+    match could start, the trie compares the prefixes the words share only
+    once. The longest word is preferred where several words match.
+
+    Args:
+        words (list): bytes to be matched
+
+    Return:
+        (bytes) the regular expression
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for i in range(len(word)):
+            node = node.setdefault(word[i:i + 1], {})
+        # Marks the end of a word
+        node[b''] = {}
+
+    def pattern(node):
+        ends = b'' in node
+        branches = [re.escape(char) + pattern(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return b''
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        # A greedy optional group makes the longest word win
+        return b'(?:' + b'|'.join(branches) + (b')?' if ends else b')')
+
+    return pattern(trie)
+
+
+def _prefix_regexes(old_prefixes):
+    """Compiled regular expressions matching all the old prefixes at once,
+    in text and binary files.
+
+    Args:
+        old_prefixes (tuple): prefixes to be searched for, as bytes
+    """
+    prefixes = _trie_pattern(old_prefixes)
+    # Match the old prefixes if they appear at the beginning of a path:
+    # negative lookbehind for a character legal in a path, then a match group
+    # for any characters legal in a compiler flag, then an old prefix, then
+    # characters legal in a path. This ensures we only match the prefixes if
+    # they are preceded by a flag or by characters not legal in a path, but
+    # not if they are preceded by other components of a path.
+    text = re.compile(
+        b'(?<![\\w\\-_/])([\\w\\-_]*?)(%s)([\\w\\-_/]*)' % prefixes)
+    binary = re.compile(prefixes)
+    return text, binary
+
+
+class _PrefixRelocation(object):
+    """Replacement of many old prefixes with new ones in a single pass over
+    the content of each file."""
+
+    def __init__(self, prefix_to_prefix):
+        """
+        Args:
+            prefix_to_prefix (OrderedDict): maps the old prefixes to the new
+                ones. Mappings to None, or of a prefix to itself, are
+                ignored.
+        """
+        self.prefixes = collections.OrderedDict()
+        for old, new in prefix_to_prefix.items():
+            if new is None or old == new:
+                continue
+            self.prefixes[old.encode('utf-8')] = new.encode('utf-8')
+
+        # Compiled on first use, and shared by all the files relocated
+        self._compiled = None
+
+        # Prefixes that contain another one are found by searching for it
+        self.filters = []
+        for old in sorted(self.prefixes, key=len):
+            if not any(f in old for f in self.filters):
+                self.filters.append(old)
+
+    def found_in(self, data):
+        """Whether any of the old prefixes is found in the data, which may
+        also be a memory-mapped file."""
+        return any(data.find(f) != -1 for f in self.filters)
+
+    def _regexes(self):
+        if self._compiled is None:
+            self._compiled = _prefix_regexes(tuple(sorted(self.prefixes)))
+        return self._compiled
+
+    def replace_text(self, data):
+        """Replace the old prefixes at the beginning of paths in text."""
+        def replace(match):
+            flag, old, rest = match.groups()
+            return flag + self.prefixes[old] + rest
+
+        text, _ = self._regexes()
+        return text.sub(replace, data)
+
+    def binary_replacements(self, data):
+        """Replacements of the old prefixes in binary data, which may also
+        be a memory-mapped file.
+
+        The new prefixes are padded at the front with ``os.sep``, so the
+        data keeps its size.
+
+        Return:
+            (list) offsets in the data with the old prefix found there and
+            the bytes to write over it
+        """
+        _, binary = self._regexes()
+        replacements = []
+        for match in binary.finditer(data):
+            old = match.group()
+            new = self.prefixes[old]
+            new = os.sep.encode('utf-8') * (len(old) - len(new)) + new
+            replacements.append((match.start(), old, new))
+        return replacements
+
+
+def _replace_prefix_text(filename, relocation):
+    """Replace all the occurrences of old install prefixes with new install
+    prefixes in a text file that is utf-8 encoded.
 
     Args:
         filename (str): target text file (utf-8 encoded)
-        old_dir (str): directory to be searched in the file
-        new_dir (str): substitute for the old directory
+        relocation (_PrefixRelocation): prefixes to be replaced
     """
-    # TODO: cache regexes globally to speedup computation
     with open(filename, 'rb+') as f:
         data = f.read()
+        if not relocation.found_in(data):
+            return
         f.seek(0)
-        # Replace old_dir with new_dir if it appears at the beginning of a path
-        # Negative lookbehind for a character legal in a path
-        # Then a match group for any characters legal in a compiler flag
-        # Then old_dir
-        # Then characters legal in a path
-        # Ensures we only match the old_dir if it's precedeed by a flag or by
-        # characters not legal in a path, but not if it's preceeded by other
-        # components of a path.
-        old_bytes = old_dir.encode('utf-8')
-        pat = b'(?<![\\w\\-_/])([\\w\\-_]*?)%s([\\w\\-_/]*)' % old_bytes
-        repl = b'\\1%s\\2' % new_dir.encode('utf-8')
-        ndata = re.sub(pat, repl, data)
-        f.write(ndata)
+        f.write(relocation.replace_text(data))
         f.truncate()
 
 
-def _replace_prefix_bin(filename, old_dir, new_dir):
-    """Replace all the occurrences of the old install prefix with a
-    new install prefix in binary files.
+def _replace_prefix_bin(filename, relocation):
+    """Replace all the occurrences of old install prefixes with new install
+    prefixes in a binary file.
 
-    The new install prefix is prefixed with ``os.sep`` until the
-    lengths of the prefixes are the same.
+    The new install prefixes are prefixed with ``os.sep`` until the
+    lengths of the prefixes are the same. Only the bytes of the prefixes
+    found are written, and large files are memory-mapped instead of read,
+    so that they do not have to fit in memory.
 
     Args:
         filename (str): target binary file
-        old_dir (str): directory to be searched in the file
-        new_dir (str): substitute for the old directory
-    """
-    def replace(match):
-        occurances = match.group().count(old_dir.encode('utf-8'))
-        olen = len(old_dir.encode('utf-8'))
-        nlen = len(new_dir.encode('utf-8'))
-        padding = (olen - nlen) * occurances
-        if padding < 0:
-            return data
-        return match.group().replace(
-            old_dir.encode('utf-8'),
-            os.sep.encode('utf-8') * padding + new_dir.encode('utf-8')
-        )
-
+        relocation (_PrefixRelocation): prefixes to be replaced, which
+            must not be replaced by longer ones
+    """
     with open(filename, 'rb+') as f:
-        data = f.read()
-        f.seek(0)
-        original_data_len = len(data)
-        pat = re.compile(old_dir.encode('utf-8'))
-        if not pat.search(data):
-            return
-        ndata = pat.sub(replace, data)
-        if not len(ndata) == original_data_len:
-            raise BinaryStringReplacementError(
-                filename, original_data_len, len(ndata))
-        f.write(ndata)
-        f.truncate()
+        size = os.fstat(f.fileno()).st_size
+        # Empty files cannot be mapped
+        if size < max(_mmap_min_size, 1):
+            data = f.read()
+        else:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if not relocation.found_in(data):
+                return
+            replacements = relocation.binary_replacements(data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+        for offset, old, new in replacements:
+            if not len(new) == len(old):
+                raise BinaryStringReplacementError(
+                    filename, size, size + len(new) - len(old))
+        for offset, old, new in replacements:
+            f.seek(offset)
+            f.write(new)
+
+
+def _relocate_files(function, files, relocation):
+    """Relocate the files, in parallel if there are many of them."""
+    if not files or not relocation.prefixes:
+        return
+    processes = spack.util.parallel.num_processes(
+        max_processes=len(files) // _min_files_per_process)
+    spack.util.parallel.parallel_map(
+        function, [(f, relocation) for f in files], processes)
 
 
 def relocate_macho_binaries(path_names, old_layout_root, new_layout_root,
@@ -807,14 +937,16 @@ def relocate_text(
     orig_sbang = '#!/bin/bash {0}/bin/sbang'.format(orig_spack)
     new_sbang = '#!/bin/bash {0}/bin/sbang'.format(new_spack)
 
-    for file in files:
-        _replace_prefix_text(file, orig_install_prefix, new_install_prefix)
-        for orig_dep_prefix, new_dep_prefix in new_prefixes.items():
-            _replace_prefix_text(file, orig_dep_prefix, new_dep_prefix)
-        _replace_prefix_text(file, orig_layout_root, new_layout_root)
-        # relocate the sbang location only if the spack directory changed
-        if orig_spack != new_spack:
-            _replace_prefix_text(file, orig_sbang, new_sbang)
+    prefix_to_prefix = collections.OrderedDict()
+    prefix_to_prefix[orig_install_prefix] = new_install_prefix
+    prefix_to_prefix.update(new_prefixes)
+    prefix_to_prefix.setdefault(orig_layout_root, new_layout_root)
+    # relocate the sbang location only if the spack directory changed
+    if orig_spack != new_spack:
+        prefix_to_prefix.setdefault(orig_sbang, new_sbang)
+
+    _relocate_files(_replace_prefix_text, files,
+                    _PrefixRelocation(prefix_to_prefix))
 
 
 def relocate_text_bin(
@@ -844,11 +976,14 @@ def relocate_text_bin(
     if not new_prefix_is_shorter and len(binaries) > 0:
         raise BinaryTextReplaceError(orig_install_prefix, new_install_prefix)
 
-    for binary in binaries:
-        for old_dep_prefix, new_dep_prefix in new_prefixes.items():
-            if len(new_dep_prefix) <= len(old_dep_prefix):
-                _replace_prefix_bin(binary, old_dep_prefix, new_dep_prefix)
-        _replace_prefix_bin(binary, orig_install_prefix, new_install_prefix)
+    prefix_to_prefix = collections.OrderedDict()
+    prefix_to_prefix[orig_install_prefix] = new_install_prefix
+    for old_dep_prefix, new_dep_prefix in new_prefixes.items():
+        if new_dep_prefix and len(new_dep_prefix) <= len(old_dep_prefix):
+            prefix_to_prefix.setdefault(old_dep_prefix, new_dep_prefix)
+
+    _relocate_files(_replace_prefix_bin, binaries,
+                    _PrefixRelocation(prefix_to_prefix))
 
     # Note: Replacement of spack directory should not be done. This causes
     # an incorrect replacement path in the case where the install root is a
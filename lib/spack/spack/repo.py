@@ -6,8 +6,10 @@
 import abc
 import collections
 import contextlib
+import copy
 import errno
 import functools
+import hashlib
 import inspect
 import itertools
 import os
@@ -33,6 +35,7 @@
 import spack.config
 import spack.caches
 import spack.error
+import spack.metadata_index
 import spack.patch
 import spack.spec
 import spack.util.spack_json as sjson
@@ -40,6 +43,7 @@
 import spack.provider_index
 import spack.util.path
 import spack.util.naming as nm
+import spack.util.parallel
 
 #: Super-namespace for all packages.
 #: Package modules are imported as spack.pkg.<namespace>.<pkg-name>.
@@ -59,6 +63,10 @@ def get_full_namespace(namespace):
 packages_dir_name  = 'packages'    # Top-level repo directory containing pkgs.
 package_file_name  = 'package.py'  # Filename for packages in a repository.
 
+#: Index packages in parallel when at least this many packages per process
+#: need to be indexed
+_min_packages_per_process = 16
+
 #: Guaranteed unused default value for some functions.
 NOT_PROVIDED = object()
 
@@ -234,15 +242,34 @@ def update_package(self, pkg_name):
         package = path.get(pkg_name)
 
         # Remove the package from the list of packages, if present
-        for pkg_list in self._tag_dict.values():
-            if pkg_name in pkg_list:
-                pkg_list.remove(pkg_name)
+        self.remove_package(pkg_name)
 
         # Add it again under the appropriate tags
         for tag in getattr(package, 'tags', []):
             tag = tag.lower()
             self._tag_dict[tag].append(package.name)
 
+    def remove_package(self, pkg_name):
+        """Removes a package from the tag index.
+
+        Args:
+            pkg_name (str): name of the package, with or without namespace
+        """
+        pkg_name = pkg_name.rpartition('.')[2]
+        for pkg_list in self._tag_dict.values():
+            if pkg_name in pkg_list:
+                pkg_list.remove(pkg_name)
+
+    def merge(self, other):
+        """Merge another tag index into this one.
+
+        Args:
+            other (TagIndex): tag index to be merged
+        """
+        for tag, pkg_list in other.items():
+            self._tag_dict[tag].extend(
+                p for p in pkg_list if p not in self._tag_dict[tag])
+
 
 @six.add_metaclass(abc.ABCMeta)
 class Indexer(object):
@@ -279,6 +306,15 @@ def read(self, stream):
     def update(self, pkg_fullname):
         """Update the index in memory with information about a package."""
 
+    @abc.abstractmethod
+    def remove(self, pkg_fullname):
+        """Remove information about a package from the index in memory."""
+
+    @abc.abstractmethod
+    def merge(self, index):
+        """Merge another index, e.g. of a few packages, into the index in
+        memory."""
+
     @abc.abstractmethod
     def write(self, stream):
         """Write the index to a file object."""
@@ -295,6 +331,12 @@ def read(self, stream):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_package(pkg_fullname)
+
+    def merge(self, index):
+        self.index.merge(index)
+
     def write(self, stream):
         self.index.to_json(stream)
 
@@ -311,6 +353,12 @@ def update(self, pkg_fullname):
         self.index.remove_provider(pkg_fullname)
         self.index.update(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_provider(pkg_fullname)
+
+    def merge(self, index):
+        self.index.merge(index)
+
     def write(self, stream):
         self.index.to_json(stream)
 
@@ -336,6 +384,37 @@ def write(self, stream):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_package(pkg_fullname)
+
+    def merge(self, index):
+        self.index.update(index)
+
+
+class MetadataIndexer(Indexer):
+    """Lifecycle methods for the index of package metadata."""
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def _create(self):
+        return spack.metadata_index.MetadataIndex(self.namespace)
+
+    def read(self, stream):
+        self.index = spack.metadata_index.MetadataIndex.from_json(
+            stream, self.namespace)
+
+    def update(self, pkg_fullname):
+        self.index.update_package(pkg_fullname)
+
+    def remove(self, pkg_fullname):
+        self.index.remove_package(pkg_fullname)
+
+    def merge(self, index):
+        self.index.merge(index)
+
+    def write(self, stream):
+        self.index.to_json(stream)
+
 
 class RepoIndex(object):
     """Container class that manages a set of Indexers for a Repo.
@@ -393,44 +472,153 @@ def _build_all_indexes(self):
         invocations.
 
         """
-        for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
+        self.reindex()
 
-    def _build_index(self, name, indexer):
-        """Determine which packages need an update, and update indexes."""
+    def reindex(self, force=False):
+        """Update the indexes that are out of date with the package files.
 
-        # Filename of the provider index cache (we assume they're all json)
-        cache_filename = '{0}/{1}-index.json'.format(name, self.namespace)
+        Packages that changed since an index was written are loaded again,
+        in parallel if there are many of them, and the result is merged
+        into the indexes.
 
-        # Compute which packages needs to be updated in the cache
+        Arguments:
+            force (bool): regenerate all the indexes from scratch
+
+        Return:
+            (int) number of packages that were loaded
+        """
         misc_cache = spack.caches.misc_cache
-        index_mtime = misc_cache.mtime(cache_filename)
 
-        needs_update = [
-            x for x, sinfo in self.checker.items()
-            if sinfo.st_mtime > index_mtime
-        ]
+        needs_update = {}
+        for name, indexer in self.indexers.items():
+            cache_filename = self._cache_filename(name)
+            index_mtime = misc_cache.mtime(cache_filename)
+            stale = [
+                x for x, sinfo in self.checker.items()
+                if sinfo.st_mtime > index_mtime
+            ]
+
+            index_existed = misc_cache.init_entry(cache_filename)
+            if index_existed and not stale and not force:
+                # If the index exists and doesn't need an update, read it
+                with misc_cache.read_transaction(cache_filename) as f:
+                    indexer.read(f)
+
+                # Indexers read indexes in an outdated format as None
+                if indexer.index is not None:
+                    self.indexes[name] = indexer.index
+                    continue
 
-        index_existed = misc_cache.init_entry(cache_filename)
-        if index_existed and not needs_update:
-            # If the index exists and doesn't need an update, read it
-            with misc_cache.read_transaction(cache_filename) as f:
-                indexer.read(f)
+            needs_update[name] = list(self.checker) if force else stale
 
-        else:
-            # Otherwise update it and rewrite the cache file
-            with misc_cache.write_transaction(cache_filename) as (old, new):
-                indexer.read(old) if old else indexer.create()
+        # Load each package once for all the indexes that need it
+        pkg_names = sorted(set(itertools.chain(*needs_update.values())))
+        fragments = self._index_packages(list(needs_update), pkg_names)
+
+        for name in needs_update:
+            self.indexes[name] = self._update_index(
+                name, pkg_names, fragments[name], force)
+
+        return len(pkg_names)
 
-                for pkg_name in needs_update:
-                    namespaced_name = '%s.%s' % (self.namespace, pkg_name)
-                    indexer.update(namespaced_name)
+    def _cache_filename(self, name):
+        # Filename of the index cache (we assume they're all json)
+        return '{0}/{1}-index.json'.format(name, self.namespace)
 
-                indexer.write(new)
+    def _index_packages(self, names, pkg_names):
+        """Index packages in a pool of processes, each of which loads some
+        of them.
+
+        Arguments:
+            names (list): names of the indexes to generate
+            pkg_names (list): names of the packages to index
+
+        Return:
+            (dict) maps the names of the indexes to lists of indexes of
+            some of the packages, which together index all of them
+        """
+        slices = max(len(pkg_names) // _min_packages_per_process, 1)
+        processes = spack.util.parallel.num_processes(max_processes=slices)
+        show_progress = slices > 1 and sys.stderr.isatty()
+
+        def progress(done, total):
+            done = min(done * len(pkg_names) // total, len(pkg_names))
+            sys.stderr.write('\r' + tty.color.colorize('@*b{==>} ') + (
+                'Indexing packages in %s: %d/%d' % (
+                    self.namespace, done, len(pkg_names))))
+            if done == len(pkg_names):
+                sys.stderr.write('\n')
+            sys.stderr.flush()
+
+        results = spack.util.parallel.parallel_map(
+            _index_packages,
+            [(self.namespace, names, pkg_names[i::slices])
+             for i in range(slices) if pkg_names[i::slices]],
+            processes, progress=progress if show_progress else None)
+
+        fragments = dict((name, []) for name in names)
+        for result in results:
+            for name, text in result.items():
+                reader = copy.copy(self.indexers[name])
+                reader.read(six.StringIO(text))
+                fragments[name].append(reader.index)
+        return fragments
+
+    def _update_index(self, name, pkg_names, fragments, force):
+        """Merge the indexes of packages into an index and rewrite its
+        cache file."""
+        indexer = self.indexers[name]
+
+        with spack.caches.misc_cache.write_transaction(
+                self._cache_filename(name)) as (old, new):
+            indexer.read(old) if old and not force else indexer.create()
+
+            # Indexes in an outdated format are regenerated from scratch
+            if indexer.index is None:
+                indexer.create()
+                others = sorted(set(self.checker) - set(pkg_names))
+                fragments = fragments + self._index_packages(
+                    [name], others)[name]
+
+            for pkg_name in pkg_names:
+                indexer.remove('%s.%s' % (self.namespace, pkg_name))
+            for fragment in fragments:
+                indexer.merge(fragment)
+
+            indexer.write(new)
 
         return indexer.index
 
 
+def _index_packages(namespace, names, pkg_names):
+    """Generate indexes of some packages of a repository.
+
+    This is called in worker processes by ``RepoIndex._index_packages()``.
+
+    Arguments:
+        namespace (str): namespace of the repository
+        names (list): names of the indexes to generate
+        pkg_names (list): names of the packages to index
+
+    Return:
+        (dict) maps the names of the indexes to their JSON representation
+    """
+    repo_index = path.get_repo(namespace).index
+
+    fragments = {}
+    for name in names:
+        # Leave the indexes of the repository alone
+        indexer = copy.copy(repo_index.indexers[name])
+        indexer.create()
+        for pkg_name in pkg_names:
+            indexer.update('%s.%s' % (namespace, pkg_name))
+
+        stream = six.StringIO()
+        indexer.write(stream)
+        fragments[name] = stream.getvalue()
+    return fragments
+
+
 class RepoPath(object):
     """A RepoPath is a list of repos that function as one.
 
@@ -557,6 +745,15 @@ def patch_index(self):
 
         return self._patch_index
 
+    def get_metadata(self, pkg_name):
+        """Metadata of a package, which does not require importing it."""
+        return self.repo_for_pkg(pkg_name).get_metadata(pkg_name)
+
+    def all_metadata(self):
+        """Iterator over the metadata of all packages."""
+        for name in self.all_package_names():
+            yield self.get_metadata(name)
+
     @autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -566,7 +763,11 @@ def providers_for(self, vpkg_spec):
 
     @autospec
     def extensions_for(self, extendee_spec):
-        return [p for p in self.all_packages() if p.extends(extendee_spec)]
+        # Import only the packages that may extend the spec
+        candidates = [m.name for m in self.all_metadata()
+                      if extendee_spec.name in m.extendees]
+        return [p for p in (self.get(name) for name in candidates)
+                if p.extends(extendee_spec)]
 
     def find_module(self, fullname, path=None):
         """Implements precedence for overlaid namespaces.
@@ -744,6 +945,7 @@ def check(condition, msg):
 
         # Maps that goes from package name to corresponding file stat
         self._fast_package_checker = None
+        self._packages_digest = None
 
         # Indexes for this repository, computed lazily
         self._repo_index = None
@@ -941,6 +1143,8 @@ def index(self):
             self._repo_index.add_indexer('providers', ProviderIndexer())
             self._repo_index.add_indexer('tags', TagIndexer())
             self._repo_index.add_indexer('patches', PatchIndexer())
+            self._repo_index.add_indexer(
+                'metadata', MetadataIndexer(self.namespace))
         return self._repo_index
 
     @property
@@ -958,6 +1162,33 @@ def patch_index(self):
         """Index of patches and packages they're defined on."""
         return self.index['patches']
 
+    @property
+    def metadata_index(self):
+        """Index of the metadata of packages, by package name."""
+        return self.index['metadata']
+
+    def get_metadata(self, pkg_name):
+        """Metadata of a package, which does not require importing it."""
+        namespace, _, pkg_name = pkg_name.rpartition('.')
+        if namespace and (namespace != self.namespace):
+            raise InvalidNamespaceError('Invalid namespace for %s repo: %s'
+                                        % (self.namespace, namespace))
+        if not self.exists(pkg_name):
+            raise UnknownPackageError(pkg_name, self)
+
+        metadata = self.metadata_index.get(pkg_name)
+        if metadata is None:
+            # The package file is older than the index, but was not indexed
+            cls = spack.metadata_index.PackageMetadata
+            data = cls.data_from_package_class(self.get_pkg_class(pkg_name))
+            metadata = cls(pkg_name, self.namespace, data)
+        return metadata
+
+    def all_metadata(self):
+        """Iterator over the metadata of all packages in the repository."""
+        for name in self.all_package_names():
+            yield self.get_metadata(name)
+
     @autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -967,7 +1198,11 @@ def providers_for(self, vpkg_spec):
 
     @autospec
     def extensions_for(self, extendee_spec):
-        return [p for p in self.all_packages() if p.extends(extendee_spec)]
+        # Import only the packages that may extend the spec
+        candidates = [m.name for m in self.all_metadata()
+                      if extendee_spec.name in m.extendees]
+        return [p for p in (self.get(name) for name in candidates)
+                if p.extends(extendee_spec)]
 
     def dirname_for_package_name(self, pkg_name):
         """Get the directory name for a particular package.  This is the
@@ -1023,6 +1258,19 @@ def last_mtime(self):
         """Time a package file in this repo was last updated."""
         return self._pkg_checker.last_mtime()
 
+    def packages_digest(self):
+        """Digest of the names, sizes and modification times of the package
+        files in this repo, which changes whenever a package is added,
+        removed or updated."""
+        if self._packages_digest is None:
+            sha = hashlib.sha1()
+            for pkg_name in self.all_package_names():
+                sinfo = self._pkg_checker[pkg_name]
+                sha.update(('%s %d %r\n' % (
+                    pkg_name, sinfo.st_size, sinfo.st_mtime)).encode('utf-8'))
+            self._packages_digest = sha.hexdigest()
+        return self._packages_digest
+
     def is_virtual(self, pkg_name):
         """True if the package with this name is virtual, False otherwise."""
         return self.provider_index.contains(pkg_name)
@@ -57,15 +57,23 @@
             'misc_cache': {'type': 'string'},
             'connect_timeout': {'type': 'integer', 'minimum': 0},
             'verify_ssl': {'type': 'boolean'},
+            'url_fetch_method': {
+                'type': 'string',
+                'enum': ['native', 'curl']
+            },
             'suppress_gpg_warnings': {'type': 'boolean'},
             'install_missing_compilers': {'type': 'boolean'},
+            'concretization_cache': {'type': 'boolean'},
             'debug': {'type': 'boolean'},
             'checksum': {'type': 'boolean'},
             'locks': {'type': 'boolean'},
             'dirty': {'type': 'boolean'},
             'build_language': {'type': 'string'},
             'build_jobs': {'type': 'integer', 'minimum': 1},
+            'concurrent_packages': {'type': 'integer', 'minimum': 1},
+            'jobserver': {'type': 'boolean'},
             'ccache': {'type': 'boolean'},
+            'view_link_threads': {'type': 'integer', 'minimum': 1},
             'db_lock_timeout': {'type': 'integer', 'minimum': 1},
             'package_lock_timeout': {
                 'anyOf': [
@@ -1381,8 +1381,7 @@ def _spec_hash(self, hash):
         """
         # TODO: curently we strip build dependencies by default.  Rethink
         # this when we move to using package hashing on all specs.
-        yaml_text = syaml.dump(
-            self.to_node_dict(hash=hash), default_flow_style=True)
+        yaml_text = syaml.dump_flow(self.to_node_dict(hash=hash))
         sha = hashlib.sha1(yaml_text.encode('utf-8'))
         b32_hash = base64.b32encode(sha.digest()).lower()
 
@@ -2159,6 +2158,17 @@ def concretize(self, tests=False):
         if self._concrete:
             return
 
+        # Reuse the concretization of an equal root spec, if memoized
+        memoization_key = None
+        if not self._dependents:
+            cache = spack.concretize.concretization_cache
+            memoization_key = cache.key([self], tests=tests)
+            memoized = cache.get(memoization_key)
+            if memoized:
+                self._dup(memoized[0])
+                self._check_deprecated()
+                return
+
         changed = True
         force = False
 
@@ -2266,21 +2276,7 @@ def concretize(self, tests=False):
         self._mark_concrete()
 
         # If any spec in the DAG is deprecated, throw an error
-        deprecated = []
-        with spack.store.db.read_transaction():
-            for x in self.traverse():
-                _, rec = spack.store.db.query_by_spec_hash(x.dag_hash())
-                if rec and rec.deprecated_for:
-                    deprecated.append(rec)
-
-        if deprecated:
-            msg = "\n    The following specs have been deprecated"
-            msg += " in favor of specs with the hashes shown:\n"
-            for rec in deprecated:
-                msg += '        %s  --> %s\n' % (rec.spec, rec.deprecated_for)
-            msg += '\n'
-            msg += "    For each package listed, choose another spec\n"
-            raise SpecDeprecatedError(msg)
+        self._check_deprecated()
 
         # Now that the spec is concrete we should check if
         # there are declared conflicts
@@ -2303,6 +2299,27 @@ def concretize(self, tests=False):
         # there are declared inconsistencies)
         self.architecture.target.optimization_flags(self.compiler)
 
+        spack.concretize.concretization_cache.put(memoization_key, [self])
+
+    def _check_deprecated(self):
+        """Raise an error if any spec in this concrete DAG is installed and
+        deprecated."""
+        deprecated = []
+        with spack.store.db.read_transaction():
+            for x in self.traverse():
+                _, rec = spack.store.db.query_by_spec_hash(x.dag_hash())
+                if rec and rec.deprecated_for:
+                    deprecated.append(rec)
+
+        if deprecated:
+            msg = "\n    The following specs have been deprecated"
+            msg += " in favor of specs with the hashes shown:\n"
+            for rec in deprecated:
+                msg += '        %s  --> %s\n' % (rec.spec, rec.deprecated_for)
+            msg += '\n'
+            msg += "    For each package listed, choose another spec\n"
+            raise SpecDeprecatedError(msg)
+
     def _mark_concrete(self, value=True):
         """Mark this spec and its dependencies as concrete.
 
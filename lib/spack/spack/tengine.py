@@ -65,7 +65,11 @@ def to_dict(self):
 
 
 def make_environment(dirs=None):
-    """Returns an configured environment for template rendering."""
+    """Returns an configured environment for template rendering.
+
+    Environments are shared by all callers using the same directories, so
+    that each template is compiled only once.
+    """
     if dirs is None:
         # Default directories where to search for templates
         builtins = spack.config.get('config:template_dirs')
@@ -73,12 +77,17 @@ def make_environment(dirs=None):
         dirs = [canonicalize_path(d)
                 for d in itertools.chain(builtins, extensions)]
 
+    return _make_environment(tuple(dirs))
+
+
+@llnl.util.lang.memoized
+def _make_environment(dirs):
     # avoid importing this at the top level as it's used infrequently and
     # slows down startup a bit.
     import jinja2
 
     # Loader for the templates
-    loader = jinja2.FileSystemLoader(dirs)
+    loader = jinja2.FileSystemLoader(list(dirs))
     # Environment of the template engine
     env = jinja2.Environment(loader=loader, trim_blocks=True)
     # Custom filters
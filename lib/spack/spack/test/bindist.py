@@ -6,14 +6,21 @@
 """
 This test checks creating and install buildcaches
 """
+import json
 import os
 import py
 import pytest
 import argparse
 import platform
+import time
 import spack.repo
 import spack.store
 import spack.binary_distribution as bindist
+import spack.caches
+import spack.database
+import spack.util.file_cache
+import spack.util.spack_yaml as syaml
+import spack.util.web as web_util
 import spack.cmd.buildcache as buildcache
 import spack.cmd.install as install
 import spack.cmd.uninstall as uninstall
@@ -247,6 +254,7 @@ def test_default_rpaths_create_install_default_layout(tmpdir,
     args = parser.parse_args(['list', '-l', '-v'])
     buildcache.buildcache(parser, args)
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
     spack.stage.purge()
     margs = mparser.parse_args(
         ['rm', '--scope', 'site', 'test-mirror-def'])
@@ -296,6 +304,7 @@ def test_default_rpaths_install_nondefault_layout(tmpdir,
     buildcache.buildcache(parser, args)
 
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
     spack.stage.purge()
     margs = mparser.parse_args(
         ['rm', '--scope', 'site', 'test-mirror-def'])
@@ -353,6 +362,7 @@ def test_relative_rpaths_create_default_layout(tmpdir,
     uninstall.uninstall(uparser, uargs)
 
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
     spack.stage.purge()
 
 
@@ -416,6 +426,7 @@ def test_relative_rpaths_install_default_layout(tmpdir,
     buildcache.buildcache(parser, args)
 
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
     spack.stage.purge()
     margs = mparser.parse_args(
         ['rm', '--scope', 'site', 'test-mirror-rel'])
@@ -465,7 +476,175 @@ def test_relative_rpaths_install_nondefault(tmpdir,
     buildcache.buildcache(parser, args)
 
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
     spack.stage.purge()
     margs = mparser.parse_args(
         ['rm', '--scope', 'site', 'test-mirror-rel'])
     mirror.mirror(mparser, margs)
+
+
+def test_generate_package_index_updates_previous_index(
+        tmpdir, mock_packages, config, monkeypatch):
+    cache_dir = tmpdir.mkdir('build_cache')
+    cache_prefix = 'file://%s' % cache_dir
+    libdwarf, dyninst = [
+        Spec(s).concretized() for s in ('libdwarf', 'dyninst')]
+
+    def spec_file(spec):
+        return cache_dir.join(bindist.tarball_name(spec, '.spec.yaml'))
+
+    def ref_counts():
+        with open(str(cache_dir.join('index.json'))) as f:
+            installs = json.load(f)['database']['installs']
+        return dict((Spec.from_node_dict(r['spec']).name, r['ref_count'])
+                    for r in installs.values())
+
+    fetched = []
+    read_from_url = web_util.read_from_url
+
+    def _read_from_url(url, *args, **kwargs):
+        fetched.append(os.path.basename(url))
+        return read_from_url(url, *args, **kwargs)
+    monkeypatch.setattr(web_util, 'read_from_url', _read_from_url)
+
+    spec_file(libdwarf).write(libdwarf.to_yaml())
+    spec_file(libdwarf).setmtime(time.time() - 60)
+    bindist.generate_package_index(cache_prefix)
+    assert ref_counts() == {'libdwarf': 0, 'libelf': 1}
+
+    # Only the spec files missing from the index are fetched
+    del fetched[:]
+    spec_file(dyninst).write(dyninst.to_yaml())
+    bindist.generate_package_index(cache_prefix)
+    assert fetched == ['index.json', spec_file(dyninst).basename]
+    assert ref_counts() == {'dyninst': 0, 'libdwarf': 1, 'libelf': 2}
+
+    # Specs are dropped with their spec files, unless other specs need them
+    spec_file(dyninst).remove()
+    bindist.generate_package_index(cache_prefix)
+    assert ref_counts() == {'libdwarf': 0, 'libelf': 1}
+
+    # The index can be read as a database
+    db = spack.database.Database(None, db_dir=str(tmpdir.join('db')),
+                                 enable_transaction_locking=False)
+    db._read_from_file(str(cache_dir.join('index.json')))
+    assert set(s.dag_hash() for s in db.query_local(installed=False)) == \
+        set(s.dag_hash() for s in libdwarf.traverse())
+
+
+def test_generate_package_index_fetches_changed_spec_files(
+        tmpdir, mock_packages, config, monkeypatch):
+    cache_dir = tmpdir.mkdir('build_cache')
+    cache_prefix = 'file://%s' % cache_dir
+    libdwarf = Spec('libdwarf').concretized()
+    spec_file = cache_dir.join(bindist.tarball_name(libdwarf, '.spec.yaml'))
+    index_file = cache_dir.join('index.json')
+
+    def write_spec_file(full_hash):
+        spec_dict = libdwarf.to_dict()
+        spec_dict['full_hash'] = full_hash
+        spec_file.write(syaml.dump(spec_dict))
+        spec_file.setmtime(time.time() - 60)
+
+    def indexed_full_hash():
+        with open(str(index_file)) as f:
+            record = json.load(f)['database']['installs'][libdwarf.dag_hash()]
+        return record['spec']['libdwarf'].get('full_hash', 'missing')
+
+    fetched = []
+    read_from_url = web_util.read_from_url
+
+    def _read_from_url(url, *args, **kwargs):
+        fetched.append(os.path.basename(url))
+        return read_from_url(url, *args, **kwargs)
+    monkeypatch.setattr(web_util, 'read_from_url', _read_from_url)
+
+    write_spec_file('a' * 32)
+    bindist.generate_package_index(cache_prefix)
+    assert indexed_full_hash() == 'a' * 32
+
+    # Spec files older than the index are not fetched again
+    del fetched[:]
+    bindist.generate_package_index(cache_prefix)
+    assert fetched == ['index.json']
+    assert indexed_full_hash() == 'a' * 32
+
+    # Spec files rewritten after the index, e.g. by buildcache create -f,
+    # are fetched again
+    write_spec_file('b' * 32)
+    spec_file.setmtime(index_file.mtime() + 1)
+    del fetched[:]
+    bindist.generate_package_index(cache_prefix)
+    assert fetched == ['index.json', spec_file.basename]
+    assert indexed_full_hash() == 'b' * 32
+
+    # Records without a full hash, from older indices, are fetched again
+    with open(str(index_file)) as f:
+        index = json.load(f)
+    del index['database']['installs'][libdwarf.dag_hash()]['spec'][
+        'libdwarf']['full_hash']
+    with open(str(index_file), 'w') as f:
+        json.dump(index, f)
+    write_spec_file('c' * 32)
+    assert indexed_full_hash() == 'missing'
+    del fetched[:]
+    bindist.generate_package_index(cache_prefix)
+    assert fetched == ['index.json', spec_file.basename]
+    assert indexed_full_hash() == 'c' * 32
+
+    # Forcing a rebuild fetches all the spec files, and not the index
+    write_spec_file('d' * 32)
+    del fetched[:]
+    bindist.generate_package_index(cache_prefix, force=True)
+    assert fetched == [spec_file.basename]
+    assert indexed_full_hash() == 'd' * 32
+
+
+def test_binary_index_is_cached_locally(
+        tmpdir, mock_packages, config, monkeypatch):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir.join('c'))))
+    mirror_url = 'file://%s' % tmpdir.join('mirror')
+    cache_dir = tmpdir.join('mirror', 'build_cache').ensure(dir=True)
+    cache_prefix = bindist.build_cache_prefix(mirror_url)
+    libdwarf, dyninst = [
+        Spec(s).concretized() for s in ('libdwarf', 'dyninst')]
+    for spec in (libdwarf, dyninst):
+        spec_dict = spec.to_dict()
+        spec_dict['full_hash'] = spec.full_hash()
+        spec_file = cache_dir.join(bindist.tarball_name(spec, '.spec.yaml'))
+        spec_file.write(syaml.dump(spec_dict))
+        if spec is libdwarf:
+            bindist.generate_package_index(cache_prefix)
+
+    fetched = []
+    read_from_url = web_util.read_from_url
+
+    def _read_from_url(url, *args, **kwargs):
+        fetched.append(os.path.basename(url))
+        return read_from_url(url, *args, **kwargs)
+    monkeypatch.setattr(web_util, 'read_from_url', _read_from_url)
+
+    index = bindist.BinaryCacheIndex()
+    specs = index.specs(cache_prefix)
+    assert set(specs) == set(s.dag_hash() for s in libdwarf.traverse())
+    assert fetched == ['index.json.hash', 'index.json']
+
+    # Indices are checked once per Spack run, and the local copy is used
+    # by later runs while it is current
+    del fetched[:]
+    assert index.specs(cache_prefix) is specs
+    assert bindist.BinaryCacheIndex().specs(cache_prefix) == specs
+    assert fetched == ['index.json.hash']
+
+    # Full hashes in the index spare fetching spec files, unless the spec
+    # is not in the index yet
+    del fetched[:]
+    monkeypatch.setattr(bindist, 'binary_index', index)
+    assert not bindist.needs_rebuild(libdwarf, mirror_url)
+    assert not bindist.needs_rebuild(dyninst, mirror_url)
+    assert fetched == [bindist.tarball_name(dyninst, '.spec.yaml')]
+
+    # Updated indices are fetched again
+    bindist.generate_package_index(cache_prefix)
+    assert dyninst.dag_hash() in index.specs(cache_prefix)
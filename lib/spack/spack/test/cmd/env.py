@@ -10,9 +10,12 @@
 
 import llnl.util.filesystem as fs
 
+import spack.config
 import spack.hash_types as ht
 import spack.modules
 import spack.environment as ev
+import spack.filesystem_view
+import spack.util.parallel
 
 from spack.cmd.env import _env_create
 from spack.spec import Spec
@@ -47,7 +50,8 @@ def check_mpileaks_and_deps_in_view(viewdir):
 def check_viewdir_removal(viewdir):
     """Check that the uninstall/removal worked."""
     assert (not os.path.exists(str(viewdir.join('.spack'))) or
-            os.listdir(str(viewdir.join('.spack'))) == ['projections.yaml'])
+            set(os.listdir(str(viewdir.join('.spack')))) <=
+            set(['projections.yaml', 'view_manifest.json']))
 
 
 @pytest.fixture()
@@ -139,6 +143,60 @@ def test_concretize():
     assert any(x.name == 'mpileaks' for x in env_specs)
 
 
+def test_concretize_separately_in_parallel(mutable_config, monkeypatch):
+    user_specs = ['mpileaks', 'dyninst', 'libelf@0.8.12', 'zmpi',
+                  'callpath ^mpich']
+    serial = ev.create('serial')
+    for user_spec in user_specs:
+        serial.add(user_spec)
+    serial.concretize(jobs=1)
+
+    parallel_map = spack.util.parallel.parallel_map
+    calls = []
+
+    def _parallel_map(func, arguments, processes=None, progress=None):
+        calls.append(processes)
+        return parallel_map(func, arguments, processes, progress)
+
+    monkeypatch.setattr(spack.util.parallel, 'parallel_map', _parallel_map)
+    monkeypatch.setattr(spack.util.parallel.multiprocessing, 'cpu_count',
+                        lambda: 4)
+    e = ev.create('parallel')
+    for user_spec in user_specs:
+        e.add(user_spec)
+    concretized_specs = e.concretize(jobs=4)
+    assert calls == [4]
+
+    # Specs are added in the order of the manifest, as when concretized
+    # one after the other
+    assert [s for s, _ in concretized_specs] == \
+        [Spec(s) for s in user_specs]
+    assert e.concretized_order == serial.concretized_order
+    for build_hash, concrete in e.specs_by_hash.items():
+        assert concrete.concrete
+        assert concrete.build_hash() == build_hash
+        assert concrete.tree() == serial.specs_by_hash[build_hash].tree()
+
+
+def test_concretize_jobs(mutable_config, monkeypatch):
+    mutable_config.push_scope(
+        spack.config.InternalConfigScope('command_line'))
+    monkeypatch.setattr(spack.util.parallel.multiprocessing, 'cpu_count',
+                        lambda: 2)
+    e = ev.create('test')
+    e.add('mpileaks')
+    e.add('libelf')
+    with e:
+        output = concretize('-j', '2')
+    assert 'Concretized mpileaks' in output
+    assert 'Concretized libelf' in output
+
+    e = ev.read('test')
+    assert [s.name for s in e.concretized_user_specs] == \
+        ['mpileaks', 'libelf']
+    assert all(s.concrete for s in e.specs_by_hash.values())
+
+
 def test_env_install_all(install_mockery, mock_fetch):
     e = ev.create('test')
     e.add('cmake-client')
@@ -1066,6 +1124,71 @@ def test_env_updates_view_force_remove(
     check_viewdir_removal(view_dir)
 
 
+def test_env_view_manifest_updates_changed_specs_only(
+        tmpdir, mock_stage, mock_fetch, install_mockery, monkeypatch):
+    view_dir = tmpdir.mkdir('view')
+    env('create', '--with-view=%s' % view_dir, 'test')
+    with ev.read('test'):
+        install('--fake', 'mpileaks')
+
+    mpileaks = Spec('mpileaks').concretized()
+    manifest = view_dir.join('.spack', 'view_manifest.json')
+    linked = sjson.load(manifest.read())['specs']
+    assert set(linked) == set(s.dag_hash() for s in mpileaks.traverse())
+    assert 'bin/mpileaks' in linked[mpileaks.dag_hash()]['files']
+
+    # Regenerating the view neither sweeps it nor reads the specs in it,
+    # and links only the files of the new spec
+    def _fail(*args, **kwargs):
+        raise AssertionError('view read or swept')
+
+    merged = []
+    merge = spack.filesystem_view.YamlFilesystemView.merge
+
+    def _merge(view, spec, **kwargs):
+        merged.append(spec.name)
+        return merge(view, spec, **kwargs)
+
+    monkeypatch.setattr(
+        spack.filesystem_view.YamlFilesystemView, 'clean', _fail)
+    monkeypatch.setattr(
+        spack.filesystem_view.YamlFilesystemView, 'get_all_specs', _fail)
+    monkeypatch.setattr(
+        spack.filesystem_view.YamlFilesystemView, 'merge', _merge)
+
+    with ev.read('test'):
+        install('--fake', 'trivial-install-test-package')
+    assert merged == ['trivial-install-test-package']
+    assert os.path.exists(str(view_dir.join('.spack', 'mpileaks')))
+
+    with ev.read('test'):
+        remove('-f', 'mpileaks')
+    assert merged == ['trivial-install-test-package']
+    assert not os.path.exists(str(view_dir.join('.spack', 'mpileaks')))
+    assert not os.path.exists(str(view_dir.join('bin', 'mpileaks')))
+    assert os.path.exists(
+        str(view_dir.join('.spack', 'trivial-install-test-package')))
+
+
+def test_env_view_without_manifest(
+        tmpdir, mock_stage, mock_fetch, install_mockery):
+    # Views created before they kept manifests are updated as they were
+    view_dir = tmpdir.mkdir('view')
+    view_dir.ensure('bin', 'old-link')
+    env('create', '--with-view=%s' % view_dir, 'test')
+    with ev.read('test'):
+        install('--fake', 'mpileaks')
+
+    check_mpileaks_and_deps_in_view(view_dir)
+    assert not os.path.exists(
+        str(view_dir.join('.spack', 'view_manifest.json')))
+
+    with ev.read('test'):
+        uninstall('-ay')
+
+    check_viewdir_removal(view_dir)
+
+
 def test_env_activate_view_fails(
         tmpdir, mock_stage, mock_fetch, install_mockery, env_deactivate):
     """Sanity check on env activate to make sure it requires shell support"""
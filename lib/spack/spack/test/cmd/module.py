@@ -8,6 +8,7 @@
 
 import pytest
 
+import spack.config
 import spack.main
 import spack.modules
 from spack.test.conftest import use_store, use_configuration, use_repo
@@ -231,3 +232,36 @@ def test_setdefault_command(
         assert os.path.exists(writers[k].layout.filename)
     assert os.path.exists(link_name) and os.path.islink(link_name)
     assert os.path.realpath(link_name) == writers[preferred].layout.filename
+
+
+@pytest.mark.db
+def test_refresh_incremental(mutable_database, mutable_config, monkeypatch):
+    module('tcl', 'refresh', '-y', '--delete-tree')
+    mpileaks, libelf = _module_files('tcl', 'mpileaks ^mpich', 'libelf')
+    with open(mpileaks, 'a') as f:
+        f.write('# not rewritten')
+    os.remove(libelf)
+
+    # Only missing module files are written
+    module('tcl', 'refresh', '-y', '--incremental')
+    assert os.path.exists(libelf)
+    with open(mpileaks) as f:
+        assert f.read().endswith('# not rewritten')
+
+    # Module files of specs uninstalled are removed
+    mutable_database.remove('libelf')
+    module('tcl', 'refresh', '-y', '--incremental')
+    assert not os.path.exists(libelf)
+    out = module('tcl', 'refresh', '-y', '--incremental')
+    assert 'up to date' in out
+
+    # Module files are written again if their configuration changes what
+    # they contain. The configuration of each spec is cached in a process.
+    spack.config.set('modules:tcl', {
+        'all': {'environment': {'set': {'REFRESH_INCREMENTAL': '1'}}}})
+    monkeypatch.setattr(spack.modules.tcl, 'configuration_registry', {})
+    module('tcl', 'refresh', '-y', '--incremental')
+    with open(mpileaks) as f:
+        content = f.read()
+    assert 'REFRESH_INCREMENTAL' in content
+    assert not content.endswith('# not rewritten')
@@ -5,7 +5,9 @@
 import os.path
 
 import pytest
+import spack.caches
 import spack.main
+import spack.util.file_cache
 
 repo = spack.main.SpackCommand('repo')
 
@@ -33,3 +35,14 @@ def test_create_add_list_remove(mutable_config, tmpdir):
     repo('remove', '--scope=site', str(tmpdir))
     output = repo('list', '--scope=site', output=str)
     assert 'mockrepo' not in output
+
+
+def test_reindex(mock_packages, tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    output = repo('reindex', 'builtin.mock')
+    assert 'Indexed 0 packages' not in output
+    assert tmpdir.join('providers', 'builtin.mock-index.json').exists()
+
+    output = repo('reindex', 'builtin.mock')
+    assert "Indexed 0 packages in 'builtin.mock'" in output
@@ -83,6 +83,11 @@ def test_single_spec_verify_cmd(tmpdir, mock_packages, mock_archive,
     assert new_file in results
     assert 'added' in results
 
+    results = verify('--fast', '--jobs', '2', '/%s' % hash,
+                     fail_on_error=False)
+    assert new_file in results
+    assert 'added' in results
+
     results = verify('-j', '/%s' % hash, fail_on_error=False)
     res = sjson.load(results)
     assert len(res) == 1
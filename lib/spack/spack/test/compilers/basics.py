@@ -14,11 +14,13 @@
 
 import llnl.util.filesystem as fs
 
+import spack.caches
 import spack.spec
 import spack.compiler
 import spack.compilers as compilers
 import spack.spec
 import spack.util.environment
+import spack.util.file_cache
 
 from spack.compiler import Compiler
 from spack.util.executable import ProcessError
@@ -739,6 +741,87 @@ def _call(*args, **kwargs):
         assert 'SPACK_TEST_CMP_ON' not in os.environ
 
 
+@pytest.fixture()
+def counting_compiler(working_env, monkeypatch, tmpdir):
+    """A compiler that counts the number of times it runs, with the
+    ``misc_cache`` in a temporary directory."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir.join('c'))))
+    libdir = tmpdir.ensure('compiler', 'lib', dir=True)
+    gcc = tmpdir.join('gcc')
+    gcc.write("""#!/bin/bash
+echo run >> {0}
+if [[ -e {1} ]]; then
+    exit 1
+elif [[ " $* " == *" --verbose "* ]]; then
+    echo "ld -L{2}"
+else
+    echo "$CMP_VER"
+fi
+""".format(tmpdir.join('runs'), tmpdir.join('fail'), libdir))
+    fs.set_executable(str(gcc))
+
+    compiler = MockCompiler()
+    compiler.cc = str(gcc)
+    compiler.environment = {'set': {'CMP_VER': '2.2.2'}}
+
+    def runs():
+        runs = tmpdir.join('runs')
+        return len(runs.readlines()) if runs.exists() else 0
+    return compiler, str(libdir), runs
+
+
+@pytest.mark.enable_compiler_link_paths
+def test_compiler_outputs_are_cached(counting_compiler):
+    compiler, libdir, runs = counting_compiler
+
+    for _ in range(3):
+        assert compiler.get_real_version() == '2.2.2'
+        assert compiler._get_compiler_link_paths([compiler.cc]) == [libdir]
+    assert runs() == 2
+
+    # The flags and the environment modifications are part of the key
+    compiler.flags = {'cflags': ['-O3']}
+    assert compiler._get_compiler_link_paths([compiler.cc]) == [libdir]
+    compiler.environment = {'set': {'CMP_VER': '3.3.3'}}
+    assert compiler.get_real_version() == '3.3.3'
+    assert runs() == 4
+
+    # A new instance uses the cache too
+    other = MockCompiler()
+    other.cc = compiler.cc
+    other.environment = compiler.environment
+    assert other.get_real_version() == '3.3.3'
+    assert runs() == 4
+
+
+def test_compiler_outputs_are_cached_until_compiler_changes(
+        counting_compiler):
+    compiler, _, runs = counting_compiler
+
+    assert compiler.get_real_version() == '2.2.2'
+    with open(compiler.cc) as f:
+        script = f.read()
+    with open(compiler.cc, 'w') as f:
+        f.write(script.replace('$CMP_VER', '4.4.4'))
+    assert compiler.get_real_version() == '4.4.4'
+    assert compiler.get_real_version() == '4.4.4'
+    assert runs() == 2
+
+
+def test_compiler_errors_are_not_cached(counting_compiler, tmpdir):
+    compiler, _, runs = counting_compiler
+
+    tmpdir.ensure('fail')
+    with pytest.raises(ProcessError):
+        compiler.get_real_version()
+
+    tmpdir.join('fail').remove()
+    assert compiler.get_real_version() == '2.2.2'
+    assert compiler.get_real_version() == '2.2.2'
+    assert runs() == 2
+
+
 def test_apple_clang_setup_environment(mock_executable, monkeypatch):
     """Test a code path that is taken only if the package uses
     Xcode on MacOS.
@@ -7,8 +7,11 @@
 import llnl.util.lang
 
 import spack.architecture
+import spack.caches
 import spack.concretize
+import spack.config
 import spack.repo
+import spack.util.file_cache
 
 from spack.concretize import find_spec, NoValidVersionError
 from spack.error import SpecError
@@ -638,3 +641,56 @@ def test_concretize_anonymous(self):
         with pytest.raises(spack.error.SpecError):
             s = Spec('+variant')
             s.concretize()
+
+    def test_concretizations_are_memoized(self, monkeypatch):
+        s = Spec('mpileaks').concretized()
+
+        def _fail(*args, **kwargs):
+            raise AssertionError('spec concretized again')
+
+        monkeypatch.setattr(Spec, 'normalize', _fail)
+        t = Spec('mpileaks').concretized()
+        assert t.concrete
+        assert t.dag_hash() == s.dag_hash()
+
+        # Specs handed out by the cache are copies
+        t.versions = ver('0.0')
+        assert Spec('mpileaks').concretized().dag_hash() == s.dag_hash()
+
+    def test_memoized_concretizations_depend_on_config(self):
+        assert '^mpich' in Spec('mpileaks').concretized()
+
+        spack.config.set('packages:all:providers:mpi', ['zmpi'])
+        s = Spec('mpileaks').concretized()
+        assert '^zmpi' in s
+        assert '^mpich' not in s
+
+    def test_memoized_concretizations_on_disk(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(spack.caches, 'misc_cache',
+                            spack.util.file_cache.FileCache(str(tmpdir)))
+        spack.config.set('config:concretization_cache', True)
+        s = Spec('mpileaks').concretized()
+
+        def _fail(*args, **kwargs):
+            raise AssertionError('spec concretized again')
+
+        spack.concretize.concretization_cache.clear()
+        monkeypatch.setattr(Spec, 'normalize', _fail)
+        t = Spec('mpileaks').concretized()
+        assert t.concrete
+        assert t.dag_hash() == s.dag_hash()
+        assert t.build_hash() == s.build_hash()
+
+    def test_memoized_concretizations_together(self, monkeypatch):
+        abstract_specs = [Spec('mpileaks'), Spec('dyninst')]
+        concrete_specs = spack.concretize.concretize_specs_together(
+            *abstract_specs)
+
+        def _fail(*args, **kwargs):
+            raise AssertionError('specs concretized again')
+
+        monkeypatch.setattr(spack.repo, 'additional_repository', _fail)
+        memoized = spack.concretize.concretize_specs_together(
+            *abstract_specs)
+        assert [s.dag_hash() for s in memoized] == \
+            [s.dag_hash() for s in concrete_specs]
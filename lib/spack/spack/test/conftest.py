@@ -23,6 +23,7 @@
 import spack.architecture
 import spack.compilers
 import spack.config
+import spack.concretize
 import spack.caches
 import spack.database
 import spack.directory_layout
@@ -35,6 +36,7 @@
 import spack.stage
 import spack.util.executable
 import spack.util.gpg
+import spack.util.web
 
 from spack.util.pattern import Bunch
 from spack.fetch_strategy import FetchStrategyComposite, URLFetchStrategy
@@ -149,6 +151,15 @@ def reset_compiler_cache():
     spack.compilers._compiler_cache = {}
 
 
+@pytest.fixture(scope='function', autouse=True)
+def reset_concretization_cache():
+    """Ensure that concretizations are not reused across Spack tests, which
+    can patch packages and Spack itself in ways the cache cannot see."""
+    spack.concretize.concretization_cache.clear()
+    yield
+    spack.concretize.concretization_cache.clear()
+
+
 @pytest.fixture(scope='function', autouse=True)
 def mock_stage(tmpdir_factory, monkeypatch, request):
     """Establish the temporary build_stage for the mock archive."""
@@ -1179,3 +1190,75 @@ def _factory(name, output, subdir=('bin',)):
         return str(f)
 
     return _factory
+
+
+@pytest.fixture
+def mock_http_server(tmpdir):
+    """Serves the files of a temporary directory from a local HTTP/1.1
+    server, which keeps connections alive and honors ranges.
+
+    The server records the number of connections made to it, and the path
+    and ``Range`` header of each request, and the ``User-Agent`` of the
+    last one.  It waits ``delay`` seconds before every response.
+    """
+    from six.moves import BaseHTTPServer, socketserver
+    import threading
+    import time
+
+    root = tmpdir.ensure('http-root', dir=True)
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+            self.server.connections += 1
+
+        def do_GET(self):  # noqa: N802
+            path = root.join(self.path.lstrip('/'))
+            byte_range = self.headers.get('Range')
+            self.server.requests.append((self.path, byte_range))
+            self.server.user_agent = self.headers.get('User-Agent')
+            time.sleep(self.server.delay)
+            if not path.check(file=True):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            data = path.read_binary()
+            start = 0
+            if byte_range:
+                start = int(byte_range[len('bytes='):].rstrip('-'))
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                    start, len(data) - 1, len(data)))
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data) - start))
+            self.end_headers()
+            self.wfile.write(data[start:])
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.connections = 0
+    server.requests = []
+    server.user_agent = None
+    server.delay = 0
+    server.root = root
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    spack.util.web.connection_pool.clear()
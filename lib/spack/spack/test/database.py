@@ -140,8 +140,12 @@ def test_removed_upstream_dep(upstream_and_downstream_db):
         new_downstream = spack.database.Database(
             downstream_db.root, upstream_dbs=[upstream_db])
         new_downstream._fail_when_missing_deps = True
+        new_downstream._read()
+
+        # Specs are read lazily, missing dependencies are detected when
+        # the spec depending on them is first needed
         with pytest.raises(spack.database.MissingDependenciesError):
-            new_downstream._read()
+            new_downstream.query('y')
 
 
 @pytest.mark.usefixtures('config')
@@ -897,3 +901,278 @@ def _raise(db, spec):
     with pytest.raises(Exception):
         with spack.store.db.prefix_write_lock(s):
             assert False
+
+
+def _record_state(database):
+    """Return the state of all the records in a DB as plain data."""
+    with database.read_transaction():
+        return dict(
+            (key, (rec.ref_count, rec.installed, rec.explicit,
+                   rec.deprecated_for,
+                   sorted(d.dag_hash() for d in rec.spec.dependencies())))
+            for key, rec in database._data.items())
+
+
+def _index_file_key(database):
+    st = os.stat(database._index_path)
+    return st.st_ino, st.st_size, st.st_mtime
+
+
+def test_write_transaction_appends_to_journal(mutable_database):
+    index_key = _index_file_key(mutable_database)
+    with open(mutable_database._journal_path) as f:
+        nentries = len(f.readlines())
+
+    _mock_remove('mpileaks ^zmpi')
+    mpich = mutable_database.query_one('mpich')
+    zmpi = mutable_database.query_one('zmpi')
+    mutable_database.deprecate(mpich, zmpi)
+
+    # index.json is left alone, changes go to the journal
+    assert _index_file_key(mutable_database) == index_key
+    with open(mutable_database._journal_path) as f:
+        assert len(f.readlines()) > nentries
+
+    # A fresh DB reading index.json and the journal sees the same state
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert _record_state(fresh_db) == _record_state(mutable_database)
+    fresh_db._check_ref_counts()
+
+
+def test_journal_tail_replay(mutable_database, monkeypatch):
+    other_db = spack.database.Database(mutable_database.root)
+    with other_db.read_transaction():
+        assert len(other_db.query('mpileaks ^zmpi')) == 1
+
+    _mock_remove('mpileaks ^zmpi')
+    _mock_install('cmake')
+
+    # The other DB catches up without reading index.json again
+    def _fail(*args, **kwargs):
+        raise AssertionError('index.json should not be read again')
+    monkeypatch.setattr(other_db, '_read_from_file', _fail)
+
+    with other_db.read_transaction():
+        assert len(other_db.query('mpileaks ^zmpi')) == 0
+        assert len(other_db.query('cmake')) == 1
+    assert _record_state(other_db) == _record_state(mutable_database)
+
+
+def test_journal_compaction(mutable_database, monkeypatch):
+    _mock_remove('mpileaks ^zmpi')
+    index_key = _index_file_key(mutable_database)
+
+    monkeypatch.setattr(spack.database, '_journal_min_compaction_size', 0)
+    monkeypatch.setattr(spack.database, '_journal_compaction_ratio', 0)
+    _mock_remove('mpileaks ^mpich2')
+    expected = _record_state(mutable_database)
+
+    # The journal was folded into a new index.json and started over
+    assert _index_file_key(mutable_database) != index_key
+    with open(mutable_database._journal_path) as f:
+        assert len(f.readlines()) == 1
+    with open(mutable_database._index_path) as f:
+        index = json.load(f)
+        validate(index, schema)
+        assert index['database']['journal'] == mutable_database._journal_id
+
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert _record_state(fresh_db) == expected
+
+
+def test_journal_incomplete_entry_is_ignored(mutable_database):
+    expected = _record_state(mutable_database)
+
+    # Simulate a writer interrupted in the middle of an append
+    with open(mutable_database._journal_path, 'a') as f:
+        f.write('{"changes": [{"op": "remove", "ha')
+
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert _record_state(fresh_db) == expected
+
+    # The next write drops the incomplete entry
+    with fresh_db.write_transaction():
+        fresh_db._remove(fresh_db.query_one('mpileaks ^zmpi'))
+    expected = _record_state(fresh_db)
+    assert _record_state(spack.database.Database(fresh_db.root)) == expected
+
+
+def test_journal_of_replaced_index_is_ignored(mutable_database):
+    _mock_remove('mpileaks ^zmpi')
+
+    # Rewrite index.json as a Spack unaware of the journal would
+    with open(mutable_database._index_path) as f:
+        index = json.load(f)
+    del index['database']['journal']
+    with open(mutable_database._index_path, 'w') as f:
+        json.dump(index, f)
+
+    fresh_db = spack.database.Database(mutable_database.root)
+    with fresh_db.read_transaction():
+        assert len(fresh_db.query('mpileaks ^zmpi')) == 1
+
+    # The next write rewrites index.json and starts a new journal
+    with fresh_db.write_transaction():
+        fresh_db._remove(fresh_db.query_one('mpileaks ^zmpi'))
+    with open(fresh_db._index_path) as f:
+        assert json.load(f)['database']['journal'] == fresh_db._journal_id
+
+
+def test_upgrade_from_index_without_journal(mutable_database, monkeypatch):
+    _mock_remove('mpileaks ^zmpi')
+    expected = _record_state(mutable_database)
+
+    # Write index.json as a Spack using database version 5 would
+    with mutable_database.write_transaction():
+        mutable_database._journal_offset = 0
+    with open(mutable_database._index_path) as f:
+        index = json.load(f)
+    del index['database']['journal']
+    index['database']['version'] = '5'
+    with open(mutable_database._index_path, 'w') as f:
+        json.dump(index, f)
+
+    def fail_reindex(*args, **kwargs):
+        raise AssertionError('upgrading from version 5 must not reindex')
+
+    monkeypatch.setattr(spack.database.Database, 'reindex', fail_reindex)
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert _record_state(fresh_db) == expected
+
+    with fresh_db.write_transaction():
+        pass
+    with open(fresh_db._index_path) as f:
+        assert json.load(f)['database']['version'] == '6'
+
+
+def test_newer_database_version_is_refused(mutable_database):
+    with open(mutable_database._index_path) as f:
+        index = json.load(f)
+    index['database']['version'] = '7'
+    with open(mutable_database._index_path, 'w') as f:
+        json.dump(index, f)
+
+    fresh_db = spack.database.Database(mutable_database.root)
+    with pytest.raises(spack.database.InvalidDatabaseVersionError):
+        with fresh_db.read_transaction():
+            pass
+
+
+def test_specs_are_read_lazily(database):
+    fresh_db = spack.database.Database(database.root)
+    with fresh_db.read_transaction():
+        assert all(rec._spec is None for rec in fresh_db._data.values())
+
+        mpileaks = fresh_db.query_one('mpileaks ^zmpi')
+        read = set(key for key, rec in fresh_db._data.items()
+                   if rec._spec is not None)
+
+    # Only mpileaks records and their dependencies were read
+    expected = set(s.dag_hash() for s in fresh_db._data.values()
+                   if s.name == 'mpileaks' for s in s.spec.traverse())
+    assert mpileaks.dag_hash() in read
+    assert read == expected
+
+    # Specs read lazily are the same as the ones read by the fixture
+    for key in read:
+        spec = database.get_by_hash(key)[0]
+        assert fresh_db._data[key].spec == spec
+        assert fresh_db._data[key].spec.dependencies() == spec.dependencies()
+
+
+def test_unread_records_are_written_unchanged(database):
+    fresh_db = spack.database.Database(database.root)
+    with fresh_db.read_transaction():
+        for key, rec in fresh_db._data.items():
+            unread = rec.to_dict()
+            rec.spec
+            assert unread == rec.to_dict()
+
+
+def test_install_record_map_indexes_names(database):
+    with database.read_transaction():
+        records = spack.database.InstallRecordMap(database._data)
+    mpileaks = set(records.hashes_for_name('mpileaks'))
+    assert len(mpileaks) == 3
+
+    removed = mpileaks.pop()
+    del records[removed]
+    assert set(records.hashes_for_name('mpileaks')) == mpileaks
+
+    records.pop(mpileaks.pop())
+    assert set(records.hashes_for_name('mpileaks')) == mpileaks
+
+    records[removed] = database.query_by_spec_hash(removed)[1]
+    assert removed in records.hashes_for_name('mpileaks')
+    assert records.hashes_for_name('not-a-package') == ()
+
+    records.clear()
+    assert records.hashes_for_name('mpileaks') == ()
+
+
+@pytest.mark.parametrize('query', [
+    'mpileaks', 'mpileaks@2.3', 'mpileaks@:1', 'mpileaks ^zmpi', 'mpi',
+    '%gcc', '%gcc@4.5.0', '%clang', 'arch=test-debian6-x86_64',
+    'target=x86_64', 'target=x86_64:', 'libelf@0.8.13%gcc', 'dyninst ^mpich',
+    'externaltool', '^mpich2',
+])
+def test_indexed_query_matches_full_scan(database, query):
+    with database.read_transaction():
+        expected = sorted(
+            rec.spec for rec in database._data.values()
+            if rec.spec.satisfies(query, strict=True))
+        candidates = database._data.candidates(spack.spec.Spec(query))
+        assert all(s.dag_hash() in candidates for s in expected)
+
+    assert database.query(query, installed=any) == expected
+
+
+def test_candidates_are_pruned(database):
+    with database.read_transaction():
+        records = database._data
+        mpileaks = records.hashes_for_name('mpileaks')
+        assert len(mpileaks) == 3
+        assert records.candidates(spack.spec.Spec('mpileaks')) == mpileaks
+        assert not records.candidates(spack.spec.Spec('mpileaks@:1'))
+        assert not records.candidates(spack.spec.Spec('%clang'))
+
+        # Virtual packages are resolved by checking the specs
+        assert set(records.candidates(spack.spec.Spec('mpi'))) == set(records)
+
+
+def test_dependents_index(database):
+    with database.read_transaction():
+        for key, rec in database._data.items():
+            dependencies = set(
+                d.dag_hash() for d in rec.spec.dependencies())
+            assert set(database._data.dependencies_of(key)) == dependencies
+            for dependency in dependencies:
+                assert key in database._data.dependents_of(dependency)
+
+
+def test_installed_relatives_with_unread_specs(database):
+    libelf = database.query_one('libelf')
+    expected = database.installed_relatives(libelf, 'parents')
+
+    fresh_db = spack.database.Database(database.root)
+    libelf = fresh_db.query_one('libelf')
+    dependents = fresh_db.installed_relatives(libelf, 'parents')
+    assert (sorted(s.dag_hash() for s in dependents) ==
+            sorted(s.dag_hash() for s in expected))
+
+    direct = fresh_db.installed_relatives(libelf, 'parents', transitive=False)
+    assert sorted(s.name for s in direct) == ['dyninst', 'libdwarf']
+
+
+def test_update_explicit_is_journaled(mutable_database):
+    rec = mutable_database.get_record('callpath ^mpich')
+    assert not rec.explicit
+
+    mutable_database.update_explicit(rec.spec, True)
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert fresh_db.get_record('callpath ^mpich').explicit
+    assert _record_state(fresh_db) == _record_state(mutable_database)
+
+    mutable_database.update_explicit(rec.spec, False)
+    fresh_db = spack.database.Database(mutable_database.root)
+    assert not fresh_db.get_record('callpath ^mpich').explicit
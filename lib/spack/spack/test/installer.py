@@ -6,19 +6,24 @@
 import os
 import py
 import pytest
+import time
 
 import llnl.util.filesystem as fs
 import llnl.util.tty as tty
 import llnl.util.lock as ulk
 
 import spack.binary_distribution
+import spack.build_environment
 import spack.compilers
+import spack.config
 import spack.directory_layout as dl
 import spack.installer as inst
+import spack.mirror
 import spack.package_prefs as prefs
 import spack.repo
 import spack.spec
 import spack.store
+import spack.util.jobserver
 import spack.util.lock as lk
 
 
@@ -950,3 +955,293 @@ def test_install_skip_patch(install_mockery, mock_fetch):
     installer.install(fake=False, skip_patch=True)
 
     assert 'b' in installer.installed
+
+
+def test_jobs_per_package(install_mockery, mutable_config, monkeypatch):
+    """Test the build jobs are divided between the concurrent builds."""
+    monkeypatch.setattr(inst.multiprocessing, 'cpu_count', lambda: 64)
+    spack.config.set('config:build_jobs', 16)
+    spec, installer = create_installer('b')
+
+    installer.concurrent_packages = 4
+    assert installer._jobs_per_package() == 4
+
+    installer.concurrent_packages = 32
+    assert installer._jobs_per_package() == 1
+
+
+def _record_building(monkeypatch):
+    """Record the builds running whenever the installer waits for one."""
+    orig_fn = inst.PackageInstaller._complete_builds
+    building = []
+
+    def _complete(installer, keep_prefix, fail_fast, jobserver=None):
+        building.append(set(installer.building))
+        return orig_fn(installer, keep_prefix, fail_fast, jobserver)
+
+    monkeypatch.setattr(inst.PackageInstaller, '_complete_builds', _complete)
+    return building
+
+
+def test_install_concurrent_packages(install_mockery, mutable_config,
+                                     monkeypatch, tmpdir):
+    """Test independent dependencies are built at the same time."""
+    monkeypatch.setattr(inst.multiprocessing, 'cpu_count', lambda: 4)
+    spack.config.set('config:build_jobs', 4)
+    spack.config.set('config:module_roots:tcl', str(tmpdir))
+    building = _record_building(monkeypatch)
+
+    spec, installer = create_installer('mpileaks')
+    installer.install(fake=True, concurrent_packages=2)
+
+    assert all(len(ids) <= 2 for ids in building)
+    assert any(len(ids) == 2 for ids in building)
+    assert not installer.building
+    assert installer.jobserver is None
+    for s in spec.traverse():
+        assert s.package.installed
+
+
+def test_install_concurrent_jobserver(install_mockery, mutable_config,
+                                      monkeypatch, tmpdir):
+    """Test concurrent builds do not run more jobs than the jobserver has."""
+    monkeypatch.setattr(inst.multiprocessing, 'cpu_count', lambda: 4)
+    spack.config.set('config:build_jobs', 1)
+    spack.config.set('config:module_roots:tcl', str(tmpdir))
+    building = _record_building(monkeypatch)
+
+    spec, installer = create_installer('mpileaks')
+    installer.install(fake=True, concurrent_packages=4)
+
+    assert building
+    assert all(len(ids) <= 1 for ids in building)
+    for s in spec.traverse():
+        assert s.package.installed
+
+
+@pytest.mark.parametrize('command_line,shared', [(False, True),
+                                                 (True, False)])
+def test_open_jobserver_shared(install_mockery, mutable_config, monkeypatch,
+                               command_line, shared):
+    """Test the shared jobserver is skipped when -j is given."""
+    spack.config.set('config:jobserver', True)
+    monkeypatch.delenv('MAKEFLAGS', raising=False)
+    if command_line:
+        spack.config.config.push_scope(spack.config.InternalConfigScope(
+            'command_line', {'config': {'build_jobs': 2}}))
+
+    opened = []
+    monkeypatch.setattr(spack.util.jobserver.Jobserver, 'shared',
+                        classmethod(lambda cls, jobs: opened.append(jobs)))
+
+    spec, installer = create_installer('b')
+    installer.concurrent_packages = 2
+    installer._open_jobserver()
+    try:
+        assert bool(opened) == shared
+        assert installer.jobserver is not None
+    finally:
+        installer._close_jobserver()
+        if command_line:
+            spack.config.config.pop_scope()
+
+
+def test_install_concurrent_fail_fast(install_mockery, mutable_config,
+                                      monkeypatch, capfd):
+    """Test builds still running are stopped when failing fast."""
+    monkeypatch.setattr(inst.multiprocessing, 'cpu_count', lambda: 4)
+    spack.config.set('config:build_jobs', 4)
+    started = []
+
+    def _install(installer, task, **kwargs):
+        # Keep the first build running and fail to start the second one
+        if started:
+            raise RuntimeError('mock build failure')
+        started.append(task.pkg_id)
+        return spack.build_environment.start_build_process(
+            task.pkg, lambda: time.sleep(60), False, True,
+            forward_input=False)
+
+    monkeypatch.setattr(
+        inst.PackageInstaller, '_start_install_task', _install)
+
+    spec, installer = create_installer('mpileaks')
+    with pytest.raises(inst.InstallError, match='mock build failure'):
+        installer.install(fail_fast=True, concurrent_packages=4)
+
+    assert not installer.building
+    err = capfd.readouterr()[1]
+    assert 'Terminating the build of {0}'.format(started[0]) in err
+
+
+def _mock_binary_cache(monkeypatch, tmpdir, names):
+    """Serve tarballs of the named packages from a mock binary cache, whose
+    extraction records the process extracting them."""
+    def _download(spec):
+        if spec.name in names:
+            return str(tmpdir.join(spec.name + '.spack'))
+        return None
+
+    def _extract(spec, filename, **kwargs):
+        assert filename == str(tmpdir.join(spec.name + '.spack'))
+        spack.store.layout.create_install_directory(spec)
+        with open(os.path.join(spec.prefix, 'pid'), 'w') as f:
+            f.write(str(os.getpid()))
+
+    monkeypatch.setattr(spack.mirror, 'MirrorCollection',
+                        lambda: {'mirror': None})
+    monkeypatch.setattr(spack.binary_distribution, 'get_spec',
+                        lambda *args, **kwargs: {})
+    monkeypatch.setattr(spack.binary_distribution, 'download_tarball',
+                        _download)
+    monkeypatch.setattr(spack.binary_distribution, 'extract_tarball',
+                        _extract)
+
+
+def test_prefetch_binaries(install_mockery, monkeypatch, tmpdir):
+    """Test the binary cache tarballs of all packages are downloaded."""
+    _mock_binary_cache(monkeypatch, tmpdir, ['callpath', 'dyninst'])
+    spec, installer = create_installer('mpileaks')
+    installer._init_queue(True, True)
+
+    try:
+        installer._prefetch_binaries()
+        assert set(installer.binaries) == set(installer.build_tasks)
+
+        tarballs = dict((pkg_id, installer._prefetched_binary(pkg_id))
+                        for pkg_id in installer.build_tasks)
+        assert tarballs[inst.package_id(spec['callpath'].package)] == \
+            str(tmpdir.join('callpath.spack'))
+        assert tarballs[inst.package_id(spec.package)] is None
+        assert not installer.binaries
+    finally:
+        installer._close_downloaders()
+    assert not installer.downloaders
+
+
+def test_prefetch_binaries_in_queue_order(install_mockery, monkeypatch,
+                                          tmpdir):
+    """Test the binary cache tarballs are downloaded in the order the
+    packages are installed."""
+    _mock_binary_cache(monkeypatch, tmpdir, [])
+    monkeypatch.setattr(inst, '_max_binary_downloads', 1)
+    spec, installer = create_installer('mpileaks')
+    installer._init_queue(True, True)
+
+    try:
+        installer._prefetch_binaries()
+        pkg_ids = installer.downloaders[0].pkg_ids
+        assert pkg_ids == [task.pkg_id for task in installer._queued_tasks()]
+        assert pkg_ids[-1] == inst.package_id(spec.package)
+    finally:
+        installer._close_downloaders()
+
+
+def test_install_while_downloading(install_mockery, mutable_config,
+                                   monkeypatch, tmpdir):
+    """Test packages whose downloads are done are installed while the
+    downloads of others are not."""
+    spack.config.set('config:module_roots:tcl', str(tmpdir))
+    _mock_binary_cache(monkeypatch, tmpdir, ['libelf', 'mpich'])
+    monkeypatch.setattr(inst, '_max_binary_downloads', 16)
+
+    # The first package of the queue cannot be downloaded before the
+    # second one is installed
+    spec, installer = create_installer('mpileaks')
+    installer._init_queue(True, True)
+    first, second = [task.pkg.spec for task in installer._queued_tasks()[:2]]
+
+    def _download(s):
+        if s.name == first.name:
+            for _ in range(200):
+                if os.path.isdir(second.prefix):
+                    return str(tmpdir.join(s.name + '.spack'))
+                time.sleep(0.1)
+            return None
+        return str(tmpdir.join(s.name + '.spack'))
+
+    monkeypatch.setattr(spack.binary_distribution, 'download_tarball',
+                        _download)
+
+    spec, installer = create_installer('mpileaks')
+    installer.install(fake=True)
+    assert spec[first.name].package.installed_from_binary_cache
+    assert spec[second.name].package.installed_from_binary_cache
+    assert not installer.deferred
+
+
+def test_prefetch_sources(install_mockery, mock_fetch):
+    """Test the sources of all packages are fetched into their stages."""
+    spec, installer = create_installer('mpileaks')
+    installer._init_queue(True, True)
+
+    with spack.config.override('config:checksum', False):
+        try:
+            installer._prefetch_sources(False)
+            assert set(installer.sources) == set(installer.build_tasks)
+
+            for pkg_id, task in installer.build_tasks.items():
+                assert installer._prefetched_source(pkg_id)
+                assert os.path.isfile(task.pkg.stage.archive_file)
+                task.pkg.stage.destroy()
+            assert not installer.sources
+        finally:
+            installer._close_downloaders()
+    assert not installer.downloaders
+
+
+def test_prefetched_sources_not_built_are_removed(install_mockery,
+                                                  mock_fetch):
+    """Test the stages of packages whose sources were fetched ahead of time
+    are removed if the packages are not built."""
+    spec, installer = create_installer('mpileaks')
+    installer._init_queue(True, True)
+
+    with spack.config.override('config:checksum', False):
+        installer._prefetch_sources(False)
+        assert installer.sources
+        installer._close_downloaders()
+
+    assert not installer.sources
+    for task in installer.build_tasks.values():
+        assert not os.path.exists(task.pkg.stage.path)
+
+
+def test_prefetch_sources_skips_existing_stages(install_mockery, mock_fetch):
+    """Test packages whose stage already exists are not fetched again."""
+    spec, installer = create_installer('trivial-install-test-package')
+    installer._init_queue(True, True)
+    spec.package.stage.create()
+
+    try:
+        installer._prefetch_sources(False)
+        assert not installer.sources
+        assert not installer.downloaders
+    finally:
+        spec.package.stage.destroy()
+
+
+@pytest.mark.parametrize('concurrent_packages', [1, 2])
+def test_install_prefetched_binaries(install_mockery, mutable_config,
+                                     monkeypatch, tmpdir,
+                                     concurrent_packages):
+    """Test prefetched binaries are installed, in child processes if
+    packages are installed at the same time."""
+    monkeypatch.setattr(inst.multiprocessing, 'cpu_count', lambda: 4)
+    spack.config.set('config:build_jobs', 4)
+    spack.config.set('config:module_roots:tcl', str(tmpdir))
+    binaries = ['callpath', 'dyninst', 'libdwarf', 'libelf']
+    _mock_binary_cache(monkeypatch, tmpdir, binaries)
+
+    spec, installer = create_installer('mpileaks')
+    installer.install(fake=True, concurrent_packages=concurrent_packages)
+
+    assert not installer.downloaders
+    for s in spec.traverse():
+        assert s.package.installed
+        assert s.package.installed_from_binary_cache == (s.name in binaries)
+
+    for name in binaries:
+        with open(os.path.join(spec[name].prefix, 'pid')) as f:
+            in_child = int(f.read()) != os.getpid()
+        assert in_child == (concurrent_packages > 1)
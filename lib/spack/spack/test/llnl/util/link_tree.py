@@ -7,7 +7,7 @@
 
 import pytest
 from llnl.util.filesystem import working_dir, mkdirp, touchp
-from llnl.util.link_tree import LinkTree
+from llnl.util.link_tree import LinkTree, LinkQueue
 from spack.stage import Stage
 
 
@@ -166,3 +166,39 @@ def test_ignore(stage, link_tree):
 
         assert os.path.isfile('source/.spec')
         assert os.path.isfile('dest/.spec')
+
+
+def test_merge_in_parallel(stage, link_tree):
+    with working_dir(stage.path):
+        link_tree.merge('dest', threads=4)
+
+        check_file_link('dest/1',       'source/1')
+        check_file_link('dest/a/b/2',   'source/a/b/2')
+        check_file_link('dest/a/b/3',   'source/a/b/3')
+        check_file_link('dest/c/4',     'source/c/4')
+        check_file_link('dest/c/d/5',   'source/c/d/5')
+        check_file_link('dest/c/d/6',   'source/c/d/6')
+        check_file_link('dest/c/d/e/7', 'source/c/d/e/7')
+
+
+def test_link_queue_skips_queued_destinations(stage):
+    with working_dir(stage.path):
+        with LinkQueue(threads=4) as queue:
+            queue.link('source/1', 'dest-1')
+            queue.link('source/c/4', 'dest-1')
+            assert queue.queued('dest-1')
+
+        check_file_link('dest-1', 'source/1')
+
+
+def test_link_queue_raises_link_errors(stage):
+    def link(src, dst):
+        if src.endswith('4'):
+            raise OSError('cannot link %s' % src)
+        os.symlink(src, dst)
+
+    with working_dir(stage.path):
+        with pytest.raises(OSError, match='cannot link'):
+            with LinkQueue(link, threads=4) as queue:
+                for src in ('source/1', 'source/c/4', 'source/a/b/2'):
+                    queue.link(os.path.abspath(src), src.replace('/', '-'))
@@ -10,11 +10,13 @@
 """
 import os
 import shutil
+import sys
 import tempfile
 import unittest
 
 from spack.build_environment import MakeExecutable
 from spack.util.environment import path_put_first
+from spack.util.jobserver import Jobserver
 
 
 class MakeExecutableTest(unittest.TestCase):
@@ -110,3 +112,45 @@ def test_make_jobs_env(self):
         self.assertEqual(make(output=str, jobs_env='MAKE_PARALLELISM',
                               _dump_env=dump_env).strip(), '-j8')
         self.assertEqual(dump_env['MAKE_PARALLELISM'], '8')
+
+    def test_make_jobserver(self):
+        jobserver = Jobserver.create(8)
+        try:
+            make = MakeExecutable('make', 8, jobserver)
+            dump_env = {}
+            self.assertEqual(make('install', output=str,
+                                  _dump_env=dump_env).strip(), 'install')
+            self.assertEqual(dump_env['MAKEFLAGS'], jobserver.makeflags)
+
+            dump_env = {}
+            self.assertEqual(make('install', parallel=False, output=str,
+                                  _dump_env=dump_env).strip(), 'install')
+            self.assertEqual(dump_env['MAKEFLAGS'], '')
+        finally:
+            jobserver.close()
+
+    def test_make_jobserver_descriptors(self):
+        jobserver = Jobserver.create(2)
+        try:
+            # The pool gets a token from make through its descriptors
+            make_exe = os.path.join(self.tmpdir, 'make')
+            with open(make_exe, 'w') as f:
+                f.write('#!/bin/sh\n')
+                f.write("exec '{0}' -c 'import os; os.write({1}, b\"+\")'"
+                        .format(sys.executable, jobserver.write_fd))
+            MakeExecutable('make', 2, jobserver)()
+            self.assertTrue(jobserver.try_acquire())
+            self.assertTrue(jobserver.try_acquire())
+        finally:
+            jobserver.close()
+
+    def test_make_jobserver_one_job(self):
+        jobserver = Jobserver.create(1)
+        try:
+            make = MakeExecutable('make', 1, jobserver)
+            dump_env = {}
+            self.assertEqual(make(output=str,
+                                  _dump_env=dump_env).strip(), '')
+            self.assertEqual(dump_env['MAKEFLAGS'], jobserver.makeflags)
+        finally:
+            jobserver.close()
@@ -9,6 +9,7 @@
 
 import spack.repo
 import spack.mirror
+import spack.spec
 import spack.util.executable
 from spack.spec import Spec
 from spack.stage import Stage
@@ -47,7 +48,7 @@ def set_up_package(name, repository, url_attr):
     pkg.versions[v][url_attr] = repository.url
 
 
-def check_mirror():
+def check_mirror(jobs=1):
     with Stage('spack-mirror-test') as stage:
         mirror_root = os.path.join(stage.path, 'test-mirror')
         # register mirror with spack config
@@ -55,7 +56,7 @@ def check_mirror():
         with spack.config.override('mirrors', mirrors):
             with spack.config.override('config:checksum', False):
                 specs = [Spec(x).concretized() for x in repos]
-                spack.mirror.create(mirror_root, specs)
+                spack.mirror.create(mirror_root, specs, jobs=jobs)
 
             # Stage directory exists
             assert os.path.isdir(mirror_root)
@@ -106,6 +107,13 @@ def test_url_mirror(mock_archive):
     repos.clear()
 
 
+def test_url_mirror_in_parallel(mock_archive):
+    set_up_package('trivial-install-test-package', mock_archive, 'url')
+    set_up_package('c', mock_archive, 'url')
+    check_mirror(jobs=2)
+    repos.clear()
+
+
 @pytest.mark.skipif(
     not which('git'), reason='requires git to be installed')
 def test_git_mirror(mock_git_repository):
@@ -224,3 +232,94 @@ def test_mirror_cache_symlinks(tmpdir):
     assert os.path.exists(link_target)
     assert (os.path.normpath(link_target) ==
             os.path.join(cache.root, reference.storage_path))
+
+
+class FailingFetcher(object):
+    """Mock fetcher object which fails after writing part of its archive"""
+    @staticmethod
+    def archive(dst):
+        with open(dst, 'w') as f:
+            f.write('partial')
+        raise spack.fetch_strategy.FetchError('interrupted')
+
+
+def test_mirror_cache_store_leaves_no_partial_archive(tmpdir):
+    cache = spack.caches.MirrorCache(str(tmpdir), False)
+    storage_path = '_source-cache/archive/c3/c3e5.tar.gz'
+
+    with pytest.raises(spack.fetch_strategy.FetchError):
+        cache.store(FailingFetcher(), storage_path)
+    assert not os.listdir(os.path.join(cache.root, os.path.dirname(
+        storage_path)))
+
+    cache.store(MockFetcher(), storage_path)
+    assert os.listdir(os.path.join(cache.root, os.path.dirname(
+        storage_path))) == ['c3e5.tar.gz']
+
+
+class MockMirrorStage(object):
+    """Mock stage object with the attributes mirror downloads need"""
+    def __init__(self, storage_path):
+        self.mirror_paths = spack.mirror.MirrorReference(
+            'cosmetic/' + os.path.basename(storage_path), storage_path)
+        self.default_fetcher = spack.fetch_strategy.URLFetchStrategy(
+            'https://example.com/' + os.path.basename(storage_path))
+
+
+def test_shared_mirror_downloads_are_fetched_once(tmpdir, monkeypatch):
+    shared = '_source-cache/archive/ab/abcd.patch'
+    downloads = spack.mirror._merge_downloads([
+        spack.mirror._MirrorDownload(MockMirrorStage(shared), 'a'),
+        spack.mirror._MirrorDownload(MockMirrorStage(shared), 'b'),
+        spack.mirror._MirrorDownload(
+            MockMirrorStage('_source-cache/archive/ef/ef01.tar.gz'), 'b'),
+    ])
+    assert [d.specs for d in downloads] == [['a', 'b'], ['b']]
+    assert all(d.host == 'example.com' for d in downloads)
+
+    fetched = []
+
+    def mock_cache_download(index, mirror):
+        fetched.append(index)
+        return 'added', None
+
+    monkeypatch.setattr(
+        spack.mirror, '_cache_download', mock_cache_download)
+    mirror_stats = spack.mirror.MirrorStats()
+    spack.mirror._run_downloads(
+        downloads, spack.caches.MirrorCache(str(tmpdir), False),
+        mirror_stats, jobs=1, jobs_per_host=1)
+
+    assert fetched == [0, 1]
+    present, new, errors = mirror_stats.stats()
+    assert sorted(new) == ['a', 'b']
+    assert present == ['b']
+    assert not errors
+
+
+def failing_cache_download(index, mirror):
+    """Download of a mirror that fails in the worker process, outside of
+    the handling of fetch errors."""
+    if index == 1:
+        raise RuntimeError('worker failure')
+    return 'added', None
+
+
+def test_failing_parallel_downloads_are_errors(tmpdir, monkeypatch):
+    downloads = spack.mirror._merge_downloads([
+        spack.mirror._MirrorDownload(
+            MockMirrorStage('_source-cache/archive/%s.tar.gz' % name),
+            spack.spec.Spec(name))
+        for name in ('a', 'b', 'c')])
+
+    monkeypatch.setattr(
+        spack.mirror, '_cache_download', failing_cache_download)
+    monkeypatch.setattr(spack.mirror, '_download_poll_interval', 0.01)
+    mirror_stats = spack.mirror.MirrorStats()
+    spack.mirror._run_downloads(
+        downloads, spack.caches.MirrorCache(str(tmpdir), False),
+        mirror_stats, jobs=2, jobs_per_host=2)
+
+    present, new, errors = mirror_stats.stats()
+    assert sorted(s.name for s in new) == ['a', 'c']
+    assert [s.name for s in errors] == ['b']
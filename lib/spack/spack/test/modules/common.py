@@ -77,6 +77,32 @@ def test_modules_written_with_proper_permissions(mock_module_filename,
         mock_module_filename).st_mode == mock_package_perms
 
 
+def test_unchanged_module_files_are_not_rewritten(mock_module_filename,
+                                                  mock_packages, config,
+                                                  tmpdir):
+    spec = spack.spec.Spec('mpileaks').concretized()
+    writers = [spack.modules.tcl.TclModulefileWriter(spec)]
+    root = str(tmpdir)
+
+    content_hashes = spack.modules.common.write_module_files(root, writers)
+    assert list(content_hashes) == [spec.dag_hash()]
+    spack.modules.common.generate_module_index(
+        root, writers, content_hashes=content_hashes)
+    with open(mock_module_filename, 'a') as f:
+        f.write('# not rewritten')
+
+    # The module file is the same as in the index, and is left alone
+    assert spack.modules.common.write_module_files(
+        root, writers) == content_hashes
+    with open(mock_module_filename) as f:
+        assert f.read().endswith('# not rewritten')
+
+    # Unless module files are overwritten
+    spack.modules.common.write_module_files(root, writers, overwrite=True)
+    with open(mock_module_filename) as f:
+        assert not f.read().endswith('# not rewritten')
+
+
 class MockDb(object):
     def __init__(self, db_ids, spec_hash_to_db):
         self.upstream_dbs = db_ids
@@ -13,6 +13,9 @@
 import argparse
 import re
 import platform
+import hashlib
+import tarfile
+from contextlib import closing
 
 from llnl.util.filesystem import mkdirp
 
@@ -20,6 +23,7 @@
 import spack.store
 import spack.binary_distribution as bindist
 import spack.cmd.buildcache as buildcache
+import spack.util.spack_yaml as syaml
 from spack.spec import Spec
 from spack.paths import mock_gpg_keys_path
 from spack.fetch_strategy import URLFetchStrategy, FetchStrategyComposite
@@ -194,6 +198,7 @@ def test_buildcache(mock_archive, tmpdir):
 
     # Remove cached binary specs since we deleted the mirror
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
 
 
 @pytest.mark.usefixtures('install_mockery')
@@ -219,6 +224,7 @@ def test_relocate_text(tmpdir):
         assert(file_is_relocatable(os.path.realpath(filename)))
     # Remove cached binary specs since we deleted the mirror
     bindist._cached_specs = set()
+    bindist.binary_index.clear()
 
 
 def test_relocate_links(tmpdir):
@@ -560,3 +566,59 @@ def test_macho_make_paths():
                    '/Users/Shared/spack/pkgB/libB.dylib',
                    '/usr/local/lib/libloco.dylib':
                    '/usr/local/lib/libloco.dylib'}
+
+
+def _write_spackfile(spec, stage_dir, prefix_dir, checksum=None):
+    """Writes the .spack file of a spec, with the tarball of prefix_dir and
+    an unsigned spec file recording checksum, or the one of the tarball."""
+    tarfile_path = os.path.join(
+        stage_dir, bindist.tarball_name(spec, '.tar.gz'))
+    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
+        tar.add(prefix_dir, arcname=os.path.basename(spec.prefix))
+    with open(tarfile_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    specfile_path = os.path.join(
+        stage_dir, bindist.tarball_name(spec, '.spec.yaml'))
+    with open(specfile_path, 'w') as f:
+        f.write(syaml.dump({'binary_cache_checksum': {
+            'hash_algorithm': 'sha256', 'hash': checksum or digest}}))
+
+    spackfile_path = os.path.join(
+        stage_dir, bindist.tarball_name(spec, '.spack'))
+    with closing(tarfile.open(spackfile_path, 'w')) as tar:
+        for path in (tarfile_path, specfile_path):
+            tar.add(path, arcname=os.path.basename(path))
+            os.remove(path)
+    return spackfile_path
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_extract_tarball_checks_checksum(tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    prefix_dir = tmpdir.ensure('prefix', dir=True)
+    prefix_dir.ensure('bin', 'exe')
+
+    spackfile_path = _write_spackfile(
+        spec, str(tmpdir), str(prefix_dir), checksum='0' * 64)
+    with pytest.raises(bindist.NoChecksumException):
+        bindist.extract_tarball(spec, spackfile_path, unsigned=True)
+    assert not os.path.exists(spec.prefix)
+
+
+def test_prefix_members_stay_in_prefix(tmpdir):
+    tarfile_path = str(tmpdir.join('prefix.tar'))
+    with closing(tarfile.open(tarfile_path, 'w')) as tar:
+        link = tarfile.TarInfo('prefix/lib')
+        link.type = tarfile.SYMTYPE
+        link.linkname = str(tmpdir)
+        tar.addfile(link)
+        tar.addfile(tarfile.TarInfo('prefix/lib/file'))
+
+    prefix = tmpdir.ensure('install', dir=True)
+    with closing(tarfile.open(tarfile_path, 'r|')) as tar:
+        with pytest.raises(bindist.NoChecksumException):
+            tar.extractall(str(prefix), bindist._prefix_members(
+                tar, str(prefix)))
+    assert os.path.islink(str(prefix.join('lib')))
+    assert not tmpdir.join('file').exists()
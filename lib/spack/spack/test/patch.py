@@ -88,6 +88,21 @@ def test_url_patch(mock_patch_stage, filename, sha256, archive_sha256):
             assert filecmp.cmp('foo.txt', 'foo-expected.txt')
 
 
+def test_url_patch_is_only_file_in_stage(mock_patch_stage):
+    """Ensure nothing else in the stage of an uncompressed patch can be taken
+    for the patch, e.g. a record of its digest."""
+    filename = os.path.join(data_path, 'foo.patch')
+    patch = spack.patch.UrlPatch(
+        spack.repo.get('patch'), 'file://' + filename,
+        sha256='252c0af58be3d90e5dc5e0d16658434c'
+               '9efa5d20a5df6c10bf72c2d77f780866')
+
+    patch.fetch()
+    assert os.listdir(patch.stage.path) == ['foo.patch']
+    assert patch.path == os.path.join(patch.stage.path, 'foo.patch')
+    patch.clean()
+
+
 def test_patch_in_spec(mock_packages, config):
     """Test whether patches in a package appear in the spec."""
     spec = Spec('patch')
@@ -18,6 +18,7 @@
 import spack.store
 import spack.tengine
 import spack.util.executable
+import spack.util.parallel
 
 
 def rpaths_for(new_binary):
@@ -276,7 +277,8 @@ def test_replace_prefix_bin(hello_world):
     executable = hello_world(rpaths=['/usr/lib', '/usr/lib64'])
 
     # Relocate the RPATHs
-    spack.relocate._replace_prefix_bin(str(executable), '/usr', '/foo')
+    spack.relocate._replace_prefix_bin(
+        str(executable), spack.relocate._PrefixRelocation({'/usr': '/foo'}))
 
     # Some compilers add rpaths so ensure changes included in final result
     assert '/foo/lib:/foo/lib64' in rpaths_for(executable)
@@ -381,3 +383,108 @@ def test_relocate_text_bin_raise_if_new_prefix_is_longer():
         spack.relocate.relocate_text_bin(
             ['item'], short_prefix, long_prefix, None, None, None
         )
+
+
+def test_trie_pattern_prefers_longest_prefix():
+    pattern = re.compile(spack.relocate._trie_pattern(
+        [b'/opt/a', b'/opt/ab', b'/opt/a/b', b'/usr']))
+    assert pattern.findall(b'/opt/ab /opt/a/b/c /opt/ax /usr/lib') == [
+        b'/opt/ab', b'/opt/a/b', b'/opt/a', b'/usr']
+
+
+def test_relocate_text_multiple_prefixes(tmpdir):
+    orig_root, new_root = '/orig/store', '/new/root'
+    prefixes = collections.OrderedDict([
+        ('/orig/store/foo-1.0', '/new/root/foo-1.0'),
+        ('/orig/store/foo-1.0-bar', '/new/root/foo-1.0-bar'),
+        ('/orig/store/baz', None),
+    ])
+    text = tmpdir.join('script.sh')
+    text.write('#!/bin/bash /orig/spack/bin/sbang\n'
+               '-I/orig/store/foo-1.0/include -L/orig/store/foo-1.0-bar/lib\n'
+               '/orig/store/baz/bin:/orig/store/qux\n'
+               '/home/orig/store/foo-1.0\n')
+    untouched = tmpdir.join('untouched.txt')
+    untouched.write('/orig/other\n')
+    mtime = untouched.mtime()
+
+    spack.relocate.relocate_text(
+        [str(text), str(untouched)], orig_root, new_root,
+        '/orig/store/foo-1.0', '/new/root/foo-1.0',
+        '/orig/spack', '/new/spack', prefixes)
+
+    assert text.read() == (
+        '#!/bin/bash /new/spack/bin/sbang\n'
+        '-I/new/root/foo-1.0/include -L/new/root/foo-1.0-bar/lib\n'
+        '/new/root/baz/bin:/new/root/qux\n'
+        '/home/orig/store/foo-1.0\n')
+    assert untouched.read() == '/orig/other\n'
+    assert untouched.mtime() == mtime
+
+
+def test_relocate_text_bin_multiple_prefixes(tmpdir):
+    binary = tmpdir.join('libfoo.so')
+    data = (b'\x7fELF\0/orig/store/foo-1.0/lib\0/orig/store/bar/lib:'
+            b'/orig/store/foo-1.0/lib64\0/orig/store/long\0')
+    binary.write_binary(data)
+
+    spack.relocate.relocate_text_bin(
+        [str(binary)], '/orig/store/foo-1.0', '/new/foo',
+        '/orig/spack', '/new/spack',
+        {'/orig/store/bar': '/b', '/orig/store/long': '/much/longer/path'})
+
+    foo = b'/' * (len('/orig/store/foo-1.0') - len('/new/foo')) + b'/new/foo'
+    bar = b'/' * (len('/orig/store/bar') - len('/b')) + b'/b'
+    assert binary.read_binary() == (
+        b'\x7fELF\0' + foo + b'/lib\0' + bar + b'/lib:' + foo +
+        b'/lib64\0/orig/store/long\0')
+
+
+def test_relocate_text_in_parallel(tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.relocate, '_min_files_per_process', 1)
+    monkeypatch.setattr(spack.util.parallel, 'num_processes',
+                        lambda max_processes=None: 2)
+    files = []
+    for i in range(4):
+        text = tmpdir.join('file-%d.txt' % i)
+        text.write('/orig/store/foo-%d/bin\n' % i)
+        files.append(str(text))
+
+    spack.relocate.relocate_text(
+        files, '/orig/store', '/new/root', '/orig/store/foo-0',
+        '/new/root/foo-0', '/spack', '/spack', {})
+
+    for i, name in enumerate(files):
+        with open(name) as f:
+            assert f.read() == '/new/root/foo-%d/bin\n' % i
+
+
+@pytest.mark.parametrize('mmap_min_size', [0, 1024 * 1024 * 1024])
+def test_replace_prefix_bin_in_place(tmpdir, monkeypatch, mmap_min_size):
+    monkeypatch.setattr(spack.relocate, '_mmap_min_size', mmap_min_size)
+    binary = tmpdir.join('libhuge.so')
+    chunk = b'\0' * (1024 * 1024)
+    with open(str(binary), 'wb') as f:
+        f.write(chunk + b'/orig/store/foo/lib\0' + chunk)
+        f.write(chunk + b'/orig/store/foo/lib64\0' + chunk)
+    empty = tmpdir.join('empty.so')
+    empty.write_binary(b'')
+
+    relocation = spack.relocate._PrefixRelocation({'/orig/store/foo': '/foo'})
+    spack.relocate._replace_prefix_bin(str(binary), relocation)
+    spack.relocate._replace_prefix_bin(str(empty), relocation)
+
+    new = b'/' * (len('/orig/store/foo') - len('/foo')) + b'/foo'
+    assert binary.read_binary() == (
+        chunk + new + b'/lib\0' + chunk + chunk + new + b'/lib64\0' + chunk)
+    assert empty.read_binary() == b''
+
+
+def test_replace_prefix_bin_raise_if_new_prefix_is_longer(tmpdir):
+    binary = tmpdir.join('libfoo.so')
+    binary.write_binary(b'\0/short/lib\0')
+
+    relocation = spack.relocate._PrefixRelocation({'/short': '/much/longer'})
+    with pytest.raises(spack.relocate.BinaryStringReplacementError):
+        spack.relocate._replace_prefix_bin(str(binary), relocation)
+    assert binary.read_binary() == b'\0/short/lib\0'
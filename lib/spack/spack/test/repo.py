@@ -3,11 +3,18 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import collections
 import os
+import time
+
 import pytest
 
+import spack.caches
+import spack.metadata_index
 import spack.repo
 import spack.paths
+import spack.util.file_cache
+import spack.util.parallel
 
 
 @pytest.fixture()
@@ -67,3 +74,116 @@ def test_repo_invisibles(mutable_mock_repo, extra_repo):
     with open(os.path.join(extra_repo.root, 'packages', '.invisible'), 'w'):
         pass
     extra_repo.all_package_names()
+
+
+def test_repo_metadata(mock_packages):
+    mpileaks = spack.repo.path.get_metadata('mpileaks')
+    pkg = spack.repo.get('mpileaks')
+    assert mpileaks.fullname == 'builtin.mock.mpileaks'
+    assert mpileaks.versions == sorted(pkg.versions)
+    assert sorted(mpileaks.dependencies) == sorted(pkg.dependencies)
+    assert sorted(mpileaks.dependencies_of_type('link')) == sorted(
+        pkg.dependencies_of_type('link'))
+    assert mpileaks.variants['debug'] == {
+        'default': False, 'description': 'Debug variant'}
+
+    mpich = spack.repo.path.get_metadata('mpich')
+    assert mpich.provided['mpi@:3'] == ['mpich@3:']
+    assert mpich.homepage == 'http://www.mpich.org'
+
+    assert spack.repo.path.get_metadata('maintainers-1').maintainers == [
+        'user1', 'user2']
+
+    with pytest.raises(spack.repo.UnknownPackageError):
+        spack.repo.path.get_metadata('nonexistentpackage')
+
+
+def test_repo_metadata_does_not_import_packages(mock_packages):
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert repo.get_metadata('mpileaks').extendees == {}
+    assert len(list(repo.all_metadata())) == len(repo.all_package_names())
+    assert not repo._modules
+
+
+def test_repo_metadata_index_in_old_format_is_regenerated(
+        mock_packages, tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    index = tmpdir.ensure('metadata', 'builtin.mock-index.json')
+    index.write('{"metadata": {"version": 0, "packages": {}}}')
+
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert 'mpileaks' in repo.metadata_index
+    assert '"version": %d' % spack.metadata_index.format_version \
+        in index.read()
+
+
+def _use_misc_cache(monkeypatch, path):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(path)))
+
+
+def test_repo_reindex_in_parallel(
+        mock_packages, mutable_config, tmpdir, monkeypatch):
+    _use_misc_cache(monkeypatch, tmpdir.join('serial'))
+    serial = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert serial.index.reindex() == len(serial.all_package_names())
+
+    _use_misc_cache(monkeypatch, tmpdir.join('parallel'))
+    monkeypatch.setattr(spack.repo, '_min_packages_per_process', 1)
+    monkeypatch.setattr(spack.util.parallel.multiprocessing, 'cpu_count',
+                        lambda: 4)
+    mutable_config.set('config:build_jobs', 4)
+    parallel = spack.repo.Repo(spack.paths.mock_packages_path)
+    parallel.index.reindex()
+
+    assert parallel.provider_index == serial.provider_index
+    assert parallel.patch_index.index == serial.patch_index.index
+    assert dict(parallel.metadata_index._packages) == \
+        dict(serial.metadata_index._packages)
+    assert set(parallel.tag_index) == set(serial.tag_index)
+    for tag in serial.tag_index:
+        assert sorted(parallel.tag_index[tag]) == \
+            sorted(serial.tag_index[tag])
+
+    # The indexes written by the workers are read back as they are
+    parallel = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert parallel.index.reindex() == 0
+    assert parallel.provider_index == serial.provider_index
+
+
+def test_repo_reindex_changed_packages(mock_packages, tmpdir, monkeypatch):
+    _use_misc_cache(monkeypatch, tmpdir)
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    repo.index.reindex()
+
+    # Pretend a package file changed after the indexes were written
+    stats = repo._pkg_checker._packages_to_stats
+    monkeypatch.setitem(stats, 'mpileaks', collections.namedtuple(
+        'stat', ['st_mtime'])(time.time() + 3600))
+
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert repo.index.reindex() == 1
+    assert repo.tag_index == spack.repo.Repo(
+        spack.paths.mock_packages_path).tag_index
+    assert 'mpileaks' in repo.metadata_index
+    assert repo.index.reindex(force=True) == len(repo.all_package_names())
+
+
+def test_repo_packages_digest(extra_repo, monkeypatch):
+    packages = os.path.join(extra_repo.root, 'packages')
+    os.mkdir(os.path.join(packages, 'foo'))
+    package_py = os.path.join(packages, 'foo', 'package.py')
+    with open(package_py, 'w') as f:
+        f.write('# foo\n')
+
+    def digest():
+        monkeypatch.setattr(spack.repo.FastPackageChecker, '_paths_cache', {})
+        return spack.repo.Repo(extra_repo.root).packages_digest()
+
+    before = digest()
+    assert digest() == before
+
+    with open(package_py, 'a') as f:
+        f.write('# bar\n')
+    assert digest() != before
@@ -89,3 +89,38 @@ def test_yaml_aliases():
 
     # ensure no YAML aliases appear in syaml dumps.
     assert '*id' not in string
+
+
+@pytest.mark.parametrize('obj', [
+    {'mpileaks': {'version': '2.3', 'arch': {'platform': 'test'}}},
+    {'parameters': {'debug': True, 'shared': False, 'cflags': []}},
+    {'dependencies': {'mpich': {'hash': 'ijm6xlzene7rgn4wa4yelferavt6n5ku',
+                                'type': ['build', 'link']}}},
+    {'external': {'path': '/usr', 'module': None}, 'concrete': False},
+    {'patches': ['7e1234567890', '1234567890', '0x1f2a3b', 'abc123def']},
+    {'strings': ['true', 'yes', 'null', '~', '', ' x', 'a,b', 'a: b', '#x',
+                 '-O2', '*', '1:20', '2020-01-01', 'x' * 200, u'\xe9']},
+    {'': 1, 'x' * 130: 2, 'a b': 3, '1.0': 4},
+    {'multiline': 'a\nb'},
+    {'omap': syaml.OrderedDict([('b', 1), ('a', 2)])},
+    {'float': 3.5},
+    [1, -2, [], {}, ('a', 'b')],
+    'scalar',
+])
+def test_dump_flow(obj):
+    """dump_flow() writes the same text as ruamel"""
+    assert syaml.dump_flow(obj) == syaml.dump(obj, default_flow_style=True)
+
+
+def test_dump_flow_caches_are_bounded(monkeypatch):
+    """dump_flow() does not keep the text of every scalar it has seen"""
+    monkeypatch.setattr(syaml, '_flow_scalars', {})
+    monkeypatch.setattr(syaml, '_flow_keys', {})
+    monkeypatch.setattr(syaml, '_flow_cache_size', 4)
+
+    for i in range(10):
+        obj = {'key: %d' % i: ['value %d' % i]}
+        assert syaml.dump_flow(obj) == syaml.dump(
+            obj, default_flow_style=True)
+        assert len(syaml._flow_scalars) <= 4
+        assert len(syaml._flow_keys) <= 4
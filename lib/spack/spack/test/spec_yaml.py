@@ -9,6 +9,8 @@
 
 """
 import ast
+import base64
+import hashlib
 import inspect
 import os
 
@@ -321,3 +323,65 @@ def test_save_dependency_spec_yamls_subset(tmpdir, config):
 
         assert check_specs_equal(b_spec, os.path.join(output_path, 'b.yaml'))
         assert check_specs_equal(c_spec, os.path.join(output_path, 'c.yaml'))
+
+
+#: Hashes of specs computed when they were hashed by emitting their node
+#: dictionaries with ruamel.  They must not change, so that installations
+#: and build caches keep their hashes.
+golden_hashes = [
+    ('mpileaks', False,
+     'beerrxmmcaugiw3vlhzcje56i42sazhi', 'beerrxmmcaugiw3vlhzcje56i42sazhi'),
+    ('mpileaks@2.3 +debug', False,
+     'rd2aionemto624mbscdkdvbwogriu2on', 'rd2aionemto624mbscdkdvbwogriu2on'),
+    ('mpileaks ^mpich@3.0.4 %gcc@4.5.0', False,
+     '6gupgyhtot3qeni5op3v6cz277wzn2r7', '6gupgyhtot3qeni5op3v6cz277wzn2r7'),
+    ('libelf cflags="-O2 -g" arch=test-debian6-x86_64', False,
+     'q76nsrxglvaj7xwgugjuaggk6wxm562i', 'q76nsrxglvaj7xwgugjuaggk6wxm562i'),
+    ('multivalue-variant foo=bar,baz', False,
+     'duwa5zxlabohqua7woqqdhuah66jiang', 'duwa5zxlabohqua7woqqdhuah66jiang'),
+    ('mpileaks', True,
+     'b4ervofanrurvlocnwdcezqekdphknd6', 'b4ervofanrurvlocnwdcezqekdphknd6'),
+    ('mpileaks ^zmpi', True,
+     'xqeg3akn4qgkoio7fyclrsdavd5nmnup', 'xqeg3akn4qgkoio7fyclrsdavd5nmnup'),
+    ('dyninst', True,
+     'xvb3xy52riui7jyceawrf3v3p4k5m4qk', 'xvb3xy52riui7jyceawrf3v3p4k5m4qk'),
+    ('patch-several-dependencies', True,
+     'ijm6xlzene7rgn4wa4yelferavt6n5ku', 'ijm6xlzene7rgn4wa4yelferavt6n5ku'),
+    ('multivalue-variant foo=bar,baz', True,
+     '2is4agwwnfy6brb36cgnhe4rzlgsighx', '2is4agwwnfy6brb36cgnhe4rzlgsighx'),
+    ('libelf cppflags="-O3"', True,
+     'v5qd7zkgh7y7w4qhhx3ep5rm4wwjr5qm', 'v5qd7zkgh7y7w4qhhx3ep5rm4wwjr5qm'),
+    ('dt-diamond', True,
+     'anjlas2ya4oevzxfljpmllyu6xdl3snp', 'ilujqskux556szvkw733lfugezgkguas'),
+]
+
+
+@pytest.mark.parametrize('spec_str,concrete,dag_hash,build_hash',
+                         golden_hashes)
+def test_golden_hashes(config, mock_packages, spec_str, concrete, dag_hash,
+                       build_hash):
+    spec = Spec(spec_str)
+    if concrete:
+        spec.concretize()
+    assert spec.dag_hash() == dag_hash
+    assert spec.build_hash() == build_hash
+
+
+@pytest.mark.parametrize('hash', [ht.dag_hash, ht.build_hash, ht.full_hash])
+def test_hashes_match_ruamel_dump(config, mock_packages, hash):
+    """Spec hashes are the hashes of node dictionaries emitted by ruamel."""
+    specs = [(spec_str, concrete) for spec_str, concrete, _, _ in
+             golden_hashes] + [('externaltool', True)]
+    for spec_str, concrete in specs:
+        spec = Spec(spec_str)
+        if concrete:
+            spec.concretize()
+        elif hash.package_hash:
+            continue
+
+        for node in spec.traverse():
+            yaml_text = syaml.dump(
+                node.to_node_dict(hash=hash), default_flow_style=True)
+            sha = hashlib.sha1(yaml_text.encode('utf-8'))
+            b32_hash = base64.b32encode(sha.digest()).lower()
+            assert node._spec_hash(hash) == b32_hash.decode('utf-8')
@@ -89,3 +89,9 @@ def test_template_retrieval(self):
         template = env.get_template('b.txt')
         text = template.render({'word': 'world'})
         assert 'Howdy world!' == text
+
+    def test_environment_is_shared(self):
+        """Tests that templates are compiled once for the same directories"""
+        env = tengine.make_environment()
+        assert tengine.make_environment() is env
+        assert env.get_template('a.txt') is env.get_template('a.txt')
@@ -4,16 +4,19 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import collections
+import hashlib
 import os
 import pytest
 
 from llnl.util.filesystem import working_dir, is_exe
 
+import spack.caches
 import spack.repo
 import spack.config
 import spack.fetch_strategy as fs
 from spack.spec import Spec
 from spack.stage import Stage
+from spack.util.file_cache import FileCache
 from spack.version import ver
 import spack.util.crypto as crypto
 
@@ -204,3 +207,85 @@ def test_candidate_urls(pkg_factory, url, urls, version, expected):
     pkg = pkg_factory(url, urls, fetch_options={'timeout': 60})
     f = fs._from_merged_attrs(fs.URLFetchStrategy, pkg, version)
     assert f.extra_options == {'timeout': 60}
+
+
+@pytest.mark.parametrize('fetch_method', ['native', 'curl'])
+def test_fetch_over_http(mock_http_server, tmpdir, monkeypatch,
+                         fetch_method):
+    """Ensure archives are downloaded and checked with either method, and
+    that the native one computes their digest as they download."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        FileCache(str(tmpdir.join('cache'))))
+    data = b'archive contents' * 1000
+    mock_http_server.root.join('archive.tar.gz').write_binary(data)
+    digest = hashlib.sha256(data).hexdigest()
+
+    stages = []
+    with spack.config.override('config:url_fetch_method', fetch_method):
+        for i in range(2):
+            fetcher = fs.URLFetchStrategy(
+                mock_http_server.url + '/archive.tar.gz', sha256=digest)
+            stage = Stage(fetcher, path=str(tmpdir.join('stage-%d' % i)))
+            stage.create()
+            fetcher.fetch()
+            stages.append(stage)
+
+    with open(fetcher.archive_file, 'rb') as f:
+        assert f.read() == data
+    checksum = crypto.checksum
+    if fetch_method == 'native':
+        assert mock_http_server.connections == 1
+        monkeypatch.setattr(crypto, 'checksum', None)
+    fetcher.check()
+
+    # The archive is read again once it changes
+    with open(fetcher.archive_file, 'ab') as f:
+        f.write(b'changed')
+    monkeypatch.setattr(crypto, 'checksum', checksum)
+    with pytest.raises(fs.ChecksumError):
+        fetcher.check()
+
+    for stage in stages:
+        stage.destroy()
+
+
+def test_checked_digest_is_recorded(mock_archive, tmpdir, monkeypatch):
+    """Ensure archives are read once to check them, even with a new
+    fetcher, as in the process building a package after the one that
+    fetched it."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        FileCache(str(tmpdir.join('cache'))))
+    digest = crypto.checksum(hashlib.sha256, mock_archive.archive_file)
+    path = str(tmpdir.join('stage'))
+    with spack.config.override('config:url_fetch_method', 'curl'):
+        fetcher = fs.URLFetchStrategy(mock_archive.url, sha256=digest)
+        with Stage(fetcher, path=path, keep=True):
+            fetcher.fetch()
+            fetcher.check()
+
+            # The record is kept out of the stage
+            assert os.listdir(path) == [
+                os.path.basename(fetcher.archive_file)]
+
+    checksum = crypto.checksum
+    fetcher = fs.URLFetchStrategy(mock_archive.url, sha256=digest)
+    with Stage(fetcher, path=path):
+        monkeypatch.setattr(crypto, 'checksum', None)
+        fetcher.check()
+
+        # The archive is read again once it changes
+        monkeypatch.setattr(crypto, 'checksum', checksum)
+        with open(fetcher.archive_file, 'ab') as f:
+            f.write(b'changed')
+        with pytest.raises(fs.ChecksumError):
+            fetcher.check()
+
+
+def test_native_fetch_not_found(mock_http_server, tmpdir):
+    fetcher = fs.URLFetchStrategy(mock_http_server.url + '/missing.tar.gz')
+    with spack.config.override('config:url_fetch_method', 'native'):
+        with Stage(fetcher, path=str(tmpdir.join('stage'))) as stage:
+            stage.create()
+            with pytest.raises(fs.FailedDownloadError):
+                fetcher.fetch()
+            assert not os.listdir(stage.path)
@@ -35,3 +35,21 @@ def test_read_unicode(tmpdir, working_env):
         # read the unicode back in and see whether things work
         script = ex.Executable('./%s' % script_name)
         assert u'\xc3' == script(output=str).strip()
+
+
+def test_pass_fds():
+    read_fd, write_fd = os.pipe()
+    try:
+        if hasattr(os, 'set_inheritable'):
+            os.set_inheritable(write_fd, True)
+        python = ex.Executable(sys.executable)
+        write = 'import os; os.write({0}, b"+")'.format(write_fd)
+        python('-c', write, pass_fds=(write_fd,))
+        assert os.read(read_fd, 1) == b'+'
+
+        # Python 3 closes the descriptors that are not passed
+        python('-c', write, fail_on_error=False, error=os.devnull)
+        assert (python.returncode == 0) == (sys.version_info[0] < 3)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
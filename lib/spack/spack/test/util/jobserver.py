@@ -0,0 +1,116 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import multiprocessing
+import os
+import select
+
+import pytest
+
+from spack.util.jobserver import Jobserver
+
+
+@pytest.fixture()
+def jobserver():
+    jobserver = Jobserver.create(3)
+    yield jobserver
+    jobserver.close()
+
+
+def test_jobserver_acquire_release(jobserver):
+    assert jobserver.can_acquire
+    assert jobserver.try_acquire()
+    assert jobserver.try_acquire()
+    assert not jobserver.try_acquire()
+    assert len(jobserver.tokens) == 2
+
+    jobserver.release()
+    ready, _, _ = select.select([jobserver], [], [], 0)
+    assert ready == [jobserver]
+    assert jobserver.try_acquire()
+
+
+def test_jobserver_close(jobserver):
+    fifo = jobserver.fifo
+    assert jobserver.try_acquire()
+    jobserver.close()
+    assert not jobserver.tokens
+    assert not os.path.exists(os.path.dirname(fifo))
+
+
+@pytest.mark.parametrize('prefix', ['', ' -j4 --jobserver-fds=9999,9998 '])
+def test_jobserver_from_makeflags(jobserver, prefix):
+    inherited = Jobserver.from_makeflags(prefix + jobserver.makeflags)
+    assert (inherited.read_fd, inherited.write_fd) == (
+        jobserver.read_fd, jobserver.write_fd)
+    assert not inherited.owned
+
+    # Tokens taken through either are taken from the same pool
+    assert inherited.try_acquire()
+    assert jobserver.try_acquire()
+    assert not inherited.try_acquire()
+
+    # The descriptors of the pool stay open for their owner
+    inherited.close()
+    assert jobserver.try_acquire()
+
+
+@pytest.mark.parametrize('makeflags', [
+    '',
+    '-j4',
+    ' --jobserver-auth=9999,9998',
+    ' --jobserver-auth=fifo:/nonexistent/jobserver',
+    ' --jobserver-auth=sem:spack',
+])
+def test_jobserver_from_makeflags_unusable(makeflags):
+    assert Jobserver.from_makeflags(makeflags) is None
+
+
+def test_jobserver_from_fifo_makeflags(jobserver):
+    inherited = Jobserver.from_makeflags(jobserver.fifo_makeflags)
+    assert inherited.fifo == jobserver.fifo
+    assert inherited.try_acquire()
+    inherited.close()
+    assert jobserver.try_acquire()
+    assert jobserver.try_acquire()
+    assert not jobserver.try_acquire()
+
+
+def _use_shared_jobserver(path, connection):
+    jobserver = Jobserver.shared(8, path)
+    connection.send((jobserver.try_acquire(), jobserver.try_acquire()))
+    jobserver.close()
+
+
+def test_shared_jobserver(tmpdir):
+    path = str(tmpdir.join('jobserver', 'jobserver'))
+    jobserver = Jobserver.shared(2, path)
+    assert jobserver.free_jobs == 0
+    assert jobserver.try_acquire()
+
+    # Another process takes the token left, rather than filling the pool
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=_use_shared_jobserver, args=(path, child))
+    process.start()
+    assert parent.recv() == (True, False)
+    process.join()
+
+    # The tokens of the other process were given back
+    assert jobserver.try_acquire()
+    assert not jobserver.try_acquire()
+    jobserver.close()
+
+    # The next process to use the pool alone fills it again
+    jobserver = Jobserver.shared(1, path)
+    assert jobserver.try_acquire()
+    assert not jobserver.try_acquire()
+    jobserver.close()
+
+
+def test_shared_jobserver_must_be_private(tmpdir):
+    directory = tmpdir.ensure('jobserver', dir=True)
+    directory.chmod(0o755)
+    assert Jobserver.shared(2, str(directory.join('jobserver'))) is None
@@ -0,0 +1,87 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+import spack.util.parallel
+
+
+class UnpicklableError(Exception):
+    def __init__(self, first, second):
+        super(UnpicklableError, self).__init__(first + second)
+
+
+def add(a, b):
+    return a + b, os.getpid()
+
+
+def fail(a):
+    if a == 3:
+        raise ValueError('three')
+    if a == 5:
+        raise UnpicklableError('fi', 've')
+    return a
+
+
+#: State of the parent process, which only forked workers start with
+parent_state = []
+
+
+def get_parent_state():
+    return list(parent_state)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_parallel_map(processes):
+    results = spack.util.parallel.parallel_map(
+        add, [(i, 1) for i in range(10)], processes)
+    assert [r for r, _ in results] == list(range(1, 11))
+
+    pids = set(pid for _, pid in results)
+    assert (os.getpid() in pids) == (processes == 1)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_parallel_map_progress(processes):
+    done = []
+    spack.util.parallel.parallel_map(
+        add, [(i, 1) for i in range(5)], processes,
+        progress=lambda count, total: done.append((count, total)))
+    assert done == [(i, 5) for i in range(1, 6)]
+
+
+@pytest.mark.skipif(not hasattr(multiprocessing, 'get_context'),
+                    reason='Python 2 cannot spawn worker processes')
+def test_parallel_map_forks_workers(monkeypatch):
+    # Python 3.8 and later spawn worker processes by default on macOS
+    monkeypatch.setattr(multiprocessing, 'Pool',
+                        multiprocessing.get_context('spawn').Pool)
+    monkeypatch.setattr(sys.modules[__name__], 'parent_state', ['parent'])
+
+    results = spack.util.parallel.parallel_map(
+        get_parent_state, [(), ()], 2)
+    assert results == [['parent'], ['parent']]
+
+
+def test_parallel_map_errors():
+    with pytest.raises(ValueError, match='three'):
+        spack.util.parallel.parallel_map(fail, [(i,) for i in range(4)], 2)
+
+    with pytest.raises(spack.util.parallel.ErrorFromWorker,
+                       match='UnpicklableError: five'):
+        spack.util.parallel.parallel_map(fail, [(5,), (6,)], 2)
+
+
+def test_num_processes(mutable_config, monkeypatch):
+    monkeypatch.setattr(spack.util.parallel.multiprocessing, 'cpu_count',
+                        lambda: 8)
+    mutable_config.set('config:build_jobs', 4)
+    assert spack.util.parallel.num_processes() == 4
+    assert spack.util.parallel.num_processes(max_processes=2) == 2
+    assert spack.util.parallel.num_processes(max_processes=0) == 1
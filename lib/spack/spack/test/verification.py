@@ -230,3 +230,57 @@ def test_single_file_verification(tmpdir):
     results = spack.verify.check_file_manifest(filepath)
     assert results.has_errors()
     assert results.errors[filepath] == ['not owned by any package']
+
+
+def test_compute_hash_in_blocks(tmpdir, monkeypatch):
+    # Test that files hashed a block at a time get the hash of their contents
+    file = str(tmpdir.join('file'))
+    with open(file, 'w') as f:
+        f.write('This is a file read in several blocks')
+
+    expected = spack.verify.compute_hash(file)
+    monkeypatch.setattr(spack.verify, '_hash_block_size', 4)
+    assert spack.verify.compute_hash(file) == expected
+
+
+def test_fast_check_skips_unchanged_files(tmpdir):
+    # Test that files with the size and mtime in the manifest are not hashed
+    # in a fast check, and are otherwise.
+    file = str(tmpdir.join('file'))
+    with open(file, 'w') as f:
+        f.write('This is a file')
+    os.utime(file, (1000000000, 1000000000))
+
+    data = spack.verify.create_manifest_entry(file)
+    with open(file, 'w') as f:
+        f.write('This is a fake')
+    os.utime(file, (1000000000, 1000000000))
+
+    results = spack.verify.check_entry(file, data, fast=True)
+    assert not results.has_errors()
+
+    results = spack.verify.check_entry(file, data)
+    assert results.errors[file] == ['hash']
+
+
+def test_check_spec_manifests(tmpdir):
+    # Test that several prefixes checked at the same time are reported in
+    # the order of their specs
+    specs = []
+    for name in ('libelf', 'libdwarf', 'mpileaks'):
+        spec = spack.spec.Spec(name)
+        spec._mark_concrete()
+        spec.prefix = str(tmpdir.join(name))
+        fs.mkdirp(os.path.join(spec.prefix, spack.store.layout.metadata_dir))
+        with open(os.path.join(spec.prefix, 'file'), 'w') as f:
+            f.write('This is a file of %s' % name)
+        spack.verify.write_manifest(spec, threads=2)
+        specs.append(spec)
+
+    added = os.path.join(specs[1].prefix, 'added')
+    open(added, 'w').close()
+
+    results = list(spack.verify.check_spec_manifests(specs, jobs=2))
+    assert [spec for spec, _ in results] == specs
+    assert [r.has_errors() for _, r in results] == [False, True, False]
+    assert results[1][1].errors == {added: ['added']}
@@ -5,6 +5,12 @@
 
 import os
 
+import pytest
+
+from llnl.util.filesystem import touchp
+from llnl.util.link_tree import MergeConflictError
+
+import spack.config
 from spack.spec import Spec
 from spack.directory_layout import YamlDirectoryLayout
 from spack.filesystem_view import YamlFilesystemView
@@ -41,3 +47,52 @@ def test_remove_extensions_ordered(install_mockery, mock_fetch, tmpdir):
 
     e1 = e2['extension1']
     view.remove_specs(e1, e2)
+
+
+def test_add_specs_links_in_parallel(install_mockery, mock_fetch, tmpdir):
+    view_dir = str(tmpdir.join('view'))
+    view = YamlFilesystemView(view_dir, YamlDirectoryLayout(view_dir),
+                              link_threads=4)
+    specs = [Spec(s).concretized()
+             for s in ('libelf', 'trivial-install-test-package')]
+    for spec in specs:
+        spec.package.do_install()
+        for name in ('a', 'b', 'c'):
+            touchp(os.path.join(spec.prefix, 'share', spec.name, name))
+
+    view.add_specs(*specs)
+
+    for spec in specs:
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(view_dir, 'share', spec.name, name)
+            assert os.path.realpath(path) == os.path.join(
+                spec.prefix, 'share', spec.name, name)
+
+
+def test_link_threads_from_config(mutable_config, tmpdir):
+    view_dir = str(tmpdir.join('view'))
+    layout = YamlDirectoryLayout(view_dir)
+    assert YamlFilesystemView(view_dir, layout).link_threads == 1
+
+    spack.config.set('config:view_link_threads', 8)
+    assert YamlFilesystemView(view_dir, layout).link_threads == 8
+    view = YamlFilesystemView(view_dir, layout, link_threads=2)
+    assert view.link_threads == 2
+
+
+def test_add_specs_conflicts_before_linking(
+        install_mockery, mock_fetch, tmpdir):
+    view_dir = str(tmpdir.join('view'))
+    view = YamlFilesystemView(view_dir, YamlDirectoryLayout(view_dir))
+    specs = [Spec(s).concretized()
+             for s in ('libelf', 'trivial-install-test-package')]
+    for spec in specs:
+        spec.package.do_install()
+        touchp(os.path.join(spec.prefix, 'bin', 'common'))
+
+    with pytest.raises(MergeConflictError):
+        view.add_specs(*specs)
+
+    # Conflicts between the specs are found before any of them is linked
+    assert not os.path.exists(os.path.join(view_dir, 'bin'))
+    assert not view.get_all_specs()
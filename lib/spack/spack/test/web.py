@@ -2,10 +2,12 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import hashlib
 import os
 
 import ordereddict_backport
 import pytest
+import spack
 import spack.paths
 import spack.util.web
 from spack.version import ver
@@ -167,3 +169,78 @@ def test_get_header():
     # If there isn't even a fuzzy match, raise KeyError
     with pytest.raises(KeyError):
         spack.util.web.get_header(headers, 'ContentLength')
+
+
+def test_download_url_reuses_connections(mock_http_server, tmpdir):
+    data = b'archive contents' * 1000
+    mock_http_server.root.join('archive.tar.gz').write_binary(data)
+    url = mock_http_server.url + '/archive.tar.gz'
+
+    for i in range(3):
+        path = str(tmpdir.join('archive-%d.tar.gz' % i))
+        headers, digest = spack.util.web.download_url(
+            url, path, hashlib.sha256)
+        assert digest == hashlib.sha256(data).hexdigest()
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+    assert len(mock_http_server.requests) == 3
+    assert mock_http_server.connections == 1
+    assert mock_http_server.user_agent == 'Spack/' + spack.spack_version
+
+
+def test_download_url_timeout_only_bounds_connecting(
+        mock_http_server, tmpdir):
+    data = b'archive contents'
+    mock_http_server.root.join('archive.tar.gz').write_binary(data)
+    mock_http_server.delay = 0.5
+    path = str(tmpdir.join('archive.tar.gz'))
+
+    # Both the new connection and the idle one wait for the response
+    for _ in range(2):
+        spack.util.web.download_url(
+            mock_http_server.url + '/archive.tar.gz', path, timeout=0.1,
+            retries=0)
+        with open(path, 'rb') as f:
+            assert f.read() == data
+    assert mock_http_server.connections == 1
+
+
+def test_download_url_resumes_partial_file(mock_http_server, tmpdir):
+    data = b'0123456789' * 1000
+    mock_http_server.root.join('archive.tar.gz').write_binary(data)
+    path = tmpdir.join('archive.tar.gz.part')
+    path.write_binary(data[:4000])
+
+    _, digest = spack.util.web.download_url(
+        mock_http_server.url + '/archive.tar.gz', str(path), hashlib.md5)
+
+    assert mock_http_server.requests == [
+        ('/archive.tar.gz', 'bytes=4000-')]
+    assert path.read_binary() == data
+    assert digest == hashlib.md5(data).hexdigest()
+
+
+def test_download_url_not_found(mock_http_server, tmpdir):
+    with pytest.raises(spack.util.web.DownloadError) as e:
+        spack.util.web.download_url(
+            mock_http_server.url + '/missing.tar.gz',
+            str(tmpdir.join('missing.tar.gz')))
+    assert e.value.code == 404
+
+
+@pytest.mark.parametrize('url,proxies,expected', [
+    ('https://example.com/a.tar.gz', {}, True),
+    ('http://example.com/a.tar.gz', {}, True),
+    ('ftp://example.com/a.tar.gz', {}, False),
+    ('file:///tmp/a.tar.gz', {}, False),
+    ('https://example.com/a.tar.gz',
+     {'https_proxy': 'http://proxy:3128'}, False),
+])
+def test_supports_download(monkeypatch, url, proxies, expected):
+    for name in ('http_proxy', 'https_proxy', 'ftp_proxy', 'no_proxy',
+                 'HTTP_PROXY', 'HTTPS_PROXY', 'FTP_PROXY', 'NO_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in proxies.items():
+        monkeypatch.setenv(name, value)
+    assert spack.util.web.supports_download(url) == expected
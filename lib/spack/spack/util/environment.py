@@ -338,14 +338,20 @@ def _check_other(other):
                 'other must be an instance of EnvironmentModifications')
 
     def _get_outside_caller_attributes(self):
-        stack = inspect.stack()
+        # Only the caller of the caller is needed: inspect.stack() would read
+        # the source lines of every frame in the stack
+        frame = inspect.currentframe()
         try:
-            _, filename, lineno, _, context, index = stack[2]
+            caller = frame.f_back.f_back
+            _, filename, lineno, _, context, index = \
+                inspect.getframeinfo(caller)
             context = context[index].strip()
         except Exception:
             filename = 'unknown file'
             lineno = 'unknown line'
             context = 'unknown context'
+        finally:
+            del frame
         args = {'filename': filename, 'lineno': lineno, 'context': context}
         return args
 
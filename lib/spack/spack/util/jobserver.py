@@ -0,0 +1,370 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""GNU make jobserver shared by package builds.
+
+A jobserver is a pool of tokens: a process that wants to run one more
+parallel job takes a token from the pool and puts it back when the job is
+done, while the first job of every process is free.  Builds whose ``make``
+draw their jobs from the same jobserver never run more jobs in total than
+the pool allows, however many of them run at the same time.
+
+The builds of all the ``spack install`` processes of a user on a host share
+one jobserver, unless Spack runs under a ``make`` that has its own.
+
+The pool is a named pipe, which ``make`` finds through the ``MAKEFLAGS``
+environment variable.  ``make`` up to version 4.3 only understands the
+file descriptors of the pipe, which builds inherit, while newer ``make``
+and ``ninja`` (1.13 and later) open the pipe by its path.
+
+See https://www.gnu.org/software/make/manual/html_node/Job-Slots.html
+"""
+import errno
+import fcntl
+import os
+import re
+import shutil
+import stat
+import tempfile
+
+import llnl.util.tty as tty
+
+
+#: Token written to the pipe of the jobservers Spack creates
+_token = b'+'
+
+#: Jobserver the builds of this process draw their parallel jobs from
+_active = None
+
+
+def active():
+    """The jobserver the builds of this process draw their jobs from, or
+    None if they pass their own ``-j`` to ``make``."""
+    return _active
+
+
+def activate(jobserver):
+    """Make the builds of this process draw their jobs from ``jobserver``
+    (None to stop using a jobserver)."""
+    global _active
+    _active = jobserver
+
+
+def _set_inheritable(fd):
+    # File descriptors are not inherited by default as of Python 3.4
+    if hasattr(os, 'set_inheritable'):
+        os.set_inheritable(fd, True)
+
+
+def _set_blocking(fd, blocking):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    if blocking:
+        flags &= ~os.O_NONBLOCK
+    else:
+        flags |= os.O_NONBLOCK
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags)
+
+
+def _drain(fd):
+    """Read everything available from a nonblocking descriptor."""
+    while True:
+        try:
+            if not os.read(fd, 4096):
+                return
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+
+
+def shared_path():
+    """Path of the named pipe of the jobserver shared by the ``spack
+    install`` processes of the current user on this host."""
+    return os.path.join(tempfile.gettempdir(),
+                        'spack-jobserver-{0}'.format(os.getuid()),
+                        'jobserver')
+
+
+def _is_open(fd):
+    try:
+        os.fstat(fd)
+        return True
+    except OSError:
+        return False
+
+
+class Jobserver(object):
+    """Pool of job tokens shared with ``make``."""
+
+    def __init__(self, read_fd, write_fd, fifo=None, owned=False,
+                 lock_fd=None):
+        """
+        Args:
+            read_fd (int): descriptor of the pipe tokens are taken from
+            write_fd (int): descriptor of the pipe tokens are put back in
+            fifo (str): path of the named pipe, if known
+            owned (bool): ``True`` if this process created the pool
+            lock_fd (int): descriptor of the lock held on a pool shared
+                with other Spack processes, if any
+        """
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.fifo = fifo
+        self.owned = owned
+        self._lock_fd = lock_fd
+
+        # Spack waits for tokens without blocking, and on its own open
+        # file, since the nonblocking flag is shared by all its users.
+        self._poll_fd = None
+        if fifo:
+            self._poll_fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        elif os.path.isdir('/proc/self/fd'):
+            self._poll_fd = os.open('/proc/self/fd/{0}'.format(read_fd),
+                                    os.O_RDONLY | os.O_NONBLOCK)
+
+        #: Tokens taken from the pool by this process
+        self.tokens = []
+
+    @classmethod
+    def create(cls, jobs):
+        """Create a jobserver that lets builds run ``jobs`` jobs in total.
+
+        Args:
+            jobs (int): number of jobs, including the free job of the
+                first build
+        """
+        tmpdir = tempfile.mkdtemp(prefix='spack-jobserver-')
+        fifo = os.path.join(tmpdir, 'jobserver')
+        os.mkfifo(fifo, 0o600)
+
+        # Open the read end first without blocking, since there is no
+        # writer yet
+        read_fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        write_fd = os.open(fifo, os.O_WRONLY)
+        _set_blocking(read_fd, True)
+        for fd in (read_fd, write_fd):
+            _set_inheritable(fd)
+
+        os.write(write_fd, _token * (jobs - 1))
+        tty.debug('Created a jobserver with {0} jobs at {1}'
+                  .format(jobs, fifo))
+        return cls(read_fd, write_fd, fifo, owned=True)
+
+    @classmethod
+    def shared(cls, jobs, path=None):
+        """The jobserver shared by the ``spack install`` processes of the
+        current user on this host, or None if it cannot be used.
+
+        The first process to use the pool fills it with ``jobs`` tokens,
+        which bound the jobs of all the processes until the last one is
+        done with it.  Each process holds a shared lock on a file next to
+        the pipe while it uses the pool, so the one that gets an exclusive
+        lock knows that no token is taken.  Processes open the pipe before
+        they lock, since the tokens in a pipe are lost when nobody has it
+        open.
+
+        The lock of a process that dies is released, and its tokens are
+        given back by the ``make`` processes holding them when they are
+        done.  A process that refills the pool before they are done leaves
+        it with too many tokens until it is next refilled, which happens
+        the next time a process finds no other one using it.
+
+        Args:
+            jobs (int): number of jobs of all the processes together, if
+                this process is the first one to use the pool
+            path (str): path of the named pipe (default: ``shared_path()``)
+        """
+        fifo = path or shared_path()
+        directory = os.path.dirname(fifo)
+        fds = []
+        try:
+            try:
+                os.mkdir(directory, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            # Other users could take or add tokens in a pipe they can open
+            st = os.lstat(directory)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+                    st.st_mode & 0o077:
+                tty.debug('Cannot use the jobserver at {0}: it is not '
+                          'private'.format(fifo))
+                return None
+
+            try:
+                os.mkfifo(fifo, 0o600)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            fds.append(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+            fds.append(os.open(fifo, os.O_WRONLY))
+            fds.append(os.open(fifo + '.lock', os.O_RDWR | os.O_CREAT, 0o600))
+            read_fd, write_fd, lock_fd = fds
+
+            try:
+                fcntl.lockf(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                first = True
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):
+                    raise
+                first = False
+
+            if first:
+                # Nobody has tokens: start over with a full pool, whatever
+                # the last users left in it
+                _drain(read_fd)
+                os.write(write_fd, _token * jobs)
+                tty.debug('Filled the jobserver at {0} with {1} jobs'
+                          .format(fifo, jobs))
+
+            # Turning an exclusive lock into a shared one is atomic
+            fcntl.lockf(lock_fd, fcntl.LOCK_SH)
+            _set_blocking(read_fd, True)
+        except (IOError, OSError) as e:
+            for fd in fds:
+                os.close(fd)
+            tty.debug('Cannot use the jobserver at {0}: {1}'
+                      .format(fifo, str(e)))
+            return None
+
+        for fd in (read_fd, write_fd):
+            _set_inheritable(fd)
+        return cls(read_fd, write_fd, fifo, lock_fd=lock_fd)
+
+    @classmethod
+    def from_makeflags(cls, makeflags):
+        """The jobserver of the ``make`` running this process, as described
+        by its ``MAKEFLAGS``, or None if there is none or it is unusable.
+
+        Args:
+            makeflags (str): value of the ``MAKEFLAGS`` environment variable
+        """
+        # The last option wins, and make 4.2 renamed --jobserver-fds
+        options = re.findall(r'--jobserver-(?:auth|fds)=(\S+)', makeflags)
+        if not options:
+            return None
+        auth = options[-1]
+
+        if auth.startswith('fifo:'):
+            fifo = auth[len('fifo:'):]
+            try:
+                read_fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+                write_fd = os.open(fifo, os.O_WRONLY)
+            except OSError as e:
+                tty.debug('Cannot use the jobserver at {0}: {1}'
+                          .format(fifo, str(e)))
+                return None
+            _set_blocking(read_fd, True)
+            for fd in (read_fd, write_fd):
+                _set_inheritable(fd)
+            return cls(read_fd, write_fd, fifo)
+
+        match = re.match(r'^(\d+),(\d+)$', auth)
+        if not match:
+            tty.debug('Unknown jobserver in MAKEFLAGS: {0}'.format(auth))
+            return None
+
+        # make does not pass its jobserver to commands it does not know to
+        # be recursive makes, which leaves stale descriptors in MAKEFLAGS.
+        read_fd, write_fd = int(match.group(1)), int(match.group(2))
+        if not (_is_open(read_fd) and _is_open(write_fd)):
+            tty.debug('The jobserver descriptors in MAKEFLAGS are closed')
+            return None
+        return cls(read_fd, write_fd)
+
+    @classmethod
+    def from_environment(cls):
+        """The jobserver of the ``make`` running this process, if any."""
+        return cls.from_makeflags(os.environ.get('MAKEFLAGS', ''))
+
+    @property
+    def makeflags(self):
+        """``MAKEFLAGS`` that make ``make`` draw its jobs from the pool.
+
+        Both spellings of the option are given, since older ``make`` only
+        knows ``--jobserver-fds`` and ignores the other option."""
+        fds = '{0},{1}'.format(self.read_fd, self.write_fd)
+        return '-j --jobserver-fds={0} --jobserver-auth={0}'.format(fds)
+
+    @property
+    def fifo_makeflags(self):
+        """``MAKEFLAGS`` for the clients that only open the pool by path,
+        or None if the path is unknown."""
+        if not self.fifo:
+            return None
+        return '-j --jobserver-auth=fifo:{0}'.format(self.fifo)
+
+    @property
+    def free_jobs(self):
+        """Number of builds this process runs without a token.
+
+        The first build of a process runs in the job of the process, unless
+        the pool is shared with other Spack processes, as their own builds
+        would then run in that job as well."""
+        return 0 if self._lock_fd is not None else 1
+
+    @property
+    def can_acquire(self):
+        """``True`` if this process can take tokens without blocking.
+
+        This needs a file of our own, which cannot be opened for the pipe
+        of an inherited jobserver on systems without ``/proc``."""
+        return self._poll_fd is not None
+
+    def fileno(self):
+        """File descriptor that is readable when tokens are available, for
+        ``select()``."""
+        return self._poll_fd
+
+    def try_acquire(self):
+        """Take a token from the pool, if one is available right away.
+
+        Return:
+            (bool) ``True`` if a token was taken, otherwise ``False``
+        """
+        if not self.can_acquire:
+            return False
+        try:
+            token = os.read(self._poll_fd, 1)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return False
+            raise
+        if not token:
+            return False
+        self.tokens.append(token)
+        return True
+
+    def release(self):
+        """Put back a token taken with ``try_acquire()``."""
+        os.write(self.write_fd, self.tokens.pop())
+
+    def close(self):
+        """Put back all tokens, and remove the pool if this process created
+        it."""
+        if self.write_fd is None:
+            return
+
+        while self.tokens:
+            self.release()
+
+        fds = [self._poll_fd]
+        if self.fifo:
+            # Otherwise the descriptors belong to the make running us
+            fds.extend([self.read_fd, self.write_fd])
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+        self.read_fd = self.write_fd = self._poll_fd = None
+
+        # Release the lock on a shared pool last, so that the process that
+        # gets the exclusive lock next finds the tokens given back
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+        if self.owned:
+            shutil.rmtree(os.path.dirname(self.fifo), ignore_errors=True)
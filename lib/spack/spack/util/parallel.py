@@ -0,0 +1,132 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Map functions over many arguments in a pool of worker processes.
+
+This is meant for CPU bound work in pure Python, which threads cannot run
+in parallel.  The functions must be defined at module level, and their
+arguments and results must be picklable.
+
+Worker processes are always forked, so that they start with the
+configuration, package repositories and other state of Spack in the parent
+process.  Processes started another way, as Python 3.8 and later do by
+default on macOS, would start from a fresh Spack instead.
+"""
+import multiprocessing
+import pickle
+import traceback
+
+import spack.config
+import spack.error
+
+
+class ErrorFromWorker(spack.error.SpackError):
+    """Wraps an error raised by a worker process that cannot be passed back
+    to the parent process as is."""
+
+    def __init__(self, error, worker_traceback):
+        super(ErrorFromWorker, self).__init__(
+            '{0}: {1}'.format(type(error).__name__, str(error)),
+            worker_traceback)
+
+
+def num_processes(max_processes=None):
+    """Number of worker processes to use for parallel work.
+
+    This is ``config:build_jobs``, limited by the number of cores available.
+
+    Args:
+        max_processes (int): upper limit on the number of processes
+    """
+    processes = min(spack.config.get('config:build_jobs', 16),
+                    multiprocessing.cpu_count())
+    if max_processes is not None:
+        processes = min(processes, max_processes)
+    return max(processes, 1)
+
+
+def pool(processes):
+    """A ``multiprocessing.Pool`` of ``processes`` forked worker processes.
+
+    Args:
+        processes (int): number of worker processes
+    """
+    # Python 2 always forks on the platforms Spack supports
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork').Pool(processes)
+    return multiprocessing.Pool(processes)
+
+
+def _picklable(error):
+    try:
+        pickle.loads(pickle.dumps(error))
+        return True
+    except Exception:
+        return False
+
+
+def _call(func_and_args):
+    """Call a function in a worker, returning the error it raises, if any,
+    instead of raising it."""
+    func, args = func_and_args
+    try:
+        return func(*args), None
+    except Exception as e:
+        # Errors that take custom arguments cannot be unpickled by the parent
+        if not _picklable(e):
+            e = ErrorFromWorker(e, traceback.format_exc())
+        return None, e
+
+
+def parallel_map(func, arguments, processes=None, progress=None):
+    """Call ``func(*args)`` for all ``args`` in ``arguments`` in a pool of
+    processes, and return the results in the same order.
+
+    The calls are made in this process if only one process would be used,
+    or if this process is a daemon and cannot start any.  The first error
+    raised by a call is raised again once all calls are done.
+
+    Args:
+        func (callable): function defined at module level
+        arguments (list): tuples of arguments to call the function with
+        processes (int): number of processes, by default ``num_processes()``
+        progress (callable): called with the number of calls done and the
+            total number of calls, each time a call is done
+
+    Return:
+        (list) results of the calls
+    """
+    arguments = list(arguments)
+    if processes is None:
+        processes = num_processes()
+    processes = min(processes, len(arguments))
+
+    if processes <= 1 or multiprocessing.current_process().daemon:
+        results = []
+        for args in arguments:
+            results.append(func(*args))
+            if progress:
+                progress(len(results), len(arguments))
+        return results
+
+    workers = pool(processes)
+    try:
+        # Send the arguments in a few chunks per process, to balance the
+        # load while keeping the overhead of passing them low
+        chunksize = max(len(arguments) // (4 * processes), 1)
+        outcomes = []
+        for outcome in workers.imap(
+                _call, [(func, args) for args in arguments], chunksize):
+            outcomes.append(outcome)
+            if progress:
+                progress(len(outcomes), len(arguments))
+    finally:
+        workers.terminate()
+        workers.join()
+
+    for _, error in outcomes:
+        if error is not None:
+            raise error
+    return [result for result, _ in outcomes]
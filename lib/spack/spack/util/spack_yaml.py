@@ -13,9 +13,11 @@
 
 """
 import ctypes
+import re
 
 
 from ordereddict_backport import OrderedDict
+import six
 from six import string_types, StringIO
 
 import ruamel.yaml as yaml
@@ -26,7 +28,7 @@
 import spack.error
 
 # Only export load and dump
-__all__ = ['load', 'dump', 'SpackYAMLError']
+__all__ = ['load', 'dump', 'dump_flow', 'SpackYAMLError']
 
 # Make new classes so we can add custom attributes.
 # Also, use OrderedDict instead of just dict.
@@ -59,6 +61,10 @@ class syaml_int(int):
 }
 
 
+_str_types = (str, syaml_str, six.text_type)
+_int_types = (int, syaml_int) + ((long,) if six.PY2 else ())  # noqa: F821
+
+
 markable_types = set(syaml_types) | set([
     yaml.comments.CommentedSeq,
     yaml.comments.CommentedMap])
@@ -207,6 +213,115 @@ def dump(obj, default_flow_style=False, stream=None):
                      Dumper=SafeDumper, stream=stream)
 
 
+class _NotFlowDumpable(Exception):
+    """Raised when dump_flow() cannot reproduce what ruamel would emit."""
+
+
+#: Lowercase alphanumeric strings with a letter other than ``e`` (so they
+#: are not numbers), long enough not to be booleans or nulls and not
+#: starting with ``0`` (so they are not binary, octal or hex numbers).  Hashes
+#: are like this, and YAML emits them as plain scalars.
+_plain_scalar = re.compile(r'^[a-z1-9][a-z0-9]{5,}$')
+_non_numeric = re.compile(r'[a-df-z]')
+
+#: Text of the scalars and keys emitted so far by dump_flow(), cleared
+#: when they reach ``_flow_cache_size`` entries so they stay bounded
+_flow_scalars = {}
+_flow_keys = {}
+_flow_cache_size = 4096
+
+_flow_containers = (dict, syaml_dict, list, syaml_list, tuple)
+
+
+def _flow_cached(cache, value, text):
+    """Store the text of a value in one of the dump_flow() caches."""
+    if len(cache) >= _flow_cache_size:
+        cache.clear()
+    cache[value] = text
+
+
+def _flow_scalar(value):
+    """Text of a scalar in a flow collection."""
+    if value is None:
+        return "!!null ''"
+    elif value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+    elif type(value) in _int_types:
+        return str(value)
+    elif type(value) not in _str_types:
+        raise _NotFlowDumpable()
+    elif _plain_scalar.match(value) and _non_numeric.search(value):
+        return value
+
+    text = _flow_scalars.get(value)
+    if text is None:
+        text = dump([value], default_flow_style=True)[1:-2]
+        if '\n' in text:
+            # Line breaks are indented according to the context
+            raise _NotFlowDumpable()
+        _flow_cached(_flow_scalars, value, text)
+    return text
+
+
+def _flow_key(key):
+    """Text of a key in a flow mapping, including what separates it from
+    its value but the final ``: ``."""
+    if type(key) not in _str_types:
+        raise _NotFlowDumpable()
+
+    text = _flow_keys.get(key)
+    if text is None:
+        text = dump({key: 0}, default_flow_style=True)[1:-len(': 0}\n')]
+        if '\n' in text:
+            raise _NotFlowDumpable()
+        _flow_cached(_flow_keys, key, text)
+    return text
+
+
+def _flow_node(obj, out):
+    """Append the text of an object in flow style to a list of strings."""
+    if type(obj) not in _flow_containers:
+        out.append(_flow_scalar(obj))
+    elif isinstance(obj, dict):
+        out.append('{')
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                out.append(', ')
+            out.append(_flow_key(key))
+            out.append(': ')
+            _flow_node(value, out)
+        out.append('}')
+    else:
+        out.append('[')
+        for i, value in enumerate(obj):
+            if i:
+                out.append(', ')
+            _flow_node(value, out)
+        out.append(']')
+
+
+def dump_flow(obj):
+    """Same as ``dump(obj, default_flow_style=True)``, but faster.
+
+    The text of the collections is written directly, and the text of each
+    distinct scalar is emitted by ruamel only once. This is used to compute
+    spec hashes, which must not change, so objects this cannot write
+    exactly as ruamel would, like multi-line strings, are dumped by ruamel.
+    """
+    if type(obj) not in _flow_containers:
+        return dump(obj, default_flow_style=True)
+
+    out = []
+    try:
+        _flow_node(obj, out)
+    except _NotFlowDumpable:
+        return dump(obj, default_flow_style=True)
+    out.append('\n')
+    return ''.join(out)
+
+
 def file_line(mark):
     """Format a mark as <file>:<line> information."""
     result = mark.name
@@ -5,6 +5,7 @@
 
 from __future__ import print_function
 
+import calendar
 import codecs
 import errno
 import multiprocessing.pool
@@ -12,13 +13,18 @@
 import os.path
 import re
 import shutil
+import socket
 import ssl
 import sys
+import threading
 import traceback
 
 import six
-from six.moves.urllib.error import URLError
+from six.moves import http_client
+from six.moves.urllib.error import HTTPError, URLError
+from six.moves.urllib.parse import urljoin, urlsplit
 from six.moves.urllib.request import urlopen, Request
+from six.moves.urllib.request import getproxies, proxy_bypass
 
 try:
     # Python 2 had these in the HTMLParser package.
@@ -34,6 +40,7 @@ class HTMLParseError(Exception):
 from llnl.util.filesystem import mkdirp
 import llnl.util.tty as tty
 
+import spack
 import spack.cmd
 import spack.config
 import spack.error
@@ -48,6 +55,18 @@ class HTMLParseError(Exception):
 # Timeout in seconds for web requests
 _timeout = 10
 
+#: Number of idle connections to each host kept open for later downloads
+_max_idle_connections = 4
+
+#: Maximum number of redirects followed by a download
+_max_redirects = 10
+
+#: Size of the blocks downloads are read and hashed in
+_download_block_size = 2 ** 20
+
+#: User agent of the requests of ``download_url()``
+_user_agent = 'Spack/{0}'.format(spack.spack_version)
+
 
 class LinkParser(HTMLParser):
     """This parser just takes an HTML page and strips out the hrefs on the
@@ -86,28 +105,25 @@ def uses_ssl(parsed_url):
     ))(sys.version_info)
 
 
-def read_from_url(url, accept_content_type=None):
-    url = url_util.parse(url)
-    context = None
-
-    verify_ssl = spack.config.get('config:verify_ssl')
+def read_from_url(url, accept_content_type=None, headers=None):
+    """Opens a URL for reading.
 
-    # Don't even bother with a context unless the URL scheme is one that uses
-    # SSL certs.
-    if uses_ssl(url):
-        if verify_ssl:
-            if __UNABLE_TO_VERIFY_SSL:
-                # User wants SSL verification, but it cannot be provided.
-                warn_no_ssl_cert_checking()
-            else:
-                # User wants SSL verification, and it *can* be provided.
-                context = ssl.create_default_context()  # novm
-        else:
-            # User has explicitly indicated that they do not want SSL
-            # verification.
-            context = ssl._create_unverified_context()
+    Args:
+        url (str): URL to read
+        accept_content_type (str): if given, URLs with another content type
+            are ignored, and ``(None, None, None)`` is returned
+        headers (dict): extra headers of the request, e.g. ``If-None-Match``
+            for a conditional request
+
+    Return:
+        (tuple) the URL read, the headers of the response, and the response
+        to read from, which is None if the server answered a conditional
+        request with "Not Modified"
+    """
+    url = url_util.parse(url)
+    context = _ssl_context(url)
 
-    req = Request(url_util.format(url))
+    req = Request(url_util.format(url), headers=headers or {})
     content_type = None
     is_web_url = url.scheme in ('http', 'https')
     if accept_content_type and is_web_url:
@@ -126,6 +142,11 @@ def read_from_url(url, accept_content_type=None):
 
     try:
         response = _urlopen(req, timeout=_timeout, context=context)
+    except HTTPError as err:
+        if err.code == 304:
+            return url_util.format(url), err.headers, None
+        raise SpackWebError('Download failed: {ERROR}'.format(
+            ERROR=str(err)))
     except URLError as err:
         raise SpackWebError('Download failed: {ERROR}'.format(
             ERROR=str(err)))
@@ -149,11 +170,265 @@ def read_from_url(url, accept_content_type=None):
     return response.geturl(), response.headers, response
 
 
+def _ssl_context(url):
+    """SSL context of the connections to a parsed URL, or None if the URL
+    does not use SSL or certificates cannot be checked."""
+    # Don't even bother with a context unless the URL scheme is one that uses
+    # SSL certs.
+    if not uses_ssl(url):
+        return None
+
+    if spack.config.get('config:verify_ssl'):
+        if __UNABLE_TO_VERIFY_SSL:
+            # User wants SSL verification, but it cannot be provided.
+            warn_no_ssl_cert_checking()
+            return None
+
+        # User wants SSL verification, and it *can* be provided.
+        return ssl.create_default_context()  # novm
+
+    # User has explicitly indicated that they do not want SSL verification.
+    return ssl._create_unverified_context()
+
+
 def warn_no_ssl_cert_checking():
     tty.warn("Spack will not check SSL certificates. You need to update "
              "your Python to enable certificate verification.")
 
 
+class ConnectionPool(object):
+    """Keeps the HTTP and HTTPS connections to each host open once their
+    responses are read, so that the next downloads from the host reuse them
+    instead of connecting, and negotiating SSL, again.
+
+    Connections are not shared with the processes forked from this one.
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def get(self, url, timeout, reuse=True):
+        """
+        Get a connection to the host of a URL.
+
+        The timeout only bounds connecting to the host, like the
+        ``--connect-timeout`` of ``curl``: the responses of the connection
+        are waited for as long as they take, e.g. while the host prepares
+        a large archive.
+
+        Args:
+            url (SplitResult): the parsed URL
+            timeout (int): seconds to wait for the connection to the host,
+                or None to wait forever
+            reuse (bool): whether an idle connection can be used
+
+        Return:
+            (tuple) the connection, and whether it was idle
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # The sockets of the parent process are not ours to use
+                self._idle, self._pid = {}, os.getpid()
+
+            idle = self._idle.get((url.scheme, url.netloc))
+            if reuse and idle:
+                return idle.pop(), True
+
+        if url.scheme == 'https':
+            context = _ssl_context(url)
+            kwargs = {'context': context} if context else {}
+            connection = http_client.HTTPSConnection(
+                url.netloc, timeout=timeout, **kwargs)
+        else:
+            connection = http_client.HTTPConnection(
+                url.netloc, timeout=timeout)
+        connection.connect()
+        connection.sock.settimeout(None)
+        return connection, False
+
+    def put(self, url, connection):
+        """
+        Give back a connection whose last response was read.
+
+        Args:
+            url (SplitResult): the parsed URL the connection was got for
+            connection (HTTPConnection): the connection
+        """
+        with self._lock:
+            idle = self._idle.setdefault((url.scheme, url.netloc), [])
+            if self._pid == os.getpid() and connection.sock is not None and \
+                    len(idle) < _max_idle_connections:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+#: Connections kept open by ``download_url()``
+connection_pool = ConnectionPool()
+
+
+def supports_download(url):
+    """Whether ``download_url()`` can download a URL, i.e. over HTTP or
+    HTTPS without going through a proxy."""
+    url = urlsplit(url)
+    if url.scheme not in ('http', 'https'):
+        return False
+    return not getproxies().get(url.scheme) or proxy_bypass(url.hostname)
+
+
+def download_url(url, path, hash_fun=None, timeout=_timeout, headers=None,
+                 retries=3):
+    """Downloads a URL to a file over a pooled connection, hashing its
+    contents as they arrive.
+
+    The download resumes where the file ends if it exists, e.g. after an
+    interrupted download.  It also resumes when the connection drops before
+    the end, up to ``retries`` times.
+
+    Args:
+        url (str): HTTP or HTTPS URL to download
+        path (str): file to download to
+        hash_fun (callable): if given, returns the hash object to compute
+            the digest of the file with, e.g. ``hashlib.sha256``
+        timeout (int): seconds to wait for the connection to the host, or
+            None to wait forever
+        headers (dict): extra headers of the requests, e.g. ``Cookie``
+        retries (int): number of times the download resumes after the
+            connection dropped
+
+    Return:
+        (tuple) the headers of the response, and the hex digest of the file,
+        or None if ``hash_fun`` was not given
+    """
+    for attempt in range(retries + 1):
+        size = _file_size(path)
+        try:
+            return _download_url(url, path, hash_fun, timeout, headers or {})
+        except ssl.SSLError:
+            raise
+        except (socket.error, http_client.HTTPException) as e:
+            if attempt == retries or _file_size(path) <= size:
+                raise
+            tty.debug('Resuming the download of {0}: {1}'.format(url, e))
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _download_url(url, path, hash_fun, timeout, headers):
+    offset = _file_size(path)
+    request_headers = headers
+    if offset:
+        request_headers = dict(headers, Range='bytes={0}-'.format(offset))
+    parsed, connection, response = _request(url, request_headers, timeout)
+
+    try:
+        if response.status == 416 and offset:
+            # The file is not the beginning of what the URL holds anymore
+            response.read()
+            connection_pool.put(parsed, connection)
+            os.remove(path)
+            return _download_url(url, path, hash_fun, timeout, headers)
+
+        if response.status >= 400:
+            raise DownloadError(
+                response.status,
+                'Download failed: HTTP Error {0}: {1}'.format(
+                    response.status, response.reason))
+
+        hasher = hash_fun() if hash_fun else None
+        resumed = offset and response.status == 206
+        if resumed and hasher:
+            with open(path, 'rb') as f:
+                for block in iter(
+                        lambda: f.read(_download_block_size), b''):
+                    hasher.update(block)
+
+        expected = response.getheader('Content-Length')
+        received = 0
+        with open(path, 'ab' if resumed else 'wb') as f:
+            for block in iter(
+                    lambda: response.read(_download_block_size), b''):
+                f.write(block)
+                received += len(block)
+                if hasher:
+                    hasher.update(block)
+
+        if expected is not None and received < int(expected):
+            raise http_client.IncompleteRead(
+                b'', int(expected) - received)
+    except BaseException:
+        connection.close()
+        raise
+
+    if response.will_close:
+        connection.close()
+    else:
+        connection_pool.put(parsed, connection)
+    return response.msg, hasher.hexdigest() if hasher else None
+
+
+def _request(url, headers, timeout):
+    """Sends a GET request over a pooled connection, and follows the
+    redirects of its responses.
+
+    Return:
+        (tuple) the parsed URL answering the request, the connection to it
+        and the response, whose body is left to read
+    """
+    # Some hosts refuse requests without a user agent
+    headers = dict(headers)
+    headers.setdefault('User-Agent', _user_agent)
+    for _ in range(_max_redirects + 1):
+        parsed = urlsplit(url)
+        target = parsed.path or '/'
+        if parsed.query:
+            target += '?' + parsed.query
+
+        connection, idle = connection_pool.get(parsed, timeout)
+        try:
+            connection.request('GET', target, headers=headers)
+            response = connection.getresponse()
+        except (socket.error, http_client.HTTPException):
+            connection.close()
+            if not idle:
+                raise
+
+            # The host closed the connection while it was idle
+            connection, _ = connection_pool.get(parsed, timeout, reuse=False)
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+            except BaseException:
+                connection.close()
+                raise
+
+        location = response.getheader('Location')
+        if response.status not in (301, 302, 303, 307, 308) or not location:
+            return parsed, connection, response
+
+        response.read()
+        if response.will_close:
+            connection.close()
+        else:
+            connection_pool.put(parsed, connection)
+        url = urljoin(url, location)
+
+    raise DownloadError(
+        response.status, 'Download failed: too many redirects')
+
+
 def push_to_url(
         local_file_path, remote_path, keep_original=True, extra_args=None):
     remote_url = url_util.parse(remote_path)
@@ -309,6 +584,47 @@ def list_url(url):
             for key in _iter_s3_prefix(s3, url)))
 
 
+def list_url_mtimes(url):
+    """Map the names of the files at a URL to their modification times,
+    in seconds since the epoch.
+
+    Return:
+        (dict) the times, or None if the URL cannot be listed with times
+    """
+    url = url_util.parse(url)
+
+    local_path = url_util.local_file_path(url)
+    if local_path:
+        mtimes = {}
+        for name in os.listdir(local_path):
+            path = os.path.join(local_path, name)
+            if os.path.isfile(path):
+                mtimes[name] = os.stat(path).st_mtime
+        return mtimes
+
+    if url.scheme == 's3':
+        s3 = s3_util.create_s3_session(url)
+        bucket = url.netloc
+        prefix = re.sub(r'^/*', '/', url.path)
+        mtimes, key = {}, None
+        while True:
+            list_args = dict(Bucket=bucket, Prefix=prefix[1:], MaxKeys=1024)
+            if key is not None:
+                list_args['StartAfter'] = key
+            result = s3.list_objects_v2(**list_args)
+            for entry in result.get('Contents', []):
+                name = os.path.relpath('/' + entry['Key'].lstrip('/'),
+                                       prefix)
+                if '/' not in name and name != '.':
+                    mtimes[name] = calendar.timegm(
+                        entry['LastModified'].utctimetuple())
+            if not result['IsTruncated']:
+                return mtimes
+            key = result['Contents'][-1]['Key']
+
+    return None
+
+
 def spider(root_urls, depth=0, concurrency=32):
     """Get web pages from root URLs.
 
@@ -595,6 +911,13 @@ class SpackWebError(spack.error.SpackError):
     """Superclass for Spack web spidering errors."""
 
 
+class DownloadError(SpackWebError):
+    """Raised when a server answers a download with an error."""
+    def __init__(self, code, message):
+        super(DownloadError, self).__init__(message)
+        self.code = code
+
+
 class NoNetworkConnectionError(SpackWebError):
     """Raised when an operation can't get an internet connection."""
     def __init__(self, message, url):
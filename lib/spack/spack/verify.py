@@ -5,6 +5,7 @@
 import os
 import hashlib
 import base64
+import multiprocessing.pool
 import sys
 
 import llnl.util.tty as tty
@@ -15,15 +16,42 @@
 import spack.filesystem_view
 
 
+#: Number of threads hashing the files of a prefix at the same time
+_max_hash_threads = 8
+
+#: Size of the blocks files are read in to compute their hash
+_hash_block_size = 2 ** 20
+
+
 def compute_hash(path):
+    hasher = hashlib.sha1()
     with open(path, 'rb') as f:
-        sha1 = hashlib.sha1(f.read()).digest()
-        b32 = base64.b32encode(sha1)
+        for block in iter(lambda: f.read(_hash_block_size), b''):
+            hasher.update(block)
+    b32 = base64.b32encode(hasher.digest())
+
+    if sys.version_info[0] >= 3:
+        b32 = b32.decode()
 
-        if sys.version_info[0] >= 3:
-            b32 = b32.decode()
+    return b32
 
-        return b32
+
+def _map(function, items, threads):
+    """Applies function to each of the items, in a pool of threads if
+    threads is more than 1, and returns the results in order.
+
+    Hashing releases the GIL while reading and digesting files, so threads
+    hash the files of a prefix at the same time.
+    """
+    if threads <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    pool = multiprocessing.pool.ThreadPool(min(threads, len(items)))
+    try:
+        return pool.map(function, items)
+    finally:
+        pool.terminate()
+        pool.join()
 
 
 def create_manifest_entry(path):
@@ -52,7 +80,13 @@ def create_manifest_entry(path):
     return data
 
 
-def write_manifest(spec):
+def write_manifest(spec, threads=_max_hash_threads):
+    """Writes the manifest of the prefix of a spec, unless it has one.
+
+    Args:
+        spec (Spec): spec whose prefix is described
+        threads (int): number of files hashed at the same time
+    """
     manifest_file = os.path.join(spec.prefix,
                                  spack.store.layout.metadata_dir,
                                  spack.store.layout.manifest_file_name)
@@ -60,12 +94,12 @@ def write_manifest(spec):
     if not os.path.exists(manifest_file):
         tty.debug("Writing manifest file: No manifest from binary")
 
-        manifest = {}
+        paths = [spec.prefix]
         for root, dirs, files in os.walk(spec.prefix):
             for entry in list(dirs + files):
-                path = os.path.join(root, entry)
-                manifest[path] = create_manifest_entry(path)
-        manifest[spec.prefix] = create_manifest_entry(spec.prefix)
+                paths.append(os.path.join(root, entry))
+        manifest = dict(zip(
+            paths, _map(create_manifest_entry, paths, threads)))
 
         with open(manifest_file, 'w') as f:
             sjson.dump(manifest, f)
@@ -73,7 +107,18 @@ def write_manifest(spec):
         fp.set_permissions_by_spec(manifest_file, spec)
 
 
-def check_entry(path, data):
+def check_entry(path, data, fast=False):
+    """Checks a path against its entry in a manifest.
+
+    Args:
+        path (str): path to check
+        data (dict): entry of the path in the manifest
+        fast (bool): if True, files with the size and modification time
+            recorded in the manifest are not hashed
+
+    Return:
+        (VerificationResults) errors found
+    """
     res = VerificationResults()
 
     if not data:
@@ -105,19 +150,23 @@ def check_entry(path, data):
     else:
         # Check file contents against hash and listed as file
         # Check mtime and size as well
+        unchanged = True
         if stat.st_size != data['size']:
             res.add_error(path, 'size')
+            unchanged = False
         if stat.st_mtime != data['time']:
             res.add_error(path, 'mtime')
+            unchanged = False
         if data['type'] != 'file':
             res.add_error(path, 'type')
-        if compute_hash(path) != data.get('hash', ''):
+        if not (fast and unchanged) and \
+                compute_hash(path) != data.get('hash', ''):
             res.add_error(path, 'hash')
 
     return res
 
 
-def check_file_manifest(file):
+def check_file_manifest(file, fast=False):
     dirname = os.path.dirname(file)
 
     results = VerificationResults()
@@ -143,13 +192,24 @@ def check_file_manifest(file):
         return results
 
     if file in manifest:
-        results += check_entry(file, manifest[file])
+        results += check_entry(file, manifest[file], fast)
     else:
         results.add_error(file, 'not owned by any package')
     return results
 
 
-def check_spec_manifest(spec):
+def check_spec_manifest(spec, fast=False, threads=_max_hash_threads):
+    """Checks the prefix of a spec against its manifest.
+
+    Args:
+        spec (Spec): spec whose prefix is checked
+        fast (bool): if True, files with the size and modification time
+            recorded in the manifest are not hashed
+        threads (int): number of files hashed at the same time
+
+    Return:
+        (VerificationResults) errors found
+    """
     prefix = spec.prefix
 
     results = VerificationResults()
@@ -189,6 +249,7 @@ def is_extension_artifact(p):
                 return True
         return False
 
+    entries = []
     for root, dirs, files in os.walk(prefix):
         for entry in list(dirs + files):
             path = os.path.join(root, entry)
@@ -205,10 +266,13 @@ def is_extension_artifact(p):
             if path == manifest_file or path == ext_file:
                 continue
 
-            data = manifest.pop(path, {})
-            results += check_entry(path, data)
+            entries.append((path, manifest.pop(path, {})))
 
-    results += check_entry(prefix, manifest.pop(prefix, {}))
+    entries.append((prefix, manifest.pop(prefix, {})))
+    for entry_results in _map(
+            lambda entry: check_entry(entry[0], entry[1], fast),
+            entries, threads):
+        results += entry_results
 
     for path in manifest:
         results.add_error(path, 'deleted')
@@ -216,6 +280,38 @@ def is_extension_artifact(p):
     return results
 
 
+def check_spec_manifests(specs, fast=False, jobs=None):
+    """Checks the prefixes of specs against their manifests, several specs
+    at a time, or the files of a single spec several at a time.
+
+    Args:
+        specs (list): specs whose prefixes are checked
+        fast (bool): if True, files with the size and modification time
+            recorded in the manifest are not hashed
+        jobs (int): number of specs, or files of a single spec, checked at
+            the same time
+
+    Return:
+        (generator) tuples of each spec and the errors found in its prefix,
+        in the order of specs
+    """
+    jobs = jobs or _max_hash_threads
+    if jobs <= 1 or len(specs) <= 1:
+        for spec in specs:
+            yield spec, check_spec_manifest(spec, fast, jobs)
+        return
+
+    pool = multiprocessing.pool.ThreadPool(min(jobs, len(specs)))
+    try:
+        results = pool.imap(
+            lambda spec: check_spec_manifest(spec, fast, threads=1), specs)
+        for spec, spec_results in zip(specs, results):
+            yield spec, spec_results
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 class VerificationResults(object):
     def __init__(self):
         self.errors = {}
@@ -0,0 +1,122 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Times install database queries against the size of the store.
+
+Builds databases of synthetic install records, and times ``query()`` and
+``query_one()`` with the record indexes and with a full scan of the
+records, as queries ran before the indexes were added.
+
+Usage:
+    spack python share/spack/qa/benchmarks/database_query.py [size ...]
+"""
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import spack.database
+import spack.repo
+import spack.spec
+
+#: Number of distinct packages, versions of each, and compilers
+packages, versions, compilers = 500, 10, ('gcc@4.5.0', 'clang@3.3')
+
+
+def synthetic_installs(size):
+    """Install records of ``size`` concrete specs, by DAG hash."""
+    # Names of real packages, since queries for unknown names are treated
+    # like queries for virtual packages, which no index can narrow
+    names = sorted(spack.repo.path.all_package_names())[:packages]
+    installs = {}
+    for i in range(size):
+        name = names[i % packages]
+        version = '1.%d' % (i // packages % versions)
+        compiler = compilers[i // (packages * versions) % len(compilers)]
+        spec = spack.spec.Spec('%s@%s%%%s arch=linux-debian6-x86_64 '
+                               'cflags=-O%d' % (name, version, compiler, i))
+        spec.namespace = 'builtin'
+        spec._mark_concrete()
+        installs[spec.dag_hash()] = {
+            'spec': spec.to_node_dict(),
+            'path': '/opt/%s' % spec.dag_hash(),
+            'installed': True,
+            'ref_count': 0,
+            'explicit': True,
+            'installation_time': 1.0e9,
+        }
+    return installs
+
+
+def make_database(root, size):
+    db_dir = os.path.join(root, spack.database._db_dirname)
+    os.makedirs(db_dir)
+    with open(os.path.join(db_dir, 'index.json'), 'w') as f:
+        json.dump({'database': {
+            'installs': synthetic_installs(size),
+            'version': str(spack.database._db_version)}}, f)
+
+    # Write the index once, as Spack would, so that it has a verifier and
+    # is not read again by every query
+    db = spack.database.Database(root)
+    with db.write_transaction():
+        pass
+
+
+def timed(function, repeat):
+    """Seconds taken by the first call of ``function`` and, on average, by
+    the ``repeat`` calls after it."""
+    start = time.time()
+    function()
+    first = time.time() - start
+    start = time.time()
+    for _ in range(repeat):
+        function()
+    return first, (time.time() - start) / repeat
+
+
+def time_queries(root, indexed, repeat=10):
+    db = spack.database.Database(root)
+    with db.read_transaction():
+        pass
+    if not indexed:
+        db._data.candidates = lambda query_spec: db._data.keys()
+
+    name = sorted(spack.repo.path.all_package_names())[7]
+    queries = [
+        ('query(name)', lambda: db.query(name)),
+        ('query(name@version)', lambda: db.query(name + '@1.3')),
+        ('query(%compiler)', lambda: db.query('%clang')),
+        ('query_one(name@version%compiler)',
+         lambda: db.query_one(name + '@1.3%gcc')),
+    ]
+    return [(label, timed(query, repeat)) for label, query in queries]
+
+
+def main(sizes):
+    print('{0:>8} {1:<34} {2:>12} {3:>12} {4:>12} {5:>12}'.format(
+        'records', 'query', 'scan 1st', 'scan next', 'index 1st',
+        'index next'))
+    for size in sizes:
+        root = tempfile.mkdtemp()
+        try:
+            make_database(root, size)
+            scanned = time_queries(root, indexed=False)
+            indexed = time_queries(root, indexed=True)
+            for (label, scan), (_, index) in zip(scanned, indexed):
+                print('{0:>8} {1:<34} {2:>10.2f}ms {3:>10.2f}ms '
+                      '{4:>10.2f}ms {5:>10.2f}ms'.format(
+                          size, label,
+                          *[t * 1000 for t in scan + index]))
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000])
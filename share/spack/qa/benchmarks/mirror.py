@@ -0,0 +1,160 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Times adding many archives to a mirror with several jobs, offline.
+
+Serves synthetic archives from a local HTTP server that waits before every
+response, as a stand-in for a remote host, or from a local directory with
+``--file``, and adds them to a new mirror once for every number of jobs
+given, as ``spack mirror create -j`` does.
+
+Usage:
+    spack python share/spack/qa/benchmarks/mirror.py \\
+        [--archives N] [--size KB] [--latency SECONDS] [-j N ...] [--file]
+"""
+from __future__ import print_function
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+import spack.caches
+import spack.fetch_strategy as fs
+import spack.mirror
+import spack.spec
+import spack.stage
+
+#: Archives served by the HTTP server, by path
+archives = {}
+
+#: Seconds the HTTP server waits before every response
+latency = 0
+
+
+class ArchiveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # noqa: N802
+        time.sleep(latency)
+        data = archives.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn,
+                      BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class StandInStage(spack.stage.Stage):
+    """Stage fetched from its URL only, since the configured mirrors and
+    the source cache do not have the synthetic archives."""
+
+    def fetch(self, mirror_only=False):
+        self.fetcher = self.default_fetcher
+        self.fetcher.stage = self
+        self.fetcher.fetch()
+
+
+def make_archives(directory, count, size):
+    """Archives of ``size`` KB, written to ``directory`` and served over
+    HTTP. Returns the name and checksum of each."""
+    names = []
+    for i in range(count):
+        name = 'pkg{0}-1.0.tar.gz'.format(i)
+        data = os.urandom(size * 1024)
+        archives['/' + name] = data
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(data)
+        names.append((name, hashlib.sha256(data).hexdigest()))
+    return names
+
+
+def downloads(base_url, names):
+    result = []
+    for i, (name, digest) in enumerate(names):
+        fetcher = fs.URLFetchStrategy(base_url + '/' + name, sha256=digest)
+        mirror_paths = spack.mirror.MirrorReference(
+            os.path.join('pkg{0}'.format(i), name),
+            os.path.join('_source-cache', fetcher.mirror_id()))
+        stage = StandInStage(fetcher, mirror_paths=mirror_paths)
+        result.append(spack.mirror._MirrorDownload(
+            stage, spack.spec.Spec('pkg{0}'.format(i))))
+    return result
+
+
+def main():
+    global latency
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--archives', type=int, default=64,
+                        help='number of archives to add to the mirror')
+    parser.add_argument('--size', type=int, default=256,
+                        help='size of each archive, in KB')
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='seconds the server waits before responding')
+    parser.add_argument('-j', '--jobs', type=int, nargs='+',
+                        default=[1, 4, 16],
+                        help='numbers of archives fetched at the same time')
+    parser.add_argument('--file', action='store_true',
+                        help='fetch the archives from file:// URLs')
+    args = parser.parse_args()
+    latency = args.latency
+
+    root = tempfile.mkdtemp()
+    server = None
+    try:
+        source = os.path.join(root, 'source')
+        os.mkdir(source)
+        names = make_archives(source, args.archives, args.size)
+
+        if args.file:
+            base_url = 'file://' + source
+        else:
+            server = ThreadingServer(('127.0.0.1', 0), ArchiveHandler)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            base_url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+        print('{0:>8} {1:>10}'.format('jobs', 'mirror'))
+        for jobs in args.jobs:
+            mirror_root = os.path.join(root, 'mirror{0}'.format(jobs))
+            mirror = spack.caches.MirrorCache(mirror_root, False)
+            mirror_stats = spack.mirror.MirrorStats()
+            start = time.time()
+            # All archives come from one host, which is not the limit
+            # measured here
+            spack.mirror._run_downloads(
+                downloads(base_url, names), mirror, mirror_stats, jobs, jobs)
+            elapsed = time.time() - start
+            present, mirrored, errors = mirror_stats.stats()
+            if len(mirrored) != len(names):
+                print('{0} archives failed'.format(
+                    len(names) - len(mirrored)))
+            print('{0:>8} {1:>9.2f}s'.format(jobs, elapsed))
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Times the relocation of the text and binary files of a synthetic prefix.
+
+Creates a prefix of text and binary files that refer to the prefixes of
+many dependencies, and times ``relocate_text()`` and ``relocate_text_bin()``
+against a relocation that goes over every file once per prefix, as
+relocation did before all the prefixes were replaced in a single pass.
+
+Usage:
+    spack python share/spack/qa/benchmarks/relocate.py \\
+        [--files N] [--prefixes N] [-j JOBS]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+import spack.config
+import spack.relocate
+
+old_root = '/home/spack/opt/spack/linux-x86_64/gcc-9.3.0'
+new_root = '/opt/spack/linux-x86_64/gcc-9.3.0'
+
+
+def prefix_map(prefixes):
+    """Old prefixes of the package and its dependencies, mapped to new
+    ones no longer than them."""
+    return dict(
+        ('{0}/dep{1}-1.0-{2:032d}'.format(old_root, i, i),
+         '{0}/dep{1}-1.0-{2:032d}'.format(new_root, i, i))
+        for i in range(prefixes))
+
+
+def make_prefix(root, files, prefixes):
+    """Text and binary files referring to some of the old prefixes."""
+    random.seed(0)
+    old_prefixes = sorted(prefix_map(prefixes))
+    text_files, binaries = [], []
+    for i in range(files):
+        used = random.sample(old_prefixes, min(5, len(old_prefixes)))
+        lines = ['# generated file {0}'.format(i)]
+        lines.extend('export PATH={0}/bin:$PATH'.format(p) for p in used)
+        lines.extend('x' * 70 for _ in range(200))
+        path = os.path.join(root, 'script{0}.sh'.format(i))
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines))
+        text_files.append(path)
+
+        data = os.urandom(64 * 1024)
+        rpath = b':'.join(p.encode('utf-8') + b'/lib' for p in used)
+        path = os.path.join(root, 'lib{0}.so'.format(i))
+        with open(path, 'wb') as f:
+            f.write(data[:32768] + rpath + b'\0' + data[32768:])
+        binaries.append(path)
+    return text_files, binaries
+
+
+def per_prefix_text(filename, old_dir, new_dir):
+    """Text relocation of one prefix, reading and writing the whole file."""
+    with open(filename, 'rb+') as f:
+        data = f.read()
+        f.seek(0)
+        pat = b'(?<![\\w\\-_/])([\\w\\-_]*?)%s([\\w\\-_/]*)' % re.escape(
+            old_dir.encode('utf-8'))
+        repl = b'\\1%s\\2' % new_dir.encode('utf-8')
+        f.write(re.sub(pat, repl, data))
+        f.truncate()
+
+
+def per_prefix_bin(filename, old_dir, new_dir):
+    """Binary relocation of one prefix, reading and writing the whole
+    file."""
+    old, new = old_dir.encode('utf-8'), new_dir.encode('utf-8')
+    new = os.sep.encode('utf-8') * (len(old) - len(new)) + new
+    with open(filename, 'rb+') as f:
+        data = f.read()
+        pat = re.compile(re.escape(old))
+        if not pat.search(data):
+            return
+        f.seek(0)
+        f.write(pat.sub(new, data))
+        f.truncate()
+
+
+def timed(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+
+def run(files, prefixes):
+    root = tempfile.mkdtemp()
+    try:
+        prefix_to_prefix = prefix_map(prefixes)
+        results = []
+        for label in ('per prefix', 'single pass'):
+            shutil.rmtree(root)
+            os.mkdir(root)
+            text_files, binaries = make_prefix(root, files, prefixes)
+            if label == 'per prefix':
+                def relocate_text():
+                    for old, new in prefix_to_prefix.items():
+                        for f in text_files:
+                            per_prefix_text(f, old, new)
+
+                def relocate_bin():
+                    for old, new in prefix_to_prefix.items():
+                        for f in binaries:
+                            per_prefix_bin(f, old, new)
+            else:
+                def relocate_text():
+                    spack.relocate.relocate_text(
+                        text_files, old_root, new_root, old_root, new_root,
+                        '/spack', '/spack', prefix_to_prefix)
+
+                def relocate_bin():
+                    spack.relocate.relocate_text_bin(
+                        binaries, old_root, new_root, '/spack', '/spack',
+                        prefix_to_prefix)
+            results.append((label, timed(relocate_text),
+                            timed(relocate_bin)))
+        return results
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000,
+                        help='number of text files, and of binaries')
+    parser.add_argument('--prefixes', type=int, nargs='+', default=[10, 50],
+                        help='numbers of dependency prefixes to relocate')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes of the single pass')
+    args = parser.parse_args()
+    spack.config.set('config:build_jobs', args.jobs)
+
+    print('{0:>8} {1:>8} {2:<12} {3:>10} {4:>10}'.format(
+        'files', 'prefixes', 'relocation', 'text', 'binary'))
+    for prefixes in args.prefixes:
+        for label, text, binary in run(args.files, prefixes):
+            print('{0:>8} {1:>8} {2:<12} {3:>9.2f}s {4:>9.2f}s'.format(
+                args.files, prefixes, label, text, binary))
+
+
+if __name__ == '__main__':
+    main()
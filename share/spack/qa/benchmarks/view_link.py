@@ -0,0 +1,74 @@
+# Copyright 2013-2020 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Times linking a synthetic prefix into a view with several threads.
+
+Creates a prefix of many files, and links it into a view once for every
+number of threads given, as views do for ``config:view_link_threads``.
+Pass a directory on the filesystem to measure, e.g. a parallel filesystem,
+where more threads should pay off.
+
+Usage:
+    spack python share/spack/qa/benchmarks/view_link.py \\
+        [--files N] [--threads N ...] [--dir DIR]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from llnl.util.filesystem import mkdirp
+from llnl.util.link_tree import LinkTree
+
+#: Files in each directory of the synthetic prefix
+files_per_directory = 100
+
+
+def make_prefix(prefix, files):
+    for i in range(files):
+        directory = os.path.join(
+            prefix, 'share', 'dir{0}'.format(i // files_per_directory))
+        if i % files_per_directory == 0:
+            mkdirp(directory)
+        with open(os.path.join(directory, 'file{0}'.format(i)), 'w'):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=100000,
+                        help='number of files in the prefix')
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=[1, 4, 16],
+                        help='numbers of threads to link with')
+    parser.add_argument('--dir', default=None,
+                        help='directory to create the prefix and views in')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(dir=args.dir)
+    try:
+        prefix = os.path.join(root, 'prefix')
+        start = time.time()
+        make_prefix(prefix, args.files)
+        print('Created {0} files in {1:.2f}s'.format(
+            args.files, time.time() - start))
+
+        print('{0:>8} {1:>10}'.format('threads', 'link'))
+        tree = LinkTree(prefix)
+        for threads in args.threads:
+            view = os.path.join(root, 'view{0}'.format(threads))
+            start = time.time()
+            tree.merge(view, threads=threads)
+            print('{0:>8} {1:>9.2f}s'.format(threads, time.time() - start))
+            shutil.rmtree(view)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -434,7 +434,7 @@ _spack_buildcache_copy() {
 }
 
 _spack_buildcache_update_index() {
-    SPACK_COMPREPLY="-h --help -d --mirror-url"
+    SPACK_COMPREPLY="-h --help -d --mirror-url -f --force"
 }
 
 _spack_cd() {
@@ -562,7 +562,7 @@ _spack_compilers() {
 }
 
 _spack_concretize() {
-    SPACK_COMPREPLY="-h --help -f --force"
+    SPACK_COMPREPLY="-h --help -f --force -j --jobs"
 }
 
 _spack_config() {
@@ -962,7 +962,7 @@ _spack_info() {
 _spack_install() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --only -u --until -j --jobs --overwrite --fail-fast --keep-prefix --keep-stage --dont-restage --use-cache --no-cache --cache-only --no-check-signature --show-log-on-error --source -n --no-checksum -v --verbose --fake --only-concrete -f --file --clean --dirty --test --run-tests --log-format --log-file --help-cdash --cdash-upload-url --cdash-build --cdash-site --cdash-track --cdash-buildstamp -y --yes-to-all"
+        SPACK_COMPREPLY="-h --help --only -u --until -j --jobs --concurrent-packages --overwrite --fail-fast --keep-prefix --keep-stage --dont-restage --use-cache --no-cache --cache-only --no-check-signature --show-log-on-error --source -n --no-checksum -v --verbose --fake --only-concrete -f --file --clean --dirty --test --run-tests --log-format --log-file --help-cdash --cdash-upload-url --cdash-build --cdash-site --cdash-track --cdash-buildstamp -y --yes-to-all"
     else
         _all_packages
     fi
@@ -1042,7 +1042,7 @@ _spack_mirror() {
 _spack_mirror_create() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help -d --directory -a --all -f --file --exclude-file --exclude-specs --skip-unstable-versions -D --dependencies -n --versions-per-spec"
+        SPACK_COMPREPLY="-h --help -d --directory -a --all -f --file --exclude-file --exclude-specs --skip-unstable-versions -D --dependencies -n --versions-per-spec -j --jobs --jobs-per-host"
     else
         _all_packages
     fi
@@ -1109,7 +1109,7 @@ _spack_module_lmod() {
 _spack_module_lmod_refresh() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --delete-tree --upstream-modules -y --yes-to-all"
+        SPACK_COMPREPLY="-h --help --delete-tree --incremental --upstream-modules -y --yes-to-all"
     else
         _installed_packages
     fi
@@ -1163,7 +1163,7 @@ _spack_module_tcl() {
 _spack_module_tcl_refresh() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --delete-tree --upstream-modules -y --yes-to-all"
+        SPACK_COMPREPLY="-h --help --delete-tree --incremental --upstream-modules -y --yes-to-all"
     else
         _installed_packages
     fi
@@ -1322,7 +1322,7 @@ _spack_repo() {
     then
         SPACK_COMPREPLY="-h --help"
     else
-        SPACK_COMPREPLY="create list add remove rm"
+        SPACK_COMPREPLY="create list add remove rm reindex"
     fi
 }
 
@@ -1366,6 +1366,15 @@ _spack_repo_rm() {
     fi
 }
 
+_spack_repo_reindex() {
+    if $list_options
+    then
+        SPACK_COMPREPLY="-h --help -f --force"
+    else
+        _repos
+    fi
+}
+
 _spack_resource() {
     if $list_options
     then
@@ -1484,7 +1493,7 @@ _spack_url_stats() {
 _spack_verify() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help -l --local -j --json -a --all -s --specs -f --files"
+        SPACK_COMPREPLY="-h --help -l --local -j --json -a --all --fast --jobs -s --specs -f --files"
     else
         _all_packages
     fi